@@ -0,0 +1,42 @@
+"""Add indexes for foreign keys and status filters
+
+Revision ID: a3f1c9d2e7b4
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ('idx_classroom_teacher', 'classrooms', ['teacher_id']),
+    ('idx_enrollment_student', 'enrollments', ['student_id']),
+    ('idx_assignment_classroom_google', 'assignments', ['classroom_id', 'google_assignment_id']),
+    ('idx_question_assignment_order', 'questions', ['assignment_id', 'order']),
+    ('idx_submission_assignment_status', 'submissions', ['assignment_id', 'status']),
+    ('idx_submission_student', 'submissions', ['student_id']),
+    ('idx_submission_file_submission', 'submission_files', ['submission_id']),
+    ('idx_answer_submission', 'answers', ['submission_id']),
+    ('idx_rubric_assignment', 'rubrics', ['assignment_id']),
+    ('idx_ocr_job_file', 'ocr_jobs', ['file_id']),
+]
+
+
+def upgrade() -> None:
+    # Tables created by Base.metadata.create_all on a fresh database already
+    # have these indexes, so only add the ones that are missing
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,30 @@
+"""Add a lease heartbeat to batch grading jobs
+
+Revision ID: a8c4e1f6b2d9
+Revises: f7b2d9e5a3c8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4e1f6b2d9'
+down_revision = 'f7b2d9e5a3c8'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str) -> set:
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # Tables created by Base.metadata.create_all already have the column
+    if 'heartbeat_at' not in _columns('grading_jobs'):
+        op.add_column('grading_jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('grading_jobs', 'heartbeat_at')
@@ -0,0 +1,32 @@
+"""Add Google Classroom sync watermarks
+
+Revision ID: b7d2e4f8a1c3
+Revises: a3f1c9d2e7b4
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f8a1c3'
+down_revision = 'a3f1c9d2e7b4'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str) -> set:
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # Tables created by Base.metadata.create_all already have the column
+    for table in ('classrooms', 'assignments'):
+        if 'sync_watermark' not in _columns(table):
+            op.add_column(table, sa.Column('sync_watermark', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('assignments', 'sync_watermark')
+    op.drop_column('classrooms', 'sync_watermark')
@@ -0,0 +1,52 @@
+"""Track OCR job lifecycle and progress
+
+Revision ID: c4e8a2b6d9f1
+Revises: b7d2e4f8a1c3
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2b6d9f1'
+down_revision = 'b7d2e4f8a1c3'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str) -> set:
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+NEW_COLUMNS = [
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('engine', sa.String(length=50), nullable=True),
+    sa.Column('pages_total', sa.Integer(), nullable=True),
+    sa.Column('pages_completed', sa.Integer(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+]
+
+
+def upgrade() -> None:
+    # Tables created by Base.metadata.create_all already have the new columns
+    existing = _columns('ocr_jobs')
+    with op.batch_alter_table('ocr_jobs') as batch_op:
+        batch_op.alter_column('file_id', existing_type=postgresql.UUID(as_uuid=True), nullable=True)
+        for column in NEW_COLUMNS:
+            if column.name not in existing:
+                batch_op.add_column(column)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ocr_jobs') as batch_op:
+        batch_op.drop_column('result')
+        batch_op.drop_column('pages_completed')
+        batch_op.drop_column('pages_total')
+        batch_op.drop_column('engine')
+        batch_op.drop_column('filename')
+        batch_op.drop_column('file_path')
+        batch_op.alter_column('file_id', existing_type=postgresql.UUID(as_uuid=True), nullable=False)
@@ -0,0 +1,41 @@
+"""Add content-addressed OCR result cache
+
+Revision ID: d5f9b3c7e2a4
+Revises: c4e8a2b6d9f1
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f9b3c7e2a4'
+down_revision = 'c4e8a2b6d9f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Base.metadata.create_all may have created the table already
+    if sa.inspect(op.get_bind()).has_table('ocr_cache'):
+        return
+    op.create_table(
+        'ocr_cache',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('engine', sa.String(length=50), nullable=False),
+        sa.Column('languages', sa.String(length=100), nullable=False),
+        sa.Column('engine_version', sa.String(length=50), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=False),
+        sa.Column('hit_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash', 'engine', 'languages', 'engine_version', name='uq_ocr_cache_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ocr_cache')
@@ -0,0 +1,50 @@
+"""Add refcounted content-addressed blobs
+
+Revision ID: e6a1c8d4f2b7
+Revises: d5f9b3c7e2a4
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a1c8d4f2b7'
+down_revision = 'd5f9b3c7e2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Base.metadata.create_all creates the new table on existing databases
+    # (but not the new column), and both on fresh ones
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('blobs'):
+        op.create_table(
+            'blobs',
+            sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('path', sa.String(length=500), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('content_type', sa.String(length=100), nullable=True),
+            sa.Column('ref_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('sha256')
+        )
+    if 'blob_id' in {column['name'] for column in inspector.get_columns('submission_files')}:
+        return
+    with op.batch_alter_table('submission_files') as batch_op:
+        batch_op.add_column(sa.Column('blob_id', postgresql.UUID(as_uuid=True), nullable=True))
+        batch_op.create_foreign_key('fk_submission_files_blob_id', 'blobs', ['blob_id'], ['id'])
+        batch_op.create_index('idx_submission_file_blob', ['blob_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('submission_files') as batch_op:
+        batch_op.drop_index('idx_submission_file_blob')
+        batch_op.drop_constraint('fk_submission_files_blob_id', type_='foreignkey')
+        batch_op.drop_column('blob_id')
+    op.drop_table('blobs')
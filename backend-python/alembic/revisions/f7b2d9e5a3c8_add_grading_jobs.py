@@ -0,0 +1,49 @@
+"""Persist batch grading jobs
+
+Revision ID: f7b2d9e5a3c8
+Revises: e6a1c8d4f2b7
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b2d9e5a3c8'
+down_revision = 'e6a1c8d4f2b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Base.metadata.create_all may have created the table already
+    if sa.inspect(op.get_bind()).has_table('grading_jobs'):
+        return
+    op.create_table(
+        'grading_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('assignment_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('teacher_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('submission_ids', sa.JSON(), nullable=False),
+        sa.Column('results', sa.JSON(), nullable=True),
+        sa.Column('graded_count', sa.Integer(), nullable=True),
+        sa.Column('failed_count', sa.Integer(), nullable=True),
+        sa.Column('task_id', sa.String(length=100), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_grading_job_assignment', 'grading_jobs', ['assignment_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_grading_job_assignment', table_name='grading_jobs')
+    op.drop_table('grading_jobs')
@@ -2,13 +2,15 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, inspect
+from sqlalchemy.orm import make_transient_to_detached
 from jose import JWTError, jwt
 
 from app.db.database import get_db
 from app.db.models import Teacher
 from app.core.config import settings
 from app.core.security import verify_token
+from app.core.principal_cache import principal_cache, snapshot_model, restore_model
 
 security = HTTPBearer()
 
@@ -37,16 +39,29 @@ async def get_current_user(
             detail="Invalid authentication credentials",
         )
     
-    result = await db.execute(
-        select(Teacher).where(Teacher.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    iat = payload.get("iat")
+    snapshot = await principal_cache.get(user_id, iat)
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
+    if snapshot is not None:
+        # Attach the cached row to this session without a SELECT, so
+        # endpoints can still modify and commit current_user
+        user = restore_model(Teacher, snapshot)
+        make_transient_to_detached(user)
+        user = await db.merge(user, load=False)
+    else:
+        result = await db.execute(
+            select(Teacher).where(Teacher.id == user_id)
         )
+        user = result.scalar_one_or_none()
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        
+        if user.is_active:
+            await principal_cache.set(user_id, iat, snapshot_model(user))
     
     if not user.is_active:
         raise HTTPException(
@@ -63,4 +78,15 @@ async def get_current_active_teacher(
     """Ensure current user is an active teacher"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+async def load_refresh_token(db: AsyncSession, teacher: Teacher) -> Optional[str]:
+    """Google refresh token of a teacher
+    
+    Cached principals never carry the token, so load it where a Classroom
+    client is built.
+    """
+    if "refresh_token" in inspect(teacher).unloaded:
+        await db.refresh(teacher, attribute_names=["refresh_token"])
+    return teacher.refresh_token
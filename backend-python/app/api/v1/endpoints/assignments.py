@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from typing import List, Optional
 from uuid import UUID
 import logging
 
 from app.db.database import get_db
-from app.db.models import Teacher, Classroom, Assignment, Submission, Question
+from app.db.stats import assignment_stats
+from app.db.models import Teacher, Classroom, Assignment, Question
 from app.api.dependencies import get_current_active_teacher
+from app.services.blobs import release_submission_files
+from app.services.storage import storage_service
 from app.schemas.assignment import (
     AssignmentCreate, AssignmentUpdate, AssignmentResponse, 
     AssignmentWithStats, QuestionCreate, QuestionResponse
@@ -37,28 +40,15 @@ async def list_assignments(
     result = await db.execute(query)
     assignments = result.scalars().all()
     
-    # Get stats for each assignment
+    # Get stats for all assignments in one query
+    stats = await assignment_stats(db, [assignment.id for assignment in assignments])
+    
     assignment_responses = []
     for assignment in assignments:
-        # Count submissions
-        submission_count_result = await db.execute(
-            select(func.count(Submission.id)).where(Submission.assignment_id == assignment.id)
-        )
-        submission_count = submission_count_result.scalar()
-        
-        # Count graded submissions
-        graded_count_result = await db.execute(
-            select(func.count(Submission.id)).where(
-                Submission.assignment_id == assignment.id,
-                Submission.status == 'graded'
-            )
-        )
-        graded_count = graded_count_result.scalar()
-        
         assignment_dict = {
             **assignment.__dict__,
-            "submission_count": submission_count,
-            "graded_count": graded_count
+            "submission_count": stats[assignment.id]["submission_count"],
+            "graded_count": stats[assignment.id]["graded_count"]
         }
         assignment_responses.append(AssignmentWithStats(**assignment_dict))
     
@@ -119,23 +109,12 @@ async def get_assignment(
         )
     
     # Get stats
-    submission_count_result = await db.execute(
-        select(func.count(Submission.id)).where(Submission.assignment_id == assignment.id)
-    )
-    submission_count = submission_count_result.scalar()
-    
-    graded_count_result = await db.execute(
-        select(func.count(Submission.id)).where(
-            Submission.assignment_id == assignment.id,
-            Submission.status == 'graded'
-        )
-    )
-    graded_count = graded_count_result.scalar()
+    stats = (await assignment_stats(db, [assignment.id]))[assignment.id]
     
     return AssignmentWithStats(
         **assignment.__dict__,
-        submission_count=submission_count,
-        graded_count=graded_count
+        submission_count=stats["submission_count"],
+        graded_count=stats["graded_count"]
     )
 
 
@@ -192,8 +171,13 @@ async def delete_assignment(
             detail="Assignment not found"
         )
     
+    # The cascade removes its submission files; release what they hold
+    orphan_paths = await release_submission_files(db, Assignment.id == assignment.id)
     await db.delete(assignment)
     await db.commit()
+    
+    for path in orphan_paths:
+        await storage_service.delete_file(path)
     return {"message": "Assignment deleted successfully"}
 
 
@@ -12,6 +12,7 @@ from app.db.database import get_db
 from app.db.models import Teacher, Student
 from app.core.config import settings
 from app.core.security import create_access_token, create_refresh_token, verify_token
+from app.core.principal_cache import principal_cache
 from app.schemas.auth import Token, TokenData, GoogleAuthCallback, RefreshTokenRequest, LoginRequest
 from app.schemas.teacher import TeacherCreate, TeacherRegister, TeacherResponse
 from app.api.dependencies import get_current_active_teacher
@@ -219,6 +220,7 @@ async def google_callback(
                 if refresh_token:
                     teacher.refresh_token = refresh_token  # TODO: Encrypt this
                     await db.commit()
+                    await principal_cache.invalidate(teacher.id)
             
             # Create JWT tokens
             access_token = create_access_token(
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 import logging
-import httpx
 
-from app.db.database import get_db
+from app.db.database import get_db, AsyncSessionLocal
+from app.db.stats import assignment_stats, submission_file_counts
 from app.db.models import Teacher, Assignment, Submission, Classroom, Rubric, SubmissionFile, Question
 from app.api.dependencies import get_current_active_teacher
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.circuit_breaker import circuit_breakers
 from app.tasks.grading import grade_submission, batch_grade_submissions
+from app.services.batch_grading import batch_grading_engine, job_to_dict, release_submissions
+from app.services.llm_stream import IncrementalJSONExtractor, stream_mcp_completion, sse_event
 import google.generativeai as genai
 from datetime import datetime
 
@@ -22,15 +27,14 @@ logger = logging.getLogger(__name__)
 async def list_available_models():
     """List available LLM models for grading"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{settings.MCP_SERVER_URL}/models")
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="MCP server not available"
-                )
+        response = await http_clients.get("mcp").get("/models", timeout=10.0)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="MCP server not available"
+            )
     except Exception as e:
         logger.error(f"Failed to fetch models: {e}")
         # Return default models as fallback
@@ -50,13 +54,25 @@ async def list_available_models():
         ]
 
 
-async def grade_single_submission_internal(
+# Map model names to MCP server format
+MCP_MODEL_MAPPING = {
+    "gemini": "gemini-pro",
+    "gemini-pro": "gemini-pro",
+    "gemini-1.5-flash": "gemini-pro",  # Map to available model
+    "gpt-4": "gpt-4",
+    "gpt-3.5-turbo": "gpt-3.5-turbo",
+    "claude-3-sonnet": "claude-3-sonnet-20240229",
+    "claude-3-haiku": "claude-3-haiku-20240307"
+}
+
+
+async def claim_submission_for_grading(
     submission_id: UUID,
-    model: str,
     db: AsyncSession,
-    current_teacher: Teacher
-) -> dict:
-    """Internal function to grade a single submission"""
+    current_teacher: Teacher,
+    claimed: bool = False
+) -> Tuple[Submission, Assignment]:
+    """Verify a submission can be graded and mark it as processing"""
     
     # Verify submission belongs to teacher and get full details
     result = await db.execute(
@@ -80,7 +96,8 @@ async def grade_single_submission_internal(
     submission, assignment, classroom = submission_data
     
     # Check if submission is ready for grading
-    if submission.status in ["processing", "graded"]:
+    blocked_statuses = ["graded"] if claimed else ["processing", "graded"]
+    if submission.status in blocked_statuses:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Submission is already {submission.status}"
@@ -102,21 +119,26 @@ async def grade_single_submission_internal(
     submission.status = "processing"
     await db.commit()
     
-    try:
-        # Get submission files with OCR text
-        files_result = await db.execute(
-            select(SubmissionFile).where(SubmissionFile.submission_id == submission_id)
-        )
-        files = files_result.scalars().all()
-        
-        # Get rubric if exists
-        rubric_result = await db.execute(
-            select(Rubric).where(Rubric.assignment_id == assignment.id)
-        )
-        rubric = rubric_result.scalar_one_or_none()
-        
-        # Build grading prompt
-        prompt = f"""You are an AI teacher assistant. Grade this student submission.
+    return submission, assignment
+
+
+async def build_grading_prompt(db: AsyncSession, submission: Submission, assignment: Assignment) -> str:
+    """Build the grading prompt from the assignment, rubric, questions and student content"""
+    
+    # Get submission files with OCR text
+    files_result = await db.execute(
+        select(SubmissionFile).where(SubmissionFile.submission_id == submission.id)
+    )
+    files = files_result.scalars().all()
+    
+    # Get rubric if exists
+    rubric_result = await db.execute(
+        select(Rubric).where(Rubric.assignment_id == assignment.id)
+    )
+    rubric = rubric_result.scalar_one_or_none()
+    
+    # Build grading prompt
+    prompt = f"""You are an AI teacher assistant. Grade this student submission.
 
 Assignment: {assignment.title}
 Instructions: {assignment.instructions or 'N/A'}
@@ -124,69 +146,70 @@ Max Points: {assignment.max_points}
 Assignment Type: {assignment.assignment_type}
 
 """
-        
-        # Add rubric if available
-        if rubric:
-            prompt += f"""Rubric:
+    
+    # Add rubric if available
+    if rubric:
+        prompt += f"""Rubric:
 Title: {rubric.title}
 {rubric.description or ''}
 
 Criteria:
 """
-            for criterion in rubric.criteria:
-                prompt += f"- {criterion.get('description', '')}: {criterion.get('points', 0)} points\n"
-                if criterion.get('levels'):
-                    for level in criterion['levels']:
-                        prompt += f"  • {level.get('title', '')}: {level.get('points', 0)} pts - {level.get('description', '')}\n"
-        
-        # Get assignment questions with expected answers
-        questions_result = await db.execute(
-            select(Question).where(Question.assignment_id == assignment.id).order_by(Question.order)
-        )
-        questions = questions_result.scalars().all()
-        
-        # Add questions with expected answers if available
-        if questions:
-            prompt += "\nQuestions and Expected Answers:\n"
-            for i, q in enumerate(questions, 1):
-                prompt += f"{i}. {q.question_text} ({q.points} points)\n"
-                if q.correct_answer:
-                    prompt += f"   Expected Answer: {q.correct_answer}\n"
-                if q.grading_criteria:
-                    prompt += f"   Grading Criteria: {q.grading_criteria}\n"
-                prompt += "\n"
-        elif assignment.grading_criteria and assignment.grading_criteria.get('questions'):
-            prompt += "\nQuestions:\n"
-            for i, q in enumerate(assignment.grading_criteria['questions'], 1):
-                prompt += f"{i}. {q.get('question_text', '')} ({q.get('points', 0)} points)\n"
-                if q.get('grading_criteria'):
-                    prompt += f"   Grading criteria: {q['grading_criteria']}\n"
-        
-        # Add student's answer and file content
-        prompt += "\nStudent's Response:\n"
-        
-        if submission.student_answers:
-            if submission.student_answers.get('type') == 'short_answer':
-                prompt += submission.student_answers.get('answer', 'No answer provided')
-            elif submission.student_answers.get('type') == 'multiple_choice':
-                prompt += f"Selected: {submission.student_answers.get('answer', 'No selection')}"
-            elif submission.student_answers.get('type') == 'assignment':
-                prompt += submission.student_answers.get('text', 'See attached files')
-                # Add extracted text from Drive files
-                if submission.student_answers.get('extracted_text'):
-                    prompt += f"\n\nExtracted File Content:\n{submission.student_answers['extracted_text']}"
-        
-        # Add OCR text from uploaded files
-        if files:
-            prompt += "\n\nUploaded Files Content:\n"
-            for file in files:
-                if file.ocr_text:
-                    prompt += f"\n--- {file.filename} ---\n{file.ocr_text}\n"
-        
-        if not files and not submission.student_answers:
-            prompt += "No text response provided and no files uploaded."
-        
-        prompt += f"""
+        for criterion in rubric.criteria:
+            prompt += f"- {criterion.get('description', '')}: {criterion.get('points', 0)} points\n"
+            if criterion.get('levels'):
+                for level in criterion['levels']:
+                    prompt += f"  • {level.get('title', '')}: {level.get('points', 0)} pts - {level.get('description', '')}\n"
+    
+    # Get assignment questions with expected answers
+    questions_result = await db.execute(
+        select(Question).where(Question.assignment_id == assignment.id).order_by(Question.order)
+    )
+    questions = questions_result.scalars().all()
+    
+    # Add questions with expected answers if available
+    if questions:
+        prompt += "\nQuestions and Expected Answers:\n"
+        for i, q in enumerate(questions, 1):
+            prompt += f"{i}. {q.question_text} ({q.points} points)\n"
+            if q.correct_answer:
+                prompt += f"   Expected Answer: {q.correct_answer}\n"
+            if q.grading_criteria:
+                prompt += f"   Grading Criteria: {q.grading_criteria}\n"
+            prompt += "\n"
+    elif assignment.grading_criteria and assignment.grading_criteria.get('questions'):
+        prompt += "\nQuestions:\n"
+        for i, q in enumerate(assignment.grading_criteria['questions'], 1):
+            prompt += f"{i}. {q.get('question_text', '')} ({q.get('points', 0)} points)\n"
+            if q.get('grading_criteria'):
+                prompt += f"   Grading criteria: {q['grading_criteria']}\n"
+    
+    # Add student's answer and file content
+    prompt += "\nStudent's Response:\n"
+    
+    if submission.student_answers:
+        if submission.student_answers.get('type') == 'short_answer':
+            prompt += submission.student_answers.get('answer', 'No answer provided')
+        elif submission.student_answers.get('type') == 'multiple_choice':
+            prompt += f"Selected: {submission.student_answers.get('answer', 'No selection')}"
+        elif submission.student_answers.get('type') == 'assignment':
+            prompt += submission.student_answers.get('text', 'See attached files')
+            # Add extracted text from Drive files
+            if submission.student_answers.get('extracted_text'):
+                prompt += f"\n\nExtracted File Content:\n{submission.student_answers['extracted_text']}"
+    
+    # Add OCR text from uploaded files
+    if files:
+        prompt += "\n\nUploaded Files Content:\n"
+        for file in files:
+            ocr_text = (file.ocr_result or {}).get("text")
+            if ocr_text:
+                prompt += f"\n--- {file.filename} ---\n{ocr_text}\n"
+    
+    if not files and not submission.student_answers:
+        prompt += "No text response provided and no files uploaded."
+    
+    prompt += f"""
 
 Please provide:
 1. A numerical score out of {assignment.max_points}
@@ -202,114 +225,143 @@ Format your response as JSON:
   "rubric_scores": {{"<criterion>": <score>}}
 }}
 """
+    return prompt
+
+
+def build_mcp_request(model: str, prompt: str) -> Tuple[str, dict]:
+    """Resolve the MCP model name and build the /generate payload"""
+    mcp_model = MCP_MODEL_MAPPING.get(model, "gemini-pro")
+    
+    mcp_request = {
+        "model": mcp_model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 2000
+    }
+    return mcp_model, mcp_request
+
+
+async def generate_grading_response(model: str, prompt: str) -> Tuple[str, str]:
+    """Get a completion from the MCP server, falling back to direct Gemini
+    
+    Returns the response text and the model that produced it. An open
+    breaker for the MCP server or the model skips straight to the fallback.
+    """
+    try:
+        # Try MCP Server
+        mcp_model, mcp_request = build_mcp_request(model, prompt)
         
-        # Try MCP Server first, fallback to direct Gemini
-        response_text = ""
-        selected_model = model
+        with circuit_breakers.guard("mcp", f"mcp:{mcp_model}"):
+            response = await http_clients.get("mcp").post("/generate", json=mcp_request)
+            response.raise_for_status()
         
-        try:
-            # Try MCP Server
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                # Map model names to MCP server format
-                model_mapping = {
-                    "gemini": "gemini-pro",
-                    "gemini-pro": "gemini-pro",
-                    "gemini-1.5-flash": "gemini-pro",  # Map to available model
-                    "gpt-4": "gpt-4",
-                    "gpt-3.5-turbo": "gpt-3.5-turbo",
-                    "claude-3-sonnet": "claude-3-sonnet-20240229",
-                    "claude-3-haiku": "claude-3-haiku-20240307"
-                }
-                
-                mcp_model = model_mapping.get(model, "gemini-pro")
-                
-                mcp_request = {
-                    "model": mcp_model,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 2000
-                }
-                
-                response = await client.post(
-                    f"{settings.MCP_SERVER_URL}/generate",
-                    json=mcp_request,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    mcp_result = response.json()
-                    response_text = mcp_result.get("content", "")
-                    selected_model = mcp_model
-                else:
-                    raise Exception(f"MCP server error: {response.status_code}")
-                    
-        except Exception as mcp_error:
-            logger.warning(f"MCP server failed: {mcp_error}, falling back to direct Gemini")
+        mcp_result = response.json()
+        return mcp_result.get("content", ""), mcp_model
             
-            # Fallback to direct Gemini
-            if not settings.GEMINI_API_KEY:
-                raise Exception("No AI service available - MCP server failed and Gemini API key not configured")
-                
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    except Exception as mcp_error:
+        logger.warning(f"MCP server failed: {mcp_error}, falling back to direct Gemini")
+        
+        # Fallback to direct Gemini
+        if not settings.GEMINI_API_KEY:
+            raise Exception("No AI service available - MCP server failed and Gemini API key not configured")
             
-            try:
-                gemini_response = gemini_model.generate_content(prompt)
-                response_text = gemini_response.text
-                selected_model = "gemini-pro-direct"
-            except Exception as gemini_error:
-                raise Exception(f"All AI services failed. MCP: {mcp_error}, Gemini: {gemini_error}")
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        gemini_model = genai.GenerativeModel('gemini-1.5-flash')
         
-        # Parse response
         try:
-            import json
-            # Extract JSON from response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                ai_result = json.loads(json_str)
-            else:
-                # Fallback parsing
-                ai_result = {
-                    "score": assignment.max_points * 0.7,  # Default to 70%
-                    "feedback": response_text,
-                    "strengths": [],
-                    "improvements": []
-                }
-        except Exception as e:
-            logger.error(f"Failed to parse AI response: {e}")
-            ai_result = {
-                "score": assignment.max_points * 0.7,
-                "feedback": f"Grading completed but response format was unclear: {response_text[:500]}",
-                "error": str(e)
+            gemini_response = await gemini_model.generate_content_async(prompt)
+            return gemini_response.text, "gemini-pro-direct"
+        except Exception as gemini_error:
+            raise Exception(f"All AI services failed. MCP: {mcp_error}, Gemini: {gemini_error}")
+
+
+def parse_ai_response(response_text: str, assignment: Assignment) -> dict:
+    """Extract the JSON grading result from the model's response"""
+    try:
+        import json
+        # Extract JSON from response
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
+        if start_idx >= 0 and end_idx > start_idx:
+            json_str = response_text[start_idx:end_idx]
+            return json.loads(json_str)
+        else:
+            # Fallback parsing
+            return {
+                "score": assignment.max_points * 0.7,  # Default to 70%
+                "feedback": response_text,
+                "strengths": [],
+                "improvements": []
             }
-        
-        # Update submission
-        submission.total_score = min(float(ai_result.get("score", 0)), assignment.max_points)
-        submission.feedback = ai_result.get("feedback", "")
-        submission.ai_feedback = {
-            "model": selected_model,
-            "detailed_scores": ai_result.get("rubric_scores", {}),
-            "strengths": ai_result.get("strengths", []),
-            "improvements": ai_result.get("improvements", []),
-            "raw_response": response_text,
-            "graded_at": datetime.utcnow().isoformat()
+    except Exception as e:
+        logger.error(f"Failed to parse AI response: {e}")
+        return {
+            "score": assignment.max_points * 0.7,
+            "feedback": f"Grading completed but response format was unclear: {response_text[:500]}",
+            "error": str(e)
         }
-        submission.status = "graded"
-        submission.graded_at = datetime.utcnow()
+
+
+async def save_grading_result(
+    db: AsyncSession,
+    submission: Submission,
+    assignment: Assignment,
+    ai_result: dict,
+    response_text: str,
+    selected_model: str
+) -> dict:
+    """Store the grading result on the submission and mark it graded"""
+    submission.total_score = min(float(ai_result.get("score", 0)), assignment.max_points)
+    submission.feedback = ai_result.get("feedback", "")
+    submission.ai_feedback = {
+        "model": selected_model,
+        "detailed_scores": ai_result.get("rubric_scores", {}),
+        "strengths": ai_result.get("strengths", []),
+        "improvements": ai_result.get("improvements", []),
+        "raw_response": response_text,
+        "graded_at": datetime.utcnow().isoformat()
+    }
+    submission.status = "graded"
+    submission.graded_at = datetime.utcnow()
+    
+    await db.commit()
+    
+    return {
+        "message": "Grading completed",
+        "submission_id": submission.id,
+        "score": submission.total_score,
+        "status": "graded",
+        "model_used": selected_model
+    }
+
+
+async def grade_single_submission_internal(
+    submission_id: UUID,
+    model: str,
+    db: AsyncSession,
+    current_teacher: Teacher,
+    claimed: bool = False
+) -> dict:
+    """Internal function to grade a single submission
+    
+    ``claimed`` is set by the batch engine, which marks submissions as
+    processing before handing them out.
+    """
+    submission, assignment = await claim_submission_for_grading(submission_id, db, current_teacher, claimed)
+    
+    try:
+        prompt = await build_grading_prompt(db, submission, assignment)
         
-        await db.commit()
+        # Try MCP Server first, fallback to direct Gemini
+        response_text, selected_model = await generate_grading_response(model, prompt)
         
-        return {
-            "message": "Grading completed",
-            "submission_id": submission_id,
-            "score": submission.total_score,
-            "status": "graded",
-            "model_used": selected_model
-        }
+        # Parse response
+        ai_result = parse_ai_response(response_text, assignment)
+        
+        # Update submission
+        return await save_grading_result(db, submission, assignment, ai_result, response_text, selected_model)
         
     except Exception as e:
         logger.error(f"Grading failed: {e}")
@@ -334,10 +386,83 @@ async def grade_single_submission(
     return await grade_single_submission_internal(submission_id, model, db, current_teacher)
 
 
+@router.post("/submissions/{submission_id}/stream")
+async def grade_single_submission_stream(
+    submission_id: UUID,
+    model: str = "gemini",
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_active_teacher)
+):
+    """Grade a single submission, streaming partial score and feedback as SSE
+    
+    Emits ``progress`` events (``score``, ``feedback_delta``) while the model
+    is still writing, then a ``result`` event with the stored grade, or an
+    ``error`` event.
+    """
+    submission, assignment = await claim_submission_for_grading(submission_id, db, current_teacher)
+    assignment_id = assignment.id
+    
+    async def events():
+        # The request session may be closed once streaming starts
+        async with AsyncSessionLocal() as session:
+            submission = await session.get(Submission, submission_id)
+            assignment = await session.get(Assignment, assignment_id)
+            chunks = []
+            finished = False
+            
+            try:
+                prompt = await build_grading_prompt(session, submission, assignment)
+                mcp_model, mcp_request = build_mcp_request(model, prompt)
+                selected_model = mcp_model
+                extractor = IncrementalJSONExtractor()
+                
+                try:
+                    async for kind, data in stream_mcp_completion(mcp_request):
+                        if kind != "delta":
+                            continue
+                        chunks.append(data["delta"])
+                        updates = extractor.feed(data["delta"])
+                        if updates:
+                            yield sse_event(updates, event="progress")
+                except Exception as stream_error:
+                    if chunks:
+                        raise
+                    # Nothing streamed yet, so the regular path (with its Gemini fallback) is safe
+                    logger.warning(f"MCP streaming failed: {stream_error}, falling back to non-streaming grading")
+                    response_text, selected_model = await generate_grading_response(model, prompt)
+                    chunks = [response_text]
+                
+                response_text = "".join(chunks)
+                ai_result = parse_ai_response(response_text, assignment)
+                result = await save_grading_result(session, submission, assignment, ai_result, response_text, selected_model)
+                finished = True
+                yield sse_event(result, event="result")
+                
+            except Exception as e:
+                logger.error(f"Grading failed: {e}")
+                submission.status = "failed"
+                await session.commit()
+                finished = True
+                yield sse_event({"detail": f"Grading failed: {str(e)}"}, event="error")
+            
+            finally:
+                if not finished:
+                    # Client disconnected mid-grade (CancelledError/GeneratorExit):
+                    # release the claim so the submission can be graded again
+                    logger.warning(f"Streaming grade of submission {submission_id} aborted, releasing it")
+                    await session.rollback()
+                    await release_submissions(session, [submission_id], "pending")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/assignments/{assignment_id}/batch")
 async def grade_assignment_batch(
     assignment_id: UUID,
-    background_tasks: BackgroundTasks,
     model: str = "gemini",
     status_filter: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
@@ -382,6 +507,7 @@ async def grade_assignment_batch(
         }
     
     # Filter submissions that have content to grade
+    file_counts = await submission_file_counts(db, [submission.id for submission in submissions])
     gradeable_submissions = []
     for submission in submissions:
         # Check if submission has content
@@ -394,13 +520,7 @@ async def grade_assignment_batch(
         
         # Also check for uploaded files
         if not has_content:
-            files_result = await db.execute(
-                select(func.count()).select_from(SubmissionFile).where(
-                    SubmissionFile.submission_id == submission.id
-                )
-            )
-            file_count = files_result.scalar()
-            has_content = file_count > 0
+            has_content = file_counts[submission.id] > 0
         
         if has_content:
             gradeable_submissions.append(submission)
@@ -414,38 +534,62 @@ async def grade_assignment_batch(
             "gradeable_count": 0
         }
     
+    # Persist the job with the claims and hand it to the grading worker, so
+    # any instance can report progress and a restart doesn't lose it
+    job = await batch_grading_engine.create_job(
+        db,
+        assignment_id=assignment_id,
+        teacher_id=current_teacher.id,
+        model=model,
+        submission_ids=[submission.id for submission in gradeable_submissions]
+    )
     await db.commit()
     
-    # Grade each submission individually (for better error handling)
-    graded_count = 0
-    failed_count = 0
-    
-    for submission in gradeable_submissions:
-        try:
-            # Use the single submission grading endpoint logic
-            result = await grade_single_submission_internal(
-                submission.id, model, db, current_teacher
-            )
-            if result.get("status") == "graded":
-                graded_count += 1
-        except Exception as e:
-            logger.error(f"Failed to grade submission {submission.id}: {e}")
-            submission.status = "failed"
-            failed_count += 1
+    try:
+        from app.core.celery import celery_app
+        task = celery_app.send_task('app.tasks.grading.run_batch_grading_job', args=[str(job.id)])
+    except Exception as e:
+        logger.error(f"Failed to queue batch grading job {job.id}: {e}")
+        await batch_grading_engine.abort_job(db, job, f"Failed to queue: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Grading worker not available"
+        )
     
+    job.task_id = task.id
     await db.commit()
     
     return {
-        "message": f"Batch grading completed",
+        "message": "Batch grading started",
+        "job_id": job.id,
         "assignment_id": assignment_id,
+        "status": job.status,
         "total_submissions": len(submissions),
         "gradeable_submissions": len(gradeable_submissions),
-        "graded_count": graded_count,
-        "failed_count": failed_count,
+        "concurrency": batch_grading_engine.concurrency_for(model),
         "model": model
     }
 
 
+@router.get("/jobs/{job_id}")
+async def get_batch_grading_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_active_teacher)
+):
+    """Get status and per-submission results of a batch grading job"""
+    
+    job = await batch_grading_engine.get_job(db, job_id)
+    
+    if not job or job.teacher_id != current_teacher.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Grading job not found"
+        )
+    
+    return job_to_dict(job)
+
+
 @router.get("/assignments/{assignment_id}/progress")
 async def get_grading_progress(
     assignment_id: UUID,
@@ -471,61 +615,19 @@ async def get_grading_progress(
             detail="Assignment not found"
         )
     
-    # Get submission counts by status
-    total_result = await db.execute(
-        select(func.count(Submission.id)).where(Submission.assignment_id == assignment_id)
-    )
-    total_submissions = total_result.scalar()
-    
-    pending_result = await db.execute(
-        select(func.count(Submission.id)).where(
-            Submission.assignment_id == assignment_id,
-            Submission.status == "pending"
-        )
-    )
-    pending_count = pending_result.scalar()
-    
-    processing_result = await db.execute(
-        select(func.count(Submission.id)).where(
-            Submission.assignment_id == assignment_id,
-            Submission.status == "processing"
-        )
-    )
-    processing_count = processing_result.scalar()
-    
-    graded_result = await db.execute(
-        select(func.count(Submission.id)).where(
-            Submission.assignment_id == assignment_id,
-            Submission.status == "graded"
-        )
-    )
-    graded_count = graded_result.scalar()
-    
-    failed_result = await db.execute(
-        select(func.count(Submission.id)).where(
-            Submission.assignment_id == assignment_id,
-            Submission.status == "failed"
-        )
-    )
-    failed_count = failed_result.scalar()
-    
-    # Calculate average score for graded submissions
-    avg_score_result = await db.execute(
-        select(func.avg(Submission.total_score)).where(
-            Submission.assignment_id == assignment_id,
-            Submission.status == "graded",
-            Submission.total_score.isnot(None)
-        )
-    )
-    avg_score = avg_score_result.scalar()
+    # Get submission counts by status and average score in one query
+    stats = (await assignment_stats(db, [assignment_id]))[assignment_id]
+    total_submissions = stats["submission_count"]
+    graded_count = stats["graded_count"]
+    avg_score = stats["average_score"]
     
     return {
         "assignment_id": assignment_id,
         "total_submissions": total_submissions,
-        "pending": pending_count,
-        "processing": processing_count,
+        "pending": stats["pending_count"],
+        "processing": stats["processing_count"],
         "graded": graded_count,
-        "failed": failed_count,
+        "failed": stats["failed_count"],
         "completion_percentage": round((graded_count / max(total_submissions, 1)) * 100, 1),
         "average_score": round(avg_score, 2) if avg_score else None
     }
@@ -573,48 +675,49 @@ async def test_grading_system(
     """Test the grading system with MCP server"""
     
     try:
-        async with httpx.AsyncClient() as client:
-            # Test MCP server connection
-            health_response = await client.get(f"{settings.MCP_SERVER_URL}/health")
-            
-            if health_response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="MCP server not available"
-                )
-            
-            # Test a simple grading request
-            test_request = {
+        client = http_clients.get("mcp")
+        
+        # Test MCP server connection
+        health_response = await client.get("/health")
+        
+        if health_response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="MCP server not available"
+            )
+        
+        # Test a simple grading request
+        test_request = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": "Please grade this simple math answer: Question: What is 2+2? Student Answer: 4"}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 500,
+            "system_prompt": "You are a teacher. Provide a simple grade and feedback."
+        }
+        
+        grading_response = await client.post(
+            "/generate",
+            json=test_request,
+            timeout=30.0
+        )
+        
+        if grading_response.status_code == 200:
+            result = grading_response.json()
+            return {
+                "status": "success",
+                "message": "Grading system is working",
+                "test_response": result.get("content", ""),
                 "model": model,
-                "messages": [
-                    {"role": "user", "content": "Please grade this simple math answer: Question: What is 2+2? Student Answer: 4"}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 500,
-                "system_prompt": "You are a teacher. Provide a simple grade and feedback."
+                "mcp_health": health_response.json()
             }
-            
-            grading_response = await client.post(
-                f"{settings.MCP_SERVER_URL}/generate",
-                json=test_request,
-                timeout=30.0
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Grading test failed: {grading_response.text}"
             )
             
-            if grading_response.status_code == 200:
-                result = grading_response.json()
-                return {
-                    "status": "success",
-                    "message": "Grading system is working",
-                    "test_response": result.get("content", ""),
-                    "model": model,
-                    "mcp_health": health_response.json()
-                }
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Grading test failed: {grading_response.text}"
-                )
-                
     except Exception as e:
         logger.error(f"Grading system test failed: {e}")
         raise HTTPException(
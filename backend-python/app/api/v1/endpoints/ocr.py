@@ -1,248 +1,164 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import uuid
-import os
-import shutil
+from uuid import UUID
 from datetime import datetime
-import asyncio
 import logging
-import base64
-import io
-from PIL import Image
-import pdf2image
 
-from google.cloud import vision
-from google.cloud.vision_v1 import types
-import google.auth
-from google.auth.transport.requests import Request
-from google.auth import exceptions as auth_exceptions
+from app.core.celery import celery_app
+from app.db.database import get_db
+from app.core.config import settings
+from app.db.models import OCRJob, OCRCache
+from app.services.ocr import ALLOWED_OCR_TYPES, get_vision_client
+from app.services.storage import storage_service, upload_chunks, FileTooLargeError
 
 router = APIRouter()
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global Vision client
-vision_client = None
 
-def get_vision_client():
-    """Get or create Google Vision API client"""
-    global vision_client
-    if vision_client is None:
-        try:
-            # First try to use Application Default Credentials
-            try:
-                vision_client = vision.ImageAnnotatorClient()
-                logger.info("Google Vision API client initialized with ADC")
-            except auth_exceptions.DefaultCredentialsError:
-                # Fallback: Use API key if available
-                api_key = os.getenv('GOOGLE_VISION_API_KEY')
-                if api_key and api_key != 'your-google-vision-api-key':
-                    # For API key authentication, we'd need to use REST API directly
-                    # For now, log the issue and provide guidance
-                    logger.warning("Google Vision requires service account credentials")
-                    raise HTTPException(
-                        status_code=503, 
-                        detail="OCR service requires Google Cloud service account credentials"
-                    )
-                else:
-                    logger.warning("No Google Vision API credentials found")
-                    raise HTTPException(
-                        status_code=503, 
-                        detail="OCR service not configured - missing credentials"
-                    )
-        except Exception as e:
-            logger.error(f"Failed to initialize Google Vision API client: {e}")
-            raise HTTPException(status_code=503, detail="OCR service unavailable")
-    return vision_client
-
-def convert_pdf_to_images(pdf_path: str) -> List[str]:
-    """Convert PDF pages to images"""
-    try:
-        # Convert PDF to images
-        images = pdf2image.convert_from_path(pdf_path)
-        image_paths = []
-        
-        for i, image in enumerate(images):
-            image_path = f"{pdf_path}_page_{i}.png"
-            image.save(image_path, 'PNG')
-            image_paths.append(image_path)
-            
-        return image_paths
-    except Exception as e:
-        logger.error(f"Failed to convert PDF to images: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process PDF")
-
-def process_image_with_vision(image_path: str) -> dict:
-    """Process a single image with Google Vision API"""
-    try:
-        client = get_vision_client()
-        
-        # Read image file
-        with io.open(image_path, 'rb') as image_file:
-            content = image_file.read()
-        
-        # Create Vision API image object
-        image = vision.Image(content=content)
-        
-        # Perform text detection
-        response = client.text_detection(image=image)
-        texts = response.text_annotations
-        
-        if response.error.message:
-            raise Exception(f"Vision API error: {response.error.message}")
-        
-        # Extract text and annotations
-        result = {
-            "text": "",
-            "lines": [],
-            "confidence": 0.0
-        }
-        
-        if texts:
-            # First annotation contains the entire detected text
-            result["text"] = texts[0].description
-            
-            # Individual text annotations
-            for text in texts[1:]:  # Skip the first one as it's the full text
-                vertices = [(vertex.x, vertex.y) for vertex in text.bounding_poly.vertices]
-                result["lines"].append({
-                    "text": text.description,
-                    "bbox": vertices,
-                    "confidence": 0.95  # Vision API doesn't provide confidence scores for text detection
-                })
-            
-            result["confidence"] = 0.95
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Vision API processing error: {e}")
-        raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
-
-@router.post("/process")
+@router.post("/process", status_code=status.HTTP_202_ACCEPTED)
 async def process_ocr(
     file: UploadFile = File(...),
     languages: Optional[List[str]] = ["en"],
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    db: AsyncSession = Depends(get_db)
 ):
-    """Process a file (image or PDF) with Google Vision OCR"""
-    
+    """Queue a file (image or PDF) for Google Vision OCR
+
+    Returns a job id right away; poll ``/ocr/status/{job_id}`` for progress
+    and the result.
+    """
+
     # Validate file type
-    allowed_types = ['.png', '.jpg', '.jpeg', '.pdf', '.bmp', '.gif', '.tiff', '.webp']
-    if not any(file.filename.lower().endswith(ext) for ext in allowed_types):
+    if not any(file.filename.lower().endswith(ext) for ext in ALLOWED_OCR_TYPES):
         raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file type. Allowed types: {', '.join(allowed_types)}"
+            status_code=400,
+            detail=f"Unsupported file type. Allowed types: {', '.join(ALLOWED_OCR_TYPES)}"
         )
-    
-    # Generate job ID and temp path
-    job_id = str(uuid.uuid4())
-    uploads_dir = "/tmp/ocr_uploads"
-    os.makedirs(uploads_dir, exist_ok=True)
-    temp_path = f"{uploads_dir}/{job_id}_{file.filename}"
-    
+
     try:
-        # Save uploaded file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"Processing file: {file.filename} (Job ID: {job_id})")
-        
-        # Process based on file type
-        if file.filename.lower().endswith('.pdf'):
-            # Convert PDF to images and process each page
-            image_paths = convert_pdf_to_images(temp_path)
-            
-            results = []
-            for i, img_path in enumerate(image_paths):
-                try:
-                    result = process_image_with_vision(img_path)
-                    results.append({
-                        "page": i + 1,
-                        "text": result["text"],
-                        "lines": result["lines"],
-                        "confidence": result["confidence"]
-                    })
-                except Exception as e:
-                    logger.error(f"Failed to process page {i+1}: {e}")
-                    results.append({
-                        "page": i + 1,
-                        "text": "",
-                        "lines": [],
-                        "confidence": 0.0,
-                        "error": str(e)
-                    })
-                finally:
-                    # Clean up page image
-                    if os.path.exists(img_path):
-                        os.remove(img_path)
-            
-            # Combine all page texts
-            combined_text = "\n\n".join([r["text"] for r in results if r["text"]])
-            
-            ocr_result = {
-                "job_id": job_id,
-                "status": "completed",
-                "file_type": "pdf",
-                "filename": file.filename,
-                "pages": len(results),
-                "text": combined_text,
-                "page_results": results,
-                "processed_at": datetime.utcnow().isoformat(),
-                "language": languages[0] if languages else "en"
-            }
-        
-        else:
-            # Process single image
-            result = process_image_with_vision(temp_path)
-            
-            ocr_result = {
-                "job_id": job_id,
-                "status": "completed",
-                "file_type": "image",
-                "filename": file.filename,
-                "text": result["text"],
-                "lines": result["lines"],
-                "confidence": result["confidence"],
-                "processed_at": datetime.utcnow().isoformat(),
-                "language": languages[0] if languages else "en"
-            }
-        
-        # Schedule cleanup
-        background_tasks.add_task(cleanup_file, temp_path)
-        
-        logger.info(f"OCR processing completed for job {job_id}")
-        return ocr_result
-        
+        # Stream the upload to storage where the OCR worker can read it
+        stored = await storage_service.save_stream(upload_chunks(file), file.filename, folder="ocr")
+
+        job = OCRJob(
+            file_path=stored.path,
+            filename=file.filename,
+            engine="vision",
+            status="queued",
+            pages_completed=0
+        )
+        db.add(job)
+        await db.commit()
+
+        try:
+            celery_app.send_task('app.tasks.ocr.process_ocr_job', args=[str(job.id), languages or ["en"]])
+        except Exception as e:
+            # Nothing will pick the job up: fail it and drop the upload
+            logger.error(f"Failed to enqueue OCR job {job.id}: {e}")
+            job.status = "failed"
+            job.error_message = f"Could not queue OCR job: {e}"
+            job.completed_at = datetime.utcnow()
+            await db.commit()
+            await storage_service.delete_file(stored.path)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="OCR queue unavailable, try again later")
+        logger.info(f"Queued OCR job {job.id} for {file.filename}")
+
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "filename": file.filename
+        }
+
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except HTTPException:
-        # Re-raise HTTP exceptions
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         raise
     except Exception as e:
-        logger.error(f"OCR processing failed for job {job_id}: {e}")
-        # Cleanup on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        logger.error(f"Failed to queue OCR for {file.filename}: {e}")
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
+
 @router.get("/status/{job_id}")
-async def get_ocr_status(job_id: str):
-    """Get OCR job status (for synchronous processing, always completed)"""
+async def get_ocr_status(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get OCR job status, page progress and, once completed, the result"""
+    job = await db.get(OCRJob, job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="OCR job not found"
+        )
+
+    response = {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "engine": job.engine,
+        "pages_total": job.pages_total,
+        "pages_completed": job.pages_completed or 0,
+        "progress": round(((job.pages_completed or 0) / job.pages_total) * 100, 1) if job.pages_total else 0.0,
+        "retry_count": job.retry_count,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at
+    }
+
+    if job.status == "completed":
+        response["result"] = job.result
+        response["text"] = (job.result or {}).get("text", "")
+    elif job.status == "failed":
+        response["error"] = job.error_message
+
+    return response
+
+
+@router.get("/cache/stats")
+async def get_ocr_cache_stats(db: AsyncSession = Depends(get_db)):
+    """OCR result cache size and hit rate per engine
+
+    Every stored entry is one miss that ran OCR, so the hit rate is
+    hits / (hits + entries).
+    """
+    result = await db.execute(
+        select(
+            OCRCache.engine,
+            func.count(OCRCache.id),
+            func.coalesce(func.sum(OCRCache.hit_count), 0)
+        ).group_by(OCRCache.engine)
+    )
+
+    engines = {}
+    for engine, entries, hits in result.all():
+        engines[engine] = {
+            "entries": entries,
+            "hits": hits,
+            "misses": entries,
+            "hit_rate": round(hits / (hits + entries), 3) if hits + entries else 0.0,
+            "version": settings.OCR_ENGINE_VERSIONS.get(engine)
+        }
+
+    total_entries = sum(e["entries"] for e in engines.values())
+    total_hits = sum(e["hits"] for e in engines.values())
     return {
-        "job_id": job_id,
-        "status": "completed",
-        "message": "Synchronous processing - job completed immediately"
+        "enabled": settings.OCR_CACHE_ENABLED,
+        "entries": total_entries,
+        "hits": total_hits,
+        "hit_rate": round(total_hits / (total_hits + total_entries), 3) if total_entries else 0.0,
+        "engines": engines
     }
 
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
         # Test Vision API connectivity
-        client = get_vision_client()
+        get_vision_client()
         return {
             "status": "healthy",
             "service": "google-vision-ocr",
@@ -251,16 +167,7 @@ async def health_check():
     except Exception as e:
         return {
             "status": "unhealthy",
-            "service": "google-vision-ocr", 
+            "service": "google-vision-ocr",
             "vision_api_available": False,
             "error": str(e)
         }
-
-def cleanup_file(filepath: str):
-    """Remove temporary file"""
-    try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            logger.info(f"Cleaned up temporary file: {filepath}")
-    except Exception as e:
-        logger.error(f"Failed to cleanup {filepath}: {e}")
\ No newline at end of file
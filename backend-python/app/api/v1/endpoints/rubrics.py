@@ -7,12 +7,12 @@ import logging
 
 from app.db.database import get_db
 from app.db.models import Teacher, Assignment, Rubric, Classroom
-from app.api.dependencies import get_current_active_teacher
+from app.api.dependencies import get_current_active_teacher, load_refresh_token
 from app.schemas.rubric import (
     RubricCreate, RubricUpdate, RubricResponse, 
     RubricWithAssignment, RubricCriterion
 )
-from app.services.google_classroom import GoogleClassroomService
+from app.services.google_classroom import get_classroom_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -97,7 +97,8 @@ async def create_rubric(
     await db.refresh(db_rubric)
     
     # If assignment is linked to Google Classroom, create rubric there too
-    if assignment.google_assignment_id and current_teacher.refresh_token:
+    refresh_token = await load_refresh_token(db, current_teacher)
+    if assignment.google_assignment_id and refresh_token:
         try:
             classroom_result = await db.execute(
                 select(Classroom).where(Classroom.id == assignment.classroom_id)
@@ -105,7 +106,7 @@ async def create_rubric(
             classroom = classroom_result.scalar_one()
             
             if classroom.google_classroom_id:
-                google_service = GoogleClassroomService(current_teacher.refresh_token)
+                google_service = get_classroom_service(refresh_token)
                 google_rubric = await google_service.create_rubric(
                     course_id=classroom.google_classroom_id,
                     coursework_id=assignment.google_assignment_id,
@@ -193,7 +194,8 @@ async def update_rubric(
     await db.refresh(rubric)
     
     # Update in Google Classroom if linked
-    if rubric.google_rubric_id and current_teacher.refresh_token:
+    refresh_token = await load_refresh_token(db, current_teacher)
+    if rubric.google_rubric_id and refresh_token:
         try:
             assignment_result = await db.execute(
                 select(Assignment).where(Assignment.id == rubric.assignment_id)
@@ -206,7 +208,7 @@ async def update_rubric(
             classroom = classroom_result.scalar_one()
             
             if classroom.google_classroom_id and assignment.google_assignment_id:
-                google_service = GoogleClassroomService(current_teacher.refresh_token)
+                google_service = get_classroom_service(refresh_token)
                 await google_service.update_rubric(
                     course_id=classroom.google_classroom_id,
                     coursework_id=assignment.google_assignment_id,
@@ -242,7 +244,8 @@ async def delete_rubric(
         )
     
     # Delete from Google Classroom if linked
-    if rubric.google_rubric_id and current_teacher.refresh_token:
+    refresh_token = await load_refresh_token(db, current_teacher)
+    if rubric.google_rubric_id and refresh_token:
         try:
             assignment_result = await db.execute(
                 select(Assignment).where(Assignment.id == rubric.assignment_id)
@@ -255,7 +258,7 @@ async def delete_rubric(
             classroom = classroom_result.scalar_one()
             
             if classroom.google_classroom_id and assignment.google_assignment_id:
-                google_service = GoogleClassroomService(current_teacher.refresh_token)
+                google_service = get_classroom_service(refresh_token)
                 await google_service.delete_rubric(
                     course_id=classroom.google_classroom_id,
                     coursework_id=assignment.google_assignment_id
@@ -278,7 +281,8 @@ async def sync_rubric_with_google(
 ):
     """Sync a specific rubric with Google Classroom"""
     
-    if not current_teacher.refresh_token:
+    refresh_token = await load_refresh_token(db, current_teacher)
+    if not refresh_token:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Google authentication required. Please re-authenticate."
@@ -322,7 +326,7 @@ async def sync_rubric_with_google(
         )
     
     try:
-        google_service = GoogleClassroomService(current_teacher.refresh_token)
+        google_service = get_classroom_service(refresh_token)
         
         if rubric.google_rubric_id:
             # Update existing rubric
@@ -1,26 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from typing import List, Optional
 from uuid import UUID
+import asyncio
 import logging
 import json
+import os
+import tempfile
 from datetime import datetime
 
+from app.core.config import settings
 from app.db.database import get_db
-from app.db.models import Teacher, Classroom, Assignment, Submission, SubmissionFile, Student, Enrollment
-from app.api.dependencies import get_current_active_teacher
+from app.db.models import Teacher, Classroom, Assignment, Submission, SubmissionFile, Student, Enrollment, OCRJob
+from app.api.dependencies import get_current_active_teacher, load_refresh_token
 from app.schemas.submission import (
     SubmissionCreate, SubmissionUpdate, SubmissionResponse, 
     SubmissionWithFiles, FileUploadResponse
 )
-from app.services.storage import storage_service
-from app.tasks.ocr import process_file_ocr
+from app.services.blobs import save_upload, release_blob
+from app.services.storage import storage_service, upload_chunks, file_chunks, FileTooLargeError
 from app.tasks.grading import grade_submission
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+OCR_FILE_TYPES = ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp']
+
+# Larger non-export Drive files are never decoded as text
+MAX_DRIVE_TEXT_SIZE = 1024 * 1024
+# PDF, PNG, JPEG, GIF, BMP and zip-based Office files
+BINARY_SIGNATURES = (b'%PDF', b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'BM', b'PK\x03\x04')
+
 
 @router.get("/")
 async def list_submissions(
@@ -253,12 +264,10 @@ async def upload_submission_file(
         )
     
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Save file using storage service
-        file_path = await storage_service.save_file(
-            file_content=file_content,
+        # Stream the upload to storage in chunks
+        stored = await save_upload(
+            db,
+            upload_chunks(file),
             filename=file.filename,
             folder=f"submissions/{submission_id}"
         )
@@ -267,9 +276,10 @@ async def upload_submission_file(
         submission_file = SubmissionFile(
             submission_id=submission_id,
             filename=file.filename,
-            file_path=file_path,
+            file_path=stored.path,
             file_type=file_extension,
-            file_size=len(file_content),
+            file_size=stored.size,
+            blob_id=stored.blob_id,
             ocr_status="pending"
         )
         
@@ -292,11 +302,16 @@ async def upload_submission_file(
         return FileUploadResponse(
             file_id=submission_file.id,
             filename=file.filename,
-            file_size=len(file_content),
+            file_size=stored.size,
             status="uploaded",
             ocr_status="pending" if file_extension in ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp'] else "not_required"
         )
         
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"File upload failed: {e}")
         raise HTTPException(
@@ -305,6 +320,51 @@ async def upload_submission_file(
         )
 
 
+@router.delete("/{submission_id}/files/{file_id}")
+async def delete_submission_file(
+    submission_id: UUID,
+    file_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_active_teacher)
+):
+    """Delete a submission file and its stored object (once unreferenced)"""
+    
+    result = await db.execute(
+        select(SubmissionFile)
+        .join(Submission, SubmissionFile.submission_id == Submission.id)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Classroom, Assignment.classroom_id == Classroom.id)
+        .where(
+            SubmissionFile.id == file_id,
+            SubmissionFile.submission_id == submission_id,
+            Classroom.teacher_id == current_teacher.id
+        )
+    )
+    submission_file = result.scalar_one_or_none()
+    
+    if not submission_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    # Shared blobs are only removed when the last file lets go of them
+    if submission_file.blob_id:
+        orphan_path = await release_blob(db, submission_file.blob_id)
+    else:
+        orphan_path = submission_file.file_path
+    
+    # Keep OCR job history, detached from the file
+    await db.execute(update(OCRJob).where(OCRJob.file_id == submission_file.id).values(file_id=None))
+    await db.delete(submission_file)
+    await db.commit()
+    
+    if orphan_path:
+        await storage_service.delete_file(orphan_path)
+    
+    return {"message": "File deleted successfully"}
+
+
 @router.post("/{submission_id}/grade")
 async def grade_submission_endpoint(
     submission_id: UUID,
@@ -460,32 +520,49 @@ async def process_submission_drive_files(
         )
     
     # Initialize Google Classroom service
-    from app.services.google_classroom import GoogleClassroomService
+    from app.services.google_classroom import get_classroom_service
     
-    if not current_teacher.refresh_token:
+    refresh_token = await load_refresh_token(db, current_teacher)
+    if not refresh_token:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Google authentication required"
         )
     
     try:
-        service = GoogleClassroomService(current_teacher.refresh_token)
+        service = get_classroom_service(refresh_token)
+        
+        async def download(attachment):
+            # Spooled: small files stay in memory, large ones go to disk
+            spool = tempfile.SpooledTemporaryFile(max_size=settings.STORAGE_CHUNK_SIZE)
+            try:
+                mime_type = await service.download_attachment_to(attachment, spool)
+            except BaseException:
+                spool.close()
+                raise
+            return spool, mime_type
+        
+        # Download all attachments in parallel (bounded by the Drive download
+        # pool); storing and recording them below stays sequential on the session
+        logger.info(f"Downloading {len(drive_files)} Drive files for submission {submission_id}")
+        downloads = await asyncio.gather(*(download(att) for att in drive_files), return_exceptions=True)
+        
         processed_count = 0
+        ocr_file_ids = []
         
-        for attachment in drive_files:
+        for attachment, downloaded in zip(drive_files, downloads):
             drive_file = attachment.get('driveFile')
-            if not drive_file:
-                continue
-                
             file_id = drive_file.get('id')
             file_title = drive_file.get('title', 'untitled')
             
+            if isinstance(downloaded, Exception):
+                logger.error(f"Failed to process Drive file {file_id}: {downloaded}")
+                continue
+            
+            spool, mime_type = downloaded
             try:
-                logger.info(f"Attempting to download Drive file: {file_title} (ID: {file_id})")
-                
-                # Download file content
-                file_content = await service.download_attachment(attachment)
-                logger.info(f"Downloaded {len(file_content)} bytes from {file_title}")
+                file_size = spool.seek(0, os.SEEK_END)
+                logger.info(f"Downloaded {file_size} bytes from {file_title}")
                 
                 # Try to extract text content immediately
                 extracted_text = None
@@ -493,90 +570,94 @@ async def process_submission_drive_files(
                 file_type = 'text/plain'
                 ocr_status = 'completed'
                 
-                try:
-                    # Try to decode as text first (for Google Docs exported as text)
-                    extracted_text = file_content.decode('utf-8', errors='ignore')
-                    
-                    # Check if the decoded text looks meaningful (not binary)
-                    if len(extracted_text.strip()) > 10 and '\x00' not in extracted_text[:100]:
-                        logger.info(f"Successfully extracted text from {file_title}: {len(extracted_text)} chars")
-                        logger.info(f"Preview: {extracted_text[:200]}...")
-                    else:
-                        # Looks like binary data, treat as non-text
+                # Exports are text; other files are checked for text by their first bytes
+                spool.seek(0)
+                head = spool.read(100)
+                is_text = (mime_type or '').startswith('text/') or (
+                    mime_type is None
+                    and file_size <= MAX_DRIVE_TEXT_SIZE
+                    and b'\x00' not in head
+                    and not head.startswith(BINARY_SIGNATURES)
+                )
+                if is_text:
+                    spool.seek(0)
+                    extracted_text = spool.read().decode('utf-8', errors='ignore')
+                    if len(extracted_text.strip()) <= 10 and not (mime_type or '').startswith('text/'):
                         extracted_text = None
-                        file_extension = '.pdf'
-                        file_type = 'application/pdf'
-                        ocr_status = 'pending'
-                        logger.info(f"File {file_title} contains binary data, treating as PDF for OCR")
-                        
-                except Exception as e:
-                    # If not text, treat as PDF or other format
-                    extracted_text = None
-                    file_extension = '.pdf'
-                    file_type = 'application/pdf'
-                    ocr_status = 'pending'
-                    logger.info(f"File {file_title} decode failed ({e}), treating as PDF for OCR")
                 
-                filename = f"{file_title}{file_extension}"
-                
-                # Create submission file record
-                submission_file = SubmissionFile(
-                    submission_id=submission_id,
-                    filename=filename,
-                    file_type=file_type,
-                    file_size=len(file_content),
-                    storage_path=f"drive_downloads/{submission_id}/{file_id}",
-                    ocr_status=ocr_status,
-                    ocr_text=extracted_text
-                )
+                if extracted_text is not None:
+                    logger.info(f"Successfully extracted text from {file_title}: {len(extracted_text)} chars")
+                    logger.info(f"Preview: {extracted_text[:200]}...")
+                else:
+                    # Looks like binary data, treat as non-text
+                    suffix = os.path.splitext(file_title)[1].lower()
+                    file_extension = suffix if suffix in OCR_FILE_TYPES else '.pdf'
+                    file_type = mime_type or 'application/pdf'
+                    ocr_status = 'pending'
+                    logger.info(f"File {file_title} contains binary data, treating as {file_extension} for OCR")
                 
-                db.add(submission_file)
-                await db.flush()
+                filename = file_title if file_title.lower().endswith(file_extension) else f"{file_title}{file_extension}"
                 
-                # Store file in storage
-                file_path = await storage_service.save_file(
-                    file_content=file_content,
+                # Stream the download into storage
+                stored = await save_upload(
+                    db,
+                    file_chunks(spool),
                     filename=filename,
                     folder=f"submissions/{submission_id}"
                 )
-                submission_file.file_path = file_path
-                
-                # Queue OCR processing only if we couldn't extract text directly
-                if not extracted_text and (file_extension == '.pdf' or 'image' in file_type):
-                    background_tasks.add_task(
-                        process_file_ocr,
-                        str(submission_file.id),
-                        file_path
-                    )
-                
-                processed_count += 1
-                logger.info(f"Processed Drive file: {filename} for submission {submission_id}")
-                
             except Exception as e:
                 logger.error(f"Failed to process Drive file {file_id}: {e}")
                 continue
+            finally:
+                spool.close()
+            
+            # Create submission file record
+            submission_file = SubmissionFile(
+                submission_id=submission_id,
+                filename=filename,
+                file_path=stored.path,
+                file_type=file_type,
+                file_size=stored.size,
+                blob_id=stored.blob_id,
+                ocr_status=ocr_status,
+                ocr_result={"text": extracted_text, "source": "drive_export"} if extracted_text is not None else None
+            )
+            db.add(submission_file)
+            await db.flush()
+            
+            if ocr_status == 'pending':
+                ocr_file_ids.append(str(submission_file.id))
+            
+            processed_count += 1
+            logger.info(f"Processed Drive file: {filename} for submission {submission_id}")
         
         await db.commit()
         
+        # Queue OCR only for files whose text couldn't be read directly (after
+        # commit, so the worker can see the rows)
+        from app.core.celery import celery_app
+        for ocr_file_id in ocr_file_ids:
+            celery_app.send_task('app.tasks.ocr.process_file_ocr', args=[ocr_file_id])
+        
         # Update submission to include extracted text
         if processed_count > 0:
             # Get all text from submission files
             files_result = await db.execute(
                 select(SubmissionFile).where(
                     SubmissionFile.submission_id == submission_id,
-                    SubmissionFile.ocr_text.isnot(None)
+                    SubmissionFile.ocr_status == "completed"
                 )
             )
-            files_with_text = files_result.scalars().all()
+            files_with_text = [f for f in files_result.scalars().all() if (f.ocr_result or {}).get("text")]
             
             logger.info(f"Found {len(files_with_text)} files with OCR text")
             
             # Combine text
             all_text = []
             for file in files_with_text:
-                if file.ocr_text:
-                    logger.info(f"Adding text from {file.filename}: {len(file.ocr_text)} chars")
-                    all_text.append(f"--- {file.filename} ---\n{file.ocr_text}")
+                text = file.ocr_result["text"]
+                logger.info(f"Adding text from {file.filename}: {len(text)} chars")
+                all_text.append(f"--- {file.filename} ---\n{text}")
             
             # Update student_answers with extracted text
             if all_text:
@@ -7,6 +7,9 @@ from uuid import UUID
 from app.db.database import get_db
 from app.db.models import Teacher, Classroom, Enrollment, Assignment, Submission
 from app.api.dependencies import get_current_active_teacher
+from app.core.principal_cache import principal_cache
+from app.services.blobs import release_submission_files
+from app.services.storage import storage_service
 from app.schemas.teacher import TeacherResponse, TeacherUpdate, TeacherWithStats
 
 router = APIRouter()
@@ -76,6 +79,7 @@ async def update_current_teacher(
         setattr(current_teacher, field, value)
     
     await db.commit()
+    await principal_cache.invalidate(current_teacher.id)
     await db.refresh(current_teacher)
     return current_teacher
 
@@ -87,6 +91,11 @@ async def delete_current_teacher(
 ):
     """Delete current teacher account"""
     # Note: This will cascade delete all related data due to foreign key constraints
+    orphan_paths = await release_submission_files(db, Classroom.teacher_id == current_teacher.id)
     await db.delete(current_teacher)
     await db.commit()
+    await principal_cache.invalidate(current_teacher.id)
+    
+    for path in orphan_paths:
+        await storage_service.delete_file(path)
     return {"message": "Account deleted successfully"}
\ No newline at end of file
@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from app.core.config import settings
+from app.core.http import http_clients
 
 celery_app = Celery(
     "aisensei",
@@ -23,4 +25,10 @@ celery_app.conf.update(
         "app.tasks.grading.*": {"queue": "grading"},
         "app.tasks.sync.*": {"queue": "sync"},
     },
-)
\ No newline at end of file
+)
+
+
+@worker_process_shutdown.connect
+def close_http_clients(**kwargs):
+    """Close the worker process's pooled HTTP clients"""
+    http_clients.close_sync()
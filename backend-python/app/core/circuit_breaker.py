@@ -0,0 +1,241 @@
+"""Circuit breakers for the API's and workers' calls to the MCP gateway
+
+The gateway has its own breakers per provider and model (mcp-server/breaker.py).
+It is built and deployed as a separate image that doesn't ship ``app``, so
+this is a trimmed copy of the same state machine rather than a shared import,
+without what only the gateway's router needs (a side-effect-free ``ready()``,
+per-breaker overrides, transition history). Keep the two in step.
+"""
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name} (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class MCPStatusError(Exception):
+    """A gateway failure reported with a status outside the HTTP response
+
+    Streams report errors in an SSE ``error`` event after the 200, with the
+    status the gateway would otherwise have answered with.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_failure_status(status_code: int, retry_after: Optional[Any] = None) -> bool:
+    """Whether a gateway status says the model is failing
+
+    5xx count, except a 503 with Retry-After: that is the gateway failing
+    fast on an open breaker of its own, which already counted the failures.
+    """
+    return status_code >= 500 and not (status_code == 503 and retry_after is not None)
+
+
+def is_gateway_failure(exc: BaseException) -> bool:
+    """The gateway couldn't be reached or didn't answer in time"""
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_model_failure(exc: BaseException) -> bool:
+    """The gateway answered but the model call failed (5xx or a bad completion)
+
+    Transport errors say nothing about the model, 4xx (incl. 429) say
+    nothing about health.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return is_failure_status(exc.response.status_code, exc.response.headers.get("Retry-After"))
+    if isinstance(exc, MCPStatusError):
+        return is_failure_status(exc.status_code, exc.retry_after)
+    return isinstance(exc, Exception) and not isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state machine for one upstream
+
+    Opens after ``failure_threshold`` consecutive failures or an error rate
+    of ``error_rate`` over the last ``window`` calls. While open, calls fail
+    immediately; after ``open_seconds`` a few probe calls decide whether to
+    close again or reopen.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        error_rate: float,
+        window: int,
+        min_calls: int,
+        open_seconds: float,
+        half_open_probes: int
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.rejected = 0
+
+    def _transition(self, state: str):
+        transition = f"{self.state}->{state}"
+        self.state = state
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Circuit {transition} for {self.name}: failing fast for {self.open_seconds:.0f}s")
+        else:
+            if state == CLOSED:
+                self.outcomes.clear()
+                self.consecutive_failures = 0
+            logger.info(f"Circuit {transition} for {self.name}")
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == CLOSED:
+            return
+        if (self.state == OPEN and self.retry_after() > 0) or (
+            self.state == HALF_OPEN and self.probes_in_flight >= self.half_open_probes
+        ):
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def acquire(self):
+        """Let a call through; call only after ``check()`` passed"""
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self.probes_in_flight += 1
+
+    def finish(self, ok: Optional[bool]):
+        """Record a call's outcome; None means it said nothing about health"""
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if ok is False:
+                self._transition(OPEN)
+            elif ok:
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+            return
+
+        if ok is None or self.state != CLOSED:
+            return
+
+        self.outcomes.append(ok)
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        failures = self.outcomes.count(False)
+        if self.consecutive_failures >= self.failure_threshold or (
+            len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate
+        ):
+            self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "retry_after_ms": int(self.retry_after() * 1000) if self.state == OPEN else 0,
+            "consecutive_failures": self.consecutive_failures,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": self.outcomes.count(False),
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Named breakers for this process (the API, or one Celery worker child)
+
+    Guards are synchronous, so the same registry serves async endpoints and
+    sync tasks; state is per process and never shared across replicas.
+    """
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.MCP_BREAKER_FAILURE_THRESHOLD,
+                error_rate=settings.MCP_BREAKER_ERROR_RATE,
+                window=settings.MCP_BREAKER_WINDOW,
+                min_calls=settings.MCP_BREAKER_MIN_CALLS,
+                open_seconds=settings.MCP_BREAKER_OPEN_SECONDS,
+                half_open_probes=settings.MCP_BREAKER_HALF_OPEN_PROBES
+            )
+        return self._breakers[name]
+
+    @contextmanager
+    def guard(self, gateway: str, model: str):
+        """Wrap one call to a model through the gateway
+
+        Raises CircuitOpenError without calling if either breaker is open.
+        Transport failures count against the gateway breaker; 5xx responses
+        (raise for them inside the block) and other errors against the
+        model's only, so one failing model doesn't cut off the others.
+        """
+        classified: Dict[CircuitBreaker, Callable[[BaseException], bool]] = {
+            self.get(gateway): is_gateway_failure,
+            self.get(model): is_model_failure,
+        }
+        for breaker in classified:
+            breaker.check()
+        for breaker in classified:
+            breaker.acquire()
+
+        error: Optional[BaseException] = None
+        completed = False
+        try:
+            yield
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            for breaker, is_failure in classified.items():
+                if completed:
+                    breaker.finish(True)
+                elif error is not None and is_failure(error):
+                    breaker.finish(False)
+                else:
+                    # Cancelled calls and errors that aren't this breaker's
+                    breaker.finish(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+# Global instance
+circuit_breakers = CircuitBreakerRegistry()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict
 import os
 
 
@@ -21,6 +21,11 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Authenticated teacher cache (keyed by token sub + iat)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+    PRINCIPAL_CACHE_REDIS: bool = os.getenv("PRINCIPAL_CACHE_REDIS", "False").lower() == "true"
+    
     # CORS
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -52,8 +57,60 @@ class Settings(BaseSettings):
         "https://www.googleapis.com/auth/userinfo.profile"
     ]
     
+    # Google API client (blocking calls run on a bounded thread pool)
+    GOOGLE_API_MAX_WORKERS: int = int(os.getenv("GOOGLE_API_MAX_WORKERS", "16"))
+    GOOGLE_API_RATE_PER_SECOND: float = float(os.getenv("GOOGLE_API_RATE_PER_SECOND", "20"))
+    GOOGLE_API_BURST: int = int(os.getenv("GOOGLE_API_BURST", "50"))
+    DRIVE_DOWNLOAD_CONCURRENCY: int = int(os.getenv("DRIVE_DOWNLOAD_CONCURRENCY", "8"))
+    DRIVE_DOWNLOAD_CHUNK_SIZE: int = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_SIZE", str(4 * 1024 * 1024)))
+    GOOGLE_SERVICE_CACHE_SIZE: int = int(os.getenv("GOOGLE_SERVICE_CACHE_SIZE", "256"))
+    
     # MCP Server
     MCP_SERVER_URL: str = os.getenv("MCP_SERVER_URL", "http://localhost:8002")
+    # Circuit breakers on MCP calls (fail fast to the direct Gemini fallback)
+    MCP_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("MCP_BREAKER_FAILURE_THRESHOLD", "5"))
+    MCP_BREAKER_ERROR_RATE: float = float(os.getenv("MCP_BREAKER_ERROR_RATE", "0.5"))
+    MCP_BREAKER_WINDOW: int = int(os.getenv("MCP_BREAKER_WINDOW", "20"))
+    MCP_BREAKER_MIN_CALLS: int = int(os.getenv("MCP_BREAKER_MIN_CALLS", "10"))
+    MCP_BREAKER_OPEN_SECONDS: float = float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "30"))
+    MCP_BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("MCP_BREAKER_HALF_OPEN_PROBES", "1"))
+    
+    # Surya OCR service
+    SURYA_OCR_URL: str = os.getenv("SURYA_OCR_URL", "http://localhost:8001")
+    
+    # PDF rasterisation for Google Vision OCR
+    OCR_PDF_DPI: int = int(os.getenv("OCR_PDF_DPI", "200"))
+    OCR_PDF_GRAYSCALE: bool = os.getenv("OCR_PDF_GRAYSCALE", "True").lower() == "true"
+    OCR_IMAGE_FORMAT: str = os.getenv("OCR_IMAGE_FORMAT", "PNG")
+    
+    # Google Vision batching (Vision accepts at most 16 images per request)
+    VISION_BATCH_SIZE: int = int(os.getenv("VISION_BATCH_SIZE", "16"))
+    VISION_BATCH_WINDOW_MS: int = int(os.getenv("VISION_BATCH_WINDOW_MS", "50"))
+    VISION_MAX_CONCURRENCY: int = int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+    
+    # OCR result cache (keyed by file SHA-256 + engine + languages + version)
+    OCR_CACHE_ENABLED: bool = os.getenv("OCR_CACHE_ENABLED", "True").lower() == "true"
+    OCR_ENGINE_VERSIONS: Dict[str, str] = {
+        "vision": os.getenv("OCR_VISION_VERSION", "text-detection-v2"),
+        "surya": os.getenv("OCR_SURYA_VERSION", "surya-0.4-v2")
+    }
+    
+    # Next.js frontend (proxied for non-API routes)
+    FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
+    
+    # Batch grading concurrency (per requested model, JSON override via env)
+    GRADING_MAX_CONCURRENCY: int = int(os.getenv("GRADING_MAX_CONCURRENCY", "5"))
+    # A running job whose worker hasn't recorded a result for this long can be taken over
+    GRADING_JOB_LEASE_SECONDS: int = int(os.getenv("GRADING_JOB_LEASE_SECONDS", "600"))
+    GRADING_MODEL_CONCURRENCY: Dict[str, int] = {
+        "gemini": 8,
+        "gemini-pro": 8,
+        "gemini-1.5-flash": 8,
+        "gpt-4": 4,
+        "gpt-3.5-turbo": 8,
+        "claude-3-sonnet": 4,
+        "claude-3-haiku": 8
+    }
     
     # LLM API Keys
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -72,6 +129,9 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES: List[str] = [".pdf", ".jpg", ".jpeg", ".png", ".gif", ".bmp"]
+    # Store uploads once per SHA-256 with refcounted blob rows
+    STORAGE_CONTENT_ADDRESSED: bool = os.getenv("STORAGE_CONTENT_ADDRESSED", "False").lower() == "true"
+    STORAGE_CHUNK_SIZE: int = int(os.getenv("STORAGE_CHUNK_SIZE", str(1024 * 1024)))
     
     # AWS S3 (optional)
     USE_S3: bool = os.getenv("USE_S3", "False").lower() == "true"
@@ -79,6 +139,8 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "aisensei-uploads")
+    S3_MAX_CONCURRENCY: int = int(os.getenv("S3_MAX_CONCURRENCY", "16"))
+    S3_MULTIPART_PART_SIZE: int = int(os.getenv("S3_MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))  # S3 minimum is 5MB
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,94 @@
+import importlib.util
+import logging
+import os
+from typing import Dict
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (installed with httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Per-upstream connection pool and timeout configuration
+UPSTREAMS: Dict[str, Dict] = {
+    "mcp": {
+        "base_url": settings.MCP_SERVER_URL,
+        "timeout": httpx.Timeout(60.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+    },
+    "ocr": {
+        "base_url": settings.SURYA_OCR_URL,
+        "timeout": httpx.Timeout(300.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+    },
+    "frontend": {
+        "base_url": settings.FRONTEND_URL,
+        "timeout": httpx.Timeout(30.0, connect=2.0),
+        "limits": httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+    },
+}
+
+
+class HTTPClientRegistry:
+    """Long-lived, keep-alive HTTP clients shared per upstream
+
+    Async clients belong to the API process and are opened/closed by the
+    app lifespan. Sync clients are created lazily once per process so each
+    Celery worker child gets its own pool (pools must not cross a fork).
+    """
+
+    def __init__(self):
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._sync_pid = None
+
+    def _client_options(self, name: str) -> Dict:
+        if name not in UPSTREAMS:
+            raise KeyError(f"Unknown upstream: {name}")
+        return {**UPSTREAMS[name], "http2": HTTP2_AVAILABLE}
+
+    async def startup(self):
+        """Open one async client per upstream"""
+        for name in UPSTREAMS:
+            self.get(name)
+        logger.info(f"HTTP clients ready for {', '.join(UPSTREAMS)} (http2={HTTP2_AVAILABLE})")
+
+    async def shutdown(self):
+        """Close all async clients and their pooled connections"""
+        for client in self._async_clients.values():
+            await client.aclose()
+        self._async_clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Async client for an upstream (created on first use outside the lifespan)"""
+        client = self._async_clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**self._client_options(name))
+            self._async_clients[name] = client
+        return client
+
+    def get_sync(self, name: str) -> httpx.Client:
+        """Sync client for an upstream, shared within the current process"""
+        if self._sync_pid != os.getpid():
+            # Forked child: never reuse the parent's sockets
+            self._sync_clients = {}
+            self._sync_pid = os.getpid()
+
+        client = self._sync_clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.Client(**self._client_options(name))
+            self._sync_clients[name] = client
+        return client
+
+    def close_sync(self):
+        """Close the sync clients of the current process"""
+        for client in self._sync_clients.values():
+            client.close()
+        self._sync_clients.clear()
+
+
+# Global instance
+http_clients = HTTPClientRegistry()
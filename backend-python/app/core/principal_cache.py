@@ -0,0 +1,153 @@
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis layer is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalCache:
+    """Short-lived cache of authenticated Teacher rows
+
+    Entries are keyed by the token's ``sub`` and ``iat`` and hold a plain
+    column snapshot (without secrets), never a session-bound instance. With
+    Redis configured it is the only tier (one hash per teacher, so a single
+    DEL invalidates every token of that teacher on every replica; each field
+    carries its own expiry, since the hash TTL is renewed by every login);
+    without it, entries live in an in-process LRU, which is only safe for a
+    single replica.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = aioredis.from_url(redis_url) if redis_url and aioredis else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(sub: str, iat: Any) -> str:
+        return f"{sub}:{iat}"
+
+    @staticmethod
+    def _redis_key(sub: str) -> str:
+        return f"auth:principal:{sub}"
+
+    async def get(self, sub: str, iat: Any) -> Optional[Dict[str, Any]]:
+        """Cached column snapshot for a token, or None"""
+        if self._redis is not None:
+            # No local tier: another replica's invalidate() must take effect here
+            redis_key = self._redis_key(sub)
+            try:
+                raw = await self._redis.hget(redis_key, str(iat))
+                entry = json.loads(raw) if raw else None
+                if entry is not None and entry["expires_at"] < time.time():
+                    await self._redis.hdel(redis_key, str(iat))
+                    entry = None
+            except Exception as e:
+                logger.warning(f"Principal cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                self.hits += 1
+                return entry["snapshot"]
+            self.misses += 1
+            return None
+
+        key = self._key(sub, iat)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, snapshot = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return snapshot
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    async def set(self, sub: str, iat: Any, snapshot: Dict[str, Any]):
+        if self._redis is not None:
+            try:
+                redis_key = self._redis_key(sub)
+                # Wall-clock expiry, shared by every replica reading the entry
+                entry = {"expires_at": time.time() + self.ttl_seconds, "snapshot": snapshot}
+                await self._redis.hset(redis_key, str(iat), json.dumps(entry, default=str))
+                # Drops the whole hash once no token of this teacher is fresh
+                await self._redis.expire(redis_key, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Principal cache write failed: {e}")
+            return
+
+        self._remember(self._key(sub, iat), snapshot)
+
+    async def invalidate(self, sub: Any):
+        """Forget every cached token of a teacher"""
+        prefix = f"{sub}:"
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._redis_key(str(sub)))
+            except Exception as e:
+                logger.warning(f"Principal cache invalidation failed: {e}")
+
+    def _remember(self, key: str, snapshot: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Secrets never leave the database through the cache
+EXCLUDED_COLUMNS = {"refresh_token"}
+
+
+def snapshot_model(instance) -> Dict[str, Any]:
+    """Column values of a loaded model instance, minus secrets"""
+    return {
+        column.name: getattr(instance, column.name)
+        for column in instance.__table__.columns
+        if column.name not in EXCLUDED_COLUMNS
+    }
+
+
+def restore_model(model, snapshot: Dict[str, Any]):
+    """Build a transient instance from a snapshot (values from Redis come back as strings)
+
+    Excluded columns stay unloaded rather than None, so a merged instance
+    never reports a missing value for them.
+    """
+    values = {}
+    for column in model.__table__.columns:
+        if column.name in EXCLUDED_COLUMNS:
+            continue
+        value = snapshot.get(column.name)
+        if isinstance(value, str):
+            python_type = column.type.python_type
+            if python_type is uuid.UUID:
+                value = uuid.UUID(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+        values[column.name] = value
+    return model(**values)
+
+
+# Global instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    redis_url=settings.REDIS_URL if settings.PRINCIPAL_CACHE_REDIS else None,
+)
@@ -0,0 +1,32 @@
+"""Helpers for set-based writes (prefetch by IN lists, INSERT ... ON CONFLICT)"""
+from typing import Iterable, Iterator, List, TypeVar
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+# Keeps IN lists and multi-row VALUES well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def upsert_insert(db: AsyncSession, model):
+    """INSERT construct with on_conflict_do_update/do_nothing for the session's dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+
+def chunked(items: Iterable[T], size: int = CHUNK_SIZE) -> Iterator[List[T]]:
+    """Split items into lists of at most ``size``"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, ForeignKey, Float, Integer, Index
+from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, ForeignKey, Float, Integer, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -54,6 +54,7 @@ class Classroom(Base):
     room = Column(String(50))
     sync_enabled = Column(Boolean, default=True)
     last_sync_at = Column(DateTime(timezone=True))
+    sync_watermark = Column(DateTime(timezone=True))  #Newest Google coursework updateTime applied
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -62,6 +63,10 @@ class Classroom(Base):
     assignments = relationship("Assignment", back_populates="classroom", cascade="all, delete-orphan")
     enrollments = relationship("Enrollment", back_populates="classroom", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("idx_classroom_teacher", "teacher_id"),
+    )
+
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
@@ -75,9 +80,10 @@ class Enrollment(Base):
     classroom = relationship("Classroom", back_populates="enrollments")
     student = relationship("Student", back_populates="enrollments")
 
-    #Unique constraint
+    #Unique constraint (also serves lookups by classroom_id)
     __table_args__ = (
         Index("idx_classroom_student", "classroom_id", "student_id", unique=True),
+        Index("idx_enrollment_student", "student_id"),
     )
 
 
@@ -95,6 +101,7 @@ class Assignment(Base):
     assignment_type = Column(String(50))  #quiz, homework, exam, project
     grading_criteria = Column(JSON)  #Structured grading rubric
     auto_grade = Column(Boolean, default=False)
+    sync_watermark = Column(DateTime(timezone=True))  #Newest Google submission updateTime applied
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -103,6 +110,10 @@ class Assignment(Base):
     submissions = relationship("Submission", back_populates="assignment", cascade="all, delete-orphan")
     questions = relationship("Question", back_populates="assignment", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("idx_assignment_classroom_google", "classroom_id", "google_assignment_id"),
+    )
+
 
 class Question(Base):
     __tablename__ = "questions"
@@ -119,6 +130,10 @@ class Question(Base):
     #Relationships
     assignment = relationship("Assignment", back_populates="questions")
 
+    __table_args__ = (
+        Index("idx_question_assignment_order", "assignment_id", "order"),
+    )
+
 
 class Submission(Base):
     __tablename__ = "submissions"
@@ -143,6 +158,11 @@ class Submission(Base):
     files = relationship("SubmissionFile", back_populates="submission", cascade="all, delete-orphan")
     answers = relationship("Answer", back_populates="submission", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("idx_submission_assignment_status", "assignment_id", "status"),
+        Index("idx_submission_student", "student_id"),
+    )
+
 
 class SubmissionFile(Base):
     __tablename__ = "submission_files"
@@ -153,6 +173,7 @@ class SubmissionFile(Base):
     file_path = Column(String(500), nullable=False)  #S3 or local path
     file_type = Column(String(50))  #pdf, image, document
     file_size = Column(Integer)  #bytes
+    blob_id = Column(UUID(as_uuid=True), ForeignKey("blobs.id"))  #Set in content-addressed storage mode
     ocr_status = Column(String(50), default="pending")  #pending, processing, completed, failed
     ocr_result = Column(JSON)  #OCR extracted text and metadata
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -160,6 +181,23 @@ class SubmissionFile(Base):
     #Relationships
     submission = relationship("Submission", back_populates="files")
 
+    __table_args__ = (
+        Index("idx_submission_file_submission", "submission_id"),
+        Index("idx_submission_file_blob", "blob_id"),
+    )
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    path = Column(String(500), nullable=False)  #S3 or local path
+    size = Column(Integer)  #bytes
+    content_type = Column(String(100))
+    ref_count = Column(Integer, nullable=False, default=0)  #Files pointing at this blob
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class Answer(Base):
     __tablename__ = "answers"
@@ -176,6 +214,10 @@ class Answer(Base):
     #Relationships
     submission = relationship("Submission", back_populates="answers")
 
+    __table_args__ = (
+        Index("idx_answer_submission", "submission_id"),
+    )
+
 
 class GradingTemplate(Base):
     __tablename__ = "grading_templates"
@@ -209,6 +251,10 @@ class Rubric(Base):
     #Relationships
     assignment = relationship("Assignment", back_populates="rubric")
 
+    __table_args__ = (
+        Index("idx_rubric_assignment", "assignment_id"),
+    )
+
 
 #Update Assignment model to include rubric relationship
 Assignment.rubric = relationship("Rubric", back_populates="assignment", uselist=False, cascade="all, delete-orphan")
@@ -218,15 +264,67 @@ class OCRJob(Base):
     __tablename__ = "ocr_jobs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    file_id = Column(UUID(as_uuid=True), ForeignKey("submission_files.id"), nullable=False)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("submission_files.id"))  #Null for direct uploads
+    file_path = Column(String(500))  #Stored upload for direct uploads
+    filename = Column(String(255))
+    engine = Column(String(50), default="vision")  #vision, surya
     status = Column(String(50), default="queued")  #queued, processing, completed, failed
     worker_id = Column(String(100))  #OCR worker instance
+    pages_total = Column(Integer)
+    pages_completed = Column(Integer, default=0)
+    result = Column(JSON)  #OCR text, per-page results and metadata
     started_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     error_message = Column(Text)
     retry_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("idx_ocr_job_file", "file_id"),
+    )
+
+
+class GradingJob(Base):
+    __tablename__ = "grading_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    assignment_id = Column(UUID(as_uuid=True), ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
+    teacher_id = Column(UUID(as_uuid=True), ForeignKey("teachers.id", ondelete="CASCADE"), nullable=False)
+    model = Column(String(100), nullable=False)
+    status = Column(String(50), default="queued")  #queued, running, completed, failed
+    submission_ids = Column(JSON, nullable=False)  #Submissions claimed for this job
+    results = Column(JSON, default=dict)  #Per-submission outcome, keyed by submission id
+    graded_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    task_id = Column(String(100))  #Celery task running the job
+    error_message = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  #Renewed by the running worker; its lease
+    completed_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("idx_grading_job_assignment", "assignment_id"),
+    )
+
+
+class OCRCache(Base):
+    __tablename__ = "ocr_cache"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), nullable=False)  #SHA-256 of the file bytes
+    engine = Column(String(50), nullable=False)  #vision, surya
+    languages = Column(String(100), nullable=False)  #Sorted, comma separated
+    engine_version = Column(String(50), nullable=False)
+    result = Column(JSON, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("content_hash", "engine", "languages", "engine_version", name="uq_ocr_cache_key"),
+    )
+
 
 class LLMRequest(Base):
     __tablename__ = "llm_requests"
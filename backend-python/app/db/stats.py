@@ -0,0 +1,88 @@
+"""Aggregate count queries for list and dashboard endpoints
+
+Each function takes many parent ids and answers with one grouped query, so
+callers never issue a COUNT per row. Parents without children are still
+present in the result with zero counts.
+"""
+from typing import Any, Dict, Iterable
+from uuid import UUID
+
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Enrollment, Assignment, Submission, SubmissionFile
+
+SUBMISSION_STATUSES = ["pending", "processing", "graded", "failed"]
+
+
+async def classroom_stats(db: AsyncSession, classroom_ids: Iterable[UUID]) -> Dict[UUID, Dict[str, int]]:
+    """Student and assignment counts per classroom"""
+    classroom_ids = list(classroom_ids)
+    stats = {classroom_id: {"student_count": 0, "assignment_count": 0} for classroom_id in classroom_ids}
+    if not classroom_ids:
+        return stats
+
+    # Group each child table separately (joining both would multiply rows)
+    # and send them as one UNION ALL statement
+    query = union_all(
+        select(Enrollment.classroom_id, literal("student_count"), func.count(Enrollment.id))
+        .where(Enrollment.classroom_id.in_(classroom_ids))
+        .group_by(Enrollment.classroom_id),
+        select(Assignment.classroom_id, literal("assignment_count"), func.count(Assignment.id))
+        .where(Assignment.classroom_id.in_(classroom_ids))
+        .group_by(Assignment.classroom_id),
+    )
+    result = await db.execute(query)
+    for classroom_id, field, count in result.all():
+        stats[classroom_id][field] = count
+
+    return stats
+
+
+async def assignment_stats(db: AsyncSession, assignment_ids: Iterable[UUID]) -> Dict[UUID, Dict[str, Any]]:
+    """Submission counts by status and average graded score per assignment"""
+    assignment_ids = list(assignment_ids)
+    empty = {"submission_count": 0, "average_score": None, **{f"{status}_count": 0 for status in SUBMISSION_STATUSES}}
+    stats = {assignment_id: dict(empty) for assignment_id in assignment_ids}
+    if not assignment_ids:
+        return stats
+
+    graded = Submission.status == "graded"
+    query = (
+        select(
+            Submission.assignment_id,
+            func.count(Submission.id),
+            *(func.count(Submission.id).filter(Submission.status == status) for status in SUBMISSION_STATUSES),
+            func.avg(Submission.total_score).filter(graded, Submission.total_score.isnot(None)),
+        )
+        .where(Submission.assignment_id.in_(assignment_ids))
+        .group_by(Submission.assignment_id)
+    )
+    result = await db.execute(query)
+    for row in result.all():
+        assignment_id, total, *status_counts, average_score = row
+        stats[assignment_id] = {
+            "submission_count": total,
+            "average_score": float(average_score) if average_score is not None else None,
+            **{f"{status}_count": count for status, count in zip(SUBMISSION_STATUSES, status_counts)},
+        }
+
+    return stats
+
+
+async def submission_file_counts(db: AsyncSession, submission_ids: Iterable[UUID]) -> Dict[UUID, int]:
+    """Number of uploaded files per submission"""
+    submission_ids = list(submission_ids)
+    counts = {submission_id: 0 for submission_id in submission_ids}
+    if not submission_ids:
+        return counts
+
+    result = await db.execute(
+        select(SubmissionFile.submission_id, func.count(SubmissionFile.id))
+        .where(SubmissionFile.submission_id.in_(submission_ids))
+        .group_by(SubmissionFile.submission_id)
+    )
+    for submission_id, count in result.all():
+        counts[submission_id] = count
+
+    return counts
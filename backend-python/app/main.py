@@ -3,10 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from contextlib import asynccontextmanager
 import logging
-import httpx
 import os
 
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.circuit_breaker import circuit_breakers
 from app.api.v1.router import api_router
 from app.db.database import engine, Base
 
@@ -27,9 +28,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         logger.info("Continuing without database - API will run with limited functionality")
+    # Open pooled HTTP clients for upstream services
+    await http_clients.startup()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    await http_clients.shutdown()
 
 
 app = FastAPI(
@@ -53,7 +57,11 @@ app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "aisensei-api"}
+    return {
+        "status": "healthy",
+        "service": "aisensei-api",
+        "circuit_breakers": circuit_breakers.stats()
+    }
 
 # Proxy all non-API requests to Next.js frontend
 @app.get("/{full_path:path}")
@@ -62,25 +70,24 @@ async def proxy_to_frontend(request: Request, full_path: str):
     if full_path.startswith("api/") or full_path.startswith("health") or full_path.startswith("docs") or full_path.startswith("openapi.json"):
         return {"message": "Route not found"}
     
-    # Proxy to Next.js server running on port 3000
+    # Proxy to Next.js server over the shared keep-alive pool
     try:
-        frontend_url = f"http://localhost:3000/{full_path}"
+        frontend_url = f"/{full_path}"
         query_params = str(request.url.query)
         if query_params:
             frontend_url += f"?{query_params}"
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                frontend_url,
-                headers={k: v for k, v in request.headers.items() if k.lower() != 'host'},
-                timeout=30.0
-            )
-            
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers={k: v for k, v in response.headers.items() if k.lower() not in ['content-encoding', 'transfer-encoding']}
-            )
+        
+        client = http_clients.get("frontend")
+        response = await client.get(
+            frontend_url,
+            headers={k: v for k, v in request.headers.items() if k.lower() != 'host'}
+        )
+        
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in ['content-encoding', 'transfer-encoding']}
+        )
     except Exception as e:
         logger.error(f"Frontend proxy error: {e}")
         return {
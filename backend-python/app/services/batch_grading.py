@@ -0,0 +1,239 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import GradingJob, Submission, Teacher
+
+logger = logging.getLogger(__name__)
+
+# Grades one claimed submission: (submission_id, model, session, teacher) -> result
+GradeFunction = Callable[[UUID, str, AsyncSession, Teacher], Awaitable[Dict[str, Any]]]
+
+
+def job_to_dict(job: GradingJob) -> Dict[str, Any]:
+    """Progress summary of a grading job for API responses"""
+    total = len(job.submission_ids)
+    done = (job.graded_count or 0) + (job.failed_count or 0)
+    return {
+        "job_id": job.id,
+        "assignment_id": job.assignment_id,
+        "model": job.model,
+        "status": job.status,
+        "gradeable_submissions": total,
+        "graded_count": job.graded_count or 0,
+        "failed_count": job.failed_count or 0,
+        "remaining": total - done,
+        "completion_percentage": round((done / max(total, 1)) * 100, 1),
+        "results": list((job.results or {}).values()),
+        "error_message": job.error_message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at,
+    }
+
+
+async def release_submissions(db: AsyncSession, submission_ids: List[UUID], status: str):
+    """Move submissions a job claimed but never finished out of processing"""
+    if not submission_ids:
+        return
+    await db.execute(
+        update(Submission)
+        .where(Submission.id.in_(submission_ids), Submission.status == "processing")
+        .values(status=status)
+    )
+    await db.commit()
+
+
+class BatchGradingEngine:
+    """Grade the submissions of a persisted job concurrently, bounded per model
+
+    Jobs live in the grading_jobs table and run on the Celery grading worker,
+    so any API instance can report progress and a redelivered task resumes
+    with the submissions that have no result yet. A run claims its job
+    atomically and renews a lease (``heartbeat_at``) with every result, so a
+    duplicate delivery can't grade the job twice while its lease is live.
+    Each submission is graded in its own AsyncSession; anything claimed but
+    not finished is moved out of "processing" so it can be graded again.
+    """
+
+    def concurrency_for(self, model: str) -> int:
+        """Concurrency limit for a model, falling back to the global default"""
+        limit = settings.GRADING_MODEL_CONCURRENCY.get(model, settings.GRADING_MAX_CONCURRENCY)
+        return max(int(limit), 1)
+
+    async def create_job(
+        self,
+        db: AsyncSession,
+        assignment_id: UUID,
+        teacher_id: UUID,
+        model: str,
+        submission_ids: List[UUID]
+    ) -> GradingJob:
+        """Add a queued job to the session; the caller commits and enqueues it"""
+        job = GradingJob(
+            assignment_id=assignment_id,
+            teacher_id=teacher_id,
+            model=model,
+            status="queued",
+            submission_ids=[str(submission_id) for submission_id in submission_ids],
+            results={},
+            graded_count=0,
+            failed_count=0
+        )
+        db.add(job)
+        await db.flush()
+        return job
+
+    async def get_job(self, db: AsyncSession, job_id: UUID) -> Optional[GradingJob]:
+        return await db.get(GradingJob, job_id)
+
+    async def abort_job(self, db: AsyncSession, job: GradingJob, error: str):
+        """Fail a job that could not be started and hand back its submissions"""
+        job.status = "failed"
+        job.error_message = error
+        job.completed_at = datetime.utcnow()
+        await db.commit()
+        await release_submissions(db, [UUID(submission_id) for submission_id in job.submission_ids], "pending")
+
+    async def claim(self, db: AsyncSession, job_id: UUID) -> bool:
+        """Atomically mark a queued job, or a running one whose lease expired, as ours"""
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=settings.GRADING_JOB_LEASE_SECONDS)
+        result = await db.execute(
+            update(GradingJob)
+            .where(
+                GradingJob.id == job_id,
+                or_(
+                    GradingJob.status == "queued",
+                    and_(
+                        GradingJob.status == "running",
+                        or_(GradingJob.heartbeat_at.is_(None), GradingJob.heartbeat_at < expired)
+                    )
+                )
+            )
+            .values(
+                status="running",
+                heartbeat_at=now,
+                started_at=func.coalesce(GradingJob.started_at, now)
+            )
+            .returning(GradingJob.id)
+        )
+        claimed = result.scalar_one_or_none() is not None
+        await db.commit()
+        return claimed
+
+    async def run(self, job_id: UUID, grade_one: GradeFunction) -> bool:
+        """Grade every submission of the job that has no result yet
+
+        Returns False without grading when another run holds the job's
+        lease, so the caller can check back once it could have expired.
+        """
+        async with AsyncSessionLocal() as db:
+            if not await self.claim(db, job_id):
+                job = await db.get(GradingJob, job_id)
+                if job and job.status == "running":
+                    logger.info(f"Batch grading job {job_id} is running elsewhere")
+                    return False
+                logger.info(f"Batch grading job {job_id} has nothing to run")
+                return True
+
+            job = await db.get(GradingJob, job_id)
+            teacher = await db.get(Teacher, job.teacher_id)
+            if not teacher:
+                await self.abort_job(db, job, "Teacher not found")
+                return True
+
+            results: Dict[str, Dict[str, Any]] = dict(job.results or {})
+            remaining = [UUID(submission_id) for submission_id in job.submission_ids if submission_id not in results]
+
+            lock = asyncio.Lock()
+            semaphore = asyncio.Semaphore(self.concurrency_for(job.model))
+
+            async def record(submission_id: UUID, result: Dict[str, Any]):
+                async with lock:
+                    results[str(submission_id)] = result
+                    # Assign a new dict so the JSON column is written
+                    job.results = dict(results)
+                    job.graded_count = sum(1 for r in results.values() if r["status"] == "graded")
+                    job.failed_count = len(results) - job.graded_count
+                    job.heartbeat_at = datetime.utcnow()
+                    await db.commit()
+
+            logger.info(
+                f"Batch grading job {job.id}: {len(remaining)} of {len(job.submission_ids)} submissions to grade, "
+                f"model={job.model}, concurrency={self.concurrency_for(job.model)}"
+            )
+
+            try:
+                await asyncio.gather(
+                    *(self._grade(job.model, teacher, submission_id, grade_one, semaphore, record)
+                      for submission_id in remaining)
+                )
+            except Exception as e:
+                await db.rollback()
+                job.status = "failed"
+                job.error_message = str(e)
+                job.completed_at = datetime.utcnow()
+                await db.commit()
+                raise
+            finally:
+                unfinished = [submission_id for submission_id in remaining if str(submission_id) not in results]
+                if unfinished:
+                    logger.warning(f"Batch grading job {job.id} stopped with {len(unfinished)} submissions unfinished")
+                    async with AsyncSessionLocal() as session:
+                        await release_submissions(session, unfinished, "pending")
+
+            job.status = "completed"
+            job.completed_at = datetime.utcnow()
+            await db.commit()
+            logger.info(
+                f"Batch grading job {job.id} completed: "
+                f"{job.graded_count} graded, {job.failed_count} failed"
+            )
+            return True
+
+    async def _grade(
+        self,
+        model: str,
+        teacher: Teacher,
+        submission_id: UUID,
+        grade_one: GradeFunction,
+        semaphore: asyncio.Semaphore,
+        record: Callable[[UUID, Dict[str, Any]], Awaitable[None]]
+    ):
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await grade_one(submission_id, model, session, teacher)
+                if result.get("status") == "graded":
+                    await record(submission_id, {
+                        "submission_id": str(submission_id),
+                        "status": "graded",
+                        "score": result.get("score"),
+                        "model_used": result.get("model_used"),
+                    })
+                    return
+                error = result.get("message", "Grading did not complete")
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e)
+                logger.error(f"Failed to grade submission {submission_id}: {error}")
+
+            # Claiming or grading failed: don't leave the submission processing
+            async with AsyncSessionLocal() as session:
+                await release_submissions(session, [submission_id], "failed")
+            await record(submission_id, {
+                "submission_id": str(submission_id),
+                "status": "failed",
+                "error": error,
+            })
+
+
+# Global instance
+batch_grading_engine = BatchGradingEngine()
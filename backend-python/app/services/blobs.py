@@ -0,0 +1,132 @@
+"""Content-addressed, refcounted file storage
+
+With STORAGE_CONTENT_ADDRESSED on, identical bytes are stored once as a
+Blob (unique by SHA-256) and every SubmissionFile pointing at it holds a
+reference. The object is deleted only when the last reference is released.
+Callers own the transaction: commit after ``save_upload``/``release_blob``.
+Deletes that remove SubmissionFile rows through ORM cascades (assignment,
+classroom, account) must call ``release_submission_files`` first.
+"""
+import logging
+import uuid
+from collections import Counter
+from typing import AsyncIterable, List, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.bulk import upsert_insert
+from app.db.models import Assignment, Blob, Classroom, OCRJob, Submission, SubmissionFile
+from app.services.storage import storage_service
+
+logger = logging.getLogger(__name__)
+
+
+class SavedFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    blob_id: Optional[UUID]
+
+
+async def save_upload(
+    db: AsyncSession,
+    chunks: AsyncIterable[bytes],
+    filename: str,
+    folder: str = "submissions"
+) -> SavedFile:
+    """Stream a file into storage, deduplicating by content when enabled
+
+    The blob upsert runs in a savepoint that is rolled back if storing the
+    object fails, so a caller that carries on after the error (a bulk
+    import skipping one file) never commits a reference to it.
+    """
+    if not settings.STORAGE_CONTENT_ADDRESSED:
+        stored = await storage_service.save_stream(chunks, filename, folder=folder)
+        return SavedFile(stored.path, stored.size, stored.sha256, None)
+
+    # The hash is only known once the stream is written, so land it in a
+    # staging folder first
+    stored = await storage_service.save_stream(chunks, filename, folder="incoming")
+
+    blob_id = uuid.uuid4()
+    stmt = upsert_insert(db, Blob).values(
+        id=blob_id,
+        sha256=stored.sha256,
+        path=storage_service.blob_path(stored.sha256, blob_id),
+        size=stored.size,
+        content_type=storage_service._get_content_type(filename),
+        ref_count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"ref_count": Blob.ref_count + 1}
+    ).returning(Blob.id, Blob.path)
+    try:
+        async with db.begin_nested():
+            # The row stays locked until the caller commits, so a concurrent
+            # release can't drop the blob in between
+            row = (await db.execute(stmt)).one()
+            if row.id == blob_id:
+                await storage_service.move_file(stored.path, row.path)
+            else:
+                logger.info(f"Deduplicated {filename} into blob {row.id}")
+                await storage_service.delete_file(stored.path)
+    except Exception:
+        await storage_service.delete_file(stored.path)
+        raise
+
+    return SavedFile(row.path, stored.size, stored.sha256, row.id)
+
+
+async def release_blob(db: AsyncSession, blob_id: UUID, count: int = 1) -> Optional[str]:
+    """Drop ``count`` references; returns the object path to delete if they were the last
+
+    Delete the object only after committing, so a rollback never leaves a
+    blob row pointing at a missing object.
+    """
+    result = await db.execute(
+        update(Blob)
+        .where(Blob.id == blob_id)
+        .values(ref_count=Blob.ref_count - count)
+        .returning(Blob.ref_count, Blob.path)
+    )
+    row = result.one_or_none()
+    if row is None or row.ref_count > 0:
+        return None
+
+    await db.execute(delete(Blob).where(Blob.id == blob_id, Blob.ref_count <= 0))
+    return row.path
+
+
+async def release_submission_files(db: AsyncSession, *criteria) -> List[str]:
+    """Release the storage held by the submission files matching ``criteria``
+
+    ``criteria`` filter Submission, Assignment or Classroom. Call before
+    deleting a parent whose cascade removes the files; returns the object
+    paths (orphaned blobs and files outside the blob store) to delete
+    after committing.
+    """
+    rows = (await db.execute(
+        select(SubmissionFile.id, SubmissionFile.blob_id, SubmissionFile.file_path)
+        .join(Submission, SubmissionFile.submission_id == Submission.id)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Classroom, Assignment.classroom_id == Classroom.id)
+        .where(*criteria)
+    )).all()
+    if not rows:
+        return []
+
+    orphan_paths = [row.file_path for row in rows if row.blob_id is None]
+    for blob_id, count in Counter(row.blob_id for row in rows if row.blob_id).items():
+        path = await release_blob(db, blob_id, count)
+        if path:
+            orphan_paths.append(path)
+
+    # Keep OCR job history, detached from the files
+    await db.execute(
+        update(OCRJob).where(OCRJob.file_id.in_([row.id for row in rows])).values(file_id=None)
+    )
+    return orphan_paths
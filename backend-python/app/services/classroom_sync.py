@@ -0,0 +1,492 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from itertools import zip_longest
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.bulk import upsert_insert, chunked
+from app.db.models import Classroom, Assignment, Student, Enrollment, Submission
+from app.services.google_classroom import GoogleClassroomService
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Treat naive datetimes (SQLite drops the offset) as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def extract_student_answers(
+    service: GoogleClassroomService,
+    submission_data: Dict[str, Any],
+    download_drive_files: bool = False
+) -> Dict[str, Any]:
+    """Build the student_answers payload from a Google submission resource"""
+    student_answers = {}
+    if submission_data.get("shortAnswerSubmission"):
+        student_answers["type"] = "short_answer"
+        student_answers["answer"] = submission_data["shortAnswerSubmission"].get("answer", "")
+    elif submission_data.get("multipleChoiceSubmission"):
+        student_answers["type"] = "multiple_choice"
+        student_answers["answer"] = submission_data["multipleChoiceSubmission"].get("answer", "")
+    elif submission_data.get("assignmentSubmission"):
+        student_answers["type"] = "assignment"
+        attachments = submission_data["assignmentSubmission"].get("attachments", [])
+        student_answers["attachments"] = attachments
+
+        # Extract text from link or drive file attachments
+        text_content = []
+        drive_attachments = []
+
+        for att in attachments:
+            if att.get("link"):
+                text_content.append(f"Link: {att['link'].get('url', '')}")
+            elif att.get("driveFile"):
+                file_title = att["driveFile"].get("title", "untitled")
+                text_content.append(f"Drive File: {file_title}")
+                drive_attachments.append(att)
+
+        student_answers["text"] = "\n".join(text_content)
+
+        # Automatically download and extract Drive file content; downloads run
+        # in parallel, bounded by the shared Drive download pool
+        drive_files_content = []
+        if download_drive_files and drive_attachments:
+            downloads = await asyncio.gather(
+                *(service.download_attachment(att) for att in drive_attachments),
+                return_exceptions=True
+            )
+            for att, file_content in zip(drive_attachments, downloads):
+                file_title = att["driveFile"].get("title", "untitled")
+                if isinstance(file_content, Exception):
+                    logger.warning(f"Could not download Drive file {file_title}: {file_content}")
+                    continue
+                extracted_text = file_content.decode('utf-8', errors='ignore')
+                if len(extracted_text.strip()) > 10 and '\x00' not in extracted_text[:100]:
+                    drive_files_content.append(f"--- {file_title} ---\n{extracted_text}")
+                    logger.info(f"Auto-extracted text from {file_title}: {len(extracted_text)} chars")
+                else:
+                    logger.info(f"Could not extract text from {file_title}, treating as binary")
+
+        # Add extracted Drive file content if available
+        if drive_files_content:
+            student_answers["extracted_text"] = "\n\n".join(drive_files_content)
+
+    return student_answers
+
+
+class ClassroomSync:
+    """One sync run of a local classroom against Google Classroom
+
+    Incremental by default: coursework is listed newest-first and only items
+    whose ``updateTime`` is past ``Classroom.sync_watermark`` are applied;
+    submissions come from a single course-wide listing and only rows newer
+    than their ``Assignment.sync_watermark`` (plus rows not stored yet or
+    still missing answers) are processed, so unchanged submissions cost no
+    per-submission gets. ``full=True`` ignores watermarks. Watermarks only
+    advance when every row of the step was applied.
+    """
+
+    def __init__(self, db: AsyncSession, classroom: Classroom, service: GoogleClassroomService, full: bool = False):
+        self.db = db
+        self.classroom = classroom
+        self.service = service
+        self.full = full or classroom.sync_watermark is None
+        self.assignments_synced = 0
+        self.students_synced = 0
+        self.submissions_synced = 0
+        self.submissions_skipped = 0
+
+    async def run(self) -> Dict[str, Any]:
+        """Sync assignments, students and submissions, then commit"""
+        course_id = self.classroom.google_classroom_id
+        watermark = None if self.full else as_utc(self.classroom.sync_watermark)
+
+        # The three Google listings are independent, so fetch them concurrently;
+        # database work below stays sequential on the one session
+        google_assignments, google_students, google_submissions = await asyncio.gather(
+            self.service.list_course_work(course_id, updated_after=watermark),
+            self.service.list_students(course_id),
+            self.service.list_student_submissions(
+                course_id=course_id,
+                coursework_id="-",
+                states=["TURNED_IN", "RETURNED"]
+            ),
+            return_exceptions=True
+        )
+
+        try:
+            await self.sync_assignments(google_assignments)
+            await self.push_local_assignments()
+        except Exception as e:
+            logger.warning(f"Failed to sync assignments: {e}")
+
+        try:
+            await self.sync_students(google_students)
+        except Exception as e:
+            logger.warning(f"Failed to sync students: {e}")
+
+        try:
+            await self.sync_submissions(google_submissions)
+        except Exception as e:
+            logger.warning(f"Failed to sync submissions: {e}")
+
+        # Update classroom sync timestamp
+        self.classroom.last_sync_at = datetime.utcnow()
+
+        await self.db.commit()
+
+        return {
+            "message": "Successfully synced classroom",
+            "mode": "full" if self.full else "incremental",
+            "assignments_synced": self.assignments_synced,
+            "students_synced": self.students_synced,
+            "submissions_synced": self.submissions_synced,
+            "submissions_skipped": self.submissions_skipped
+        }
+
+    async def sync_assignments(self, google_assignments: Union[List[Dict[str, Any]], Exception]):
+        """Apply coursework changed since the classroom watermark"""
+        if isinstance(google_assignments, Exception):
+            raise google_assignments
+        watermark = None if self.full else as_utc(self.classroom.sync_watermark)
+
+        # Prefetch the classroom's linked assignments once
+        result = await self.db.execute(
+            select(Assignment).where(
+                Assignment.classroom_id == self.classroom.id,
+                Assignment.google_assignment_id.isnot(None)
+            )
+        )
+        existing_assignments = {a.google_assignment_id: a for a in result.scalars().all()}
+
+        newest = watermark
+        for ga in google_assignments:
+            existing = existing_assignments.get(ga["id"])
+
+            if not existing:
+                # Create new assignment
+                new_assignment = Assignment(
+                    classroom_id=self.classroom.id,
+                    google_assignment_id=ga["id"],
+                    title=ga.get("title", "Untitled Assignment"),
+                    description=ga.get("description", ""),
+                    assignment_type=ga.get("workType", "ASSIGNMENT"),
+                    max_points=ga.get("maxPoints", 100),
+                    due_date=self.service.parse_due_date(ga.get("dueDate")),
+                    instructions=ga.get("description", "")
+                )
+                self.db.add(new_assignment)
+                self.assignments_synced += 1
+            else:
+                # Update existing assignment
+                existing.title = ga.get("title", "Untitled Assignment")
+                existing.description = ga.get("description", "")
+                existing.max_points = ga.get("maxPoints", 100)
+                existing.due_date = self.service.parse_due_date(ga.get("dueDate"))
+                existing.instructions = ga.get("description", "")
+
+            updated_at = self.service.parse_timestamp(ga.get("updateTime"))
+            if updated_at and (newest is None or updated_at > newest):
+                newest = updated_at
+
+        self.classroom.sync_watermark = newest
+
+    async def push_local_assignments(self):
+        """Create local assignments without Google IDs in Google Classroom"""
+        result = await self.db.execute(
+            select(Assignment).where(
+                Assignment.classroom_id == self.classroom.id,
+                Assignment.google_assignment_id.is_(None)
+            )
+        )
+        local_assignments = result.scalars().all()
+
+        created = await asyncio.gather(*(
+            self.service.create_course_work(
+                course_id=self.classroom.google_classroom_id,
+                title=assignment.title,
+                description=assignment.description or "",
+                instructions=assignment.instructions or "",
+                due_date=assignment.due_date,
+                max_points=assignment.max_points,
+                work_type=assignment.assignment_type or "ASSIGNMENT"
+            )
+            for assignment in local_assignments
+        ), return_exceptions=True)
+
+        for assignment, google_assignment in zip(local_assignments, created):
+            if isinstance(google_assignment, Exception):
+                logger.warning(f"Failed to push assignment '{assignment.title}' to Google: {google_assignment}")
+                continue
+
+            # Update local assignment with Google ID
+            assignment.google_assignment_id = google_assignment["id"]
+            self.assignments_synced += 1
+            logger.info(f"Pushed assignment '{assignment.title}' to Google Classroom")
+
+    async def sync_students(self, google_students: Union[List[Dict[str, Any]], Exception]):
+        """Reconcile the roster with a constant number of queries
+
+        Existing students are prefetched by Google ID and email, new ones are
+        inserted with one upsert per chunk and enrollments with ON CONFLICT
+        DO NOTHING.
+        """
+        if isinstance(google_students, Exception):
+            raise google_students
+
+        roster: Dict[str, Dict[str, Any]] = {}
+        for gs in google_students:
+            profile = gs.get("profile", {})
+            google_id = profile.get("id")
+
+            # Skip if no Google ID (essential for identification)
+            if not google_id:
+                continue
+
+            roster[google_id] = {
+                "email": profile.get("emailAddress"),
+                "name": profile.get("name", {}).get("fullName", "Unknown Student"),
+            }
+
+        if not roster:
+            return
+
+        # Prefetch existing students by Google ID or email
+        emails = [info["email"] for info in roster.values() if info["email"]]
+        by_google_id: Dict[str, Student] = {}
+        by_email: Dict[str, Student] = {}
+        for google_ids, email_chunk in zip_longest(chunked(roster), chunked(emails), fillvalue=[]):
+            result = await self.db.execute(
+                select(Student).where(or_(Student.google_id.in_(google_ids), Student.email.in_(email_chunk)))
+            )
+            for student in result.scalars().all():
+                if student.google_id:
+                    by_google_id[student.google_id] = student
+                by_email[student.email] = student
+
+        student_ids: Dict[str, UUID] = {}
+        new_students = []
+        for google_id, info in roster.items():
+            email, name = info["email"], info["name"]
+            student = by_google_id.get(google_id) or (by_email.get(email) if email else None)
+
+            if not student:
+                # Generate a placeholder email if none provided
+                new_students.append({
+                    "id": uuid.uuid4(),
+                    "google_id": google_id,
+                    "email": email or f"student_{google_id}@noemail.local",
+                    "name": name,
+                    "is_active": True,
+                })
+                continue
+
+            # Update existing student with any new info (flushed as one executemany)
+            if email and student.email.endswith("@noemail.local"):
+                student.email = email
+            if name and name != "Unknown Student" and student.name != name:
+                student.name = name
+            student_ids[google_id] = student.id
+
+        for chunk in chunked(new_students):
+            stmt = upsert_insert(self.db, Student).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Student.google_id],
+                set_={"name": stmt.excluded.name}
+            ).returning(Student.id, Student.google_id)
+            result = await self.db.execute(stmt)
+            student_ids.update({google_id: student_id for student_id, google_id in result.all()})
+
+        # Enroll students that are not enrolled yet
+        result = await self.db.execute(
+            select(Enrollment.student_id).where(Enrollment.classroom_id == self.classroom.id)
+        )
+        enrolled = set(result.scalars().all())
+        new_enrollments = [
+            {"id": uuid.uuid4(), "classroom_id": self.classroom.id, "student_id": student_id}
+            for student_id in set(student_ids.values()) if student_id not in enrolled
+        ]
+
+        for chunk in chunked(new_enrollments):
+            stmt = upsert_insert(self.db, Enrollment).values(chunk).on_conflict_do_nothing(
+                index_elements=[Enrollment.classroom_id, Enrollment.student_id]
+            )
+            await self.db.execute(stmt)
+
+        self.students_synced += len(new_enrollments)
+
+    async def sync_submissions(self, google_submissions: Union[List[Dict[str, Any]], Exception]):
+        """Apply submissions changed since each assignment's watermark"""
+        if isinstance(google_submissions, Exception):
+            raise google_submissions
+
+        await self.db.flush()
+        result = await self.db.execute(
+            select(Assignment).where(
+                Assignment.classroom_id == self.classroom.id,
+                Assignment.google_assignment_id.isnot(None)
+            )
+        )
+        assignments = {a.google_assignment_id: a for a in result.scalars().all()}
+        if not assignments:
+            return
+
+        listed = [
+            (assignments[gs["courseWorkId"]], gs)
+            for gs in google_submissions
+            if gs.get("courseWorkId") in assignments and gs.get("id") and gs.get("userId")
+        ]
+
+        existing: Dict[str, Submission] = {}
+        for chunk in chunked([gs["id"] for _, gs in listed]):
+            result = await self.db.execute(
+                select(Submission).where(Submission.google_submission_id.in_(chunk))
+            )
+            existing.update({s.google_submission_id: s for s in result.scalars().all()})
+
+        changed = []
+        for assignment, gs in listed:
+            updated_at = self.service.parse_timestamp(gs.get("updateTime"))
+            watermark = None if self.full else as_utc(assignment.sync_watermark)
+            local = existing.get(gs["id"])
+            # Rows that never made it in, or are still missing answers, are
+            # retried whatever their age
+            if (
+                watermark and updated_at and updated_at <= watermark
+                and local is not None and local.student_answers is not None
+            ):
+                self.submissions_skipped += 1
+                continue
+
+            changed.append((assignment, gs, updated_at))
+
+        if not changed:
+            return
+
+        # Prefetch students for the changed rows
+        student_ids: Dict[str, UUID] = {}
+        for chunk in chunked({gs["userId"] for _, gs, _ in changed}):
+            result = await self.db.execute(
+                select(Student.google_id, Student.id).where(Student.google_id.in_(chunk))
+            )
+            student_ids.update(dict(result.all()))
+
+        # Full details for new submissions and ones still missing answers,
+        # coalesced into batch HTTP requests
+        details = await self.service.batch_get_student_submissions(
+            self.classroom.google_classroom_id,
+            [
+                (assignment.google_assignment_id, gs["id"])
+                for assignment, gs, _ in changed
+                if gs["id"] not in existing or existing[gs["id"]].student_answers is None
+            ]
+        )
+
+        # Assignments with a row that could not be fully applied keep their
+        # watermark, so the row is retried on the next sync
+        failed = set()
+        rows = []
+        for assignment, gs, updated_at in changed:
+            student_id = student_ids.get(gs["userId"])
+            if not student_id:
+                logger.warning(f"Student with Google ID {gs['userId']} not found for submission {gs['id']}")
+                failed.add(assignment.google_assignment_id)
+                continue
+            if isinstance(details.get(gs["id"]), Exception):
+                failed.add(assignment.google_assignment_id)
+            rows.append((assignment, gs, updated_at, student_id))
+
+        # Building rows only touches in-memory objects, so run them together;
+        # Drive downloads among them share the bounded download pool
+        outcomes = await asyncio.gather(*(
+            self.update_submission(existing[gs["id"]], gs, details.get(gs["id"]))
+            if gs["id"] in existing
+            else self.build_submission(assignment, student_id, gs, details.get(gs["id"]))
+            for assignment, gs, _, student_id in rows
+        ), return_exceptions=True)
+
+        newest: Dict[str, datetime] = {}
+        new_submissions = []
+        for (assignment, gs, updated_at, _), outcome in zip(rows, outcomes):
+            key = assignment.google_assignment_id
+            if isinstance(outcome, Exception):
+                logger.warning(f"Failed to sync submission {gs['id']} for assignment {assignment.title}: {outcome}")
+                failed.add(key)
+                continue
+            if gs["id"] not in existing:
+                new_submissions.append(outcome)
+
+            if updated_at and (key not in newest or updated_at > newest[key]):
+                newest[key] = updated_at
+
+        for chunk in chunked(new_submissions):
+            stmt = upsert_insert(self.db, Submission).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Submission.google_submission_id],
+                set_={"status": stmt.excluded.status, "total_score": stmt.excluded.total_score}
+            )
+            await self.db.execute(stmt)
+        self.submissions_synced += len(new_submissions)
+
+        for key, updated_at in newest.items():
+            assignment = assignments[key]
+            current = as_utc(assignment.sync_watermark)
+            if key not in failed and (current is None or updated_at > current):
+                assignment.sync_watermark = updated_at
+
+    async def build_submission(
+        self,
+        assignment: Assignment,
+        student_id: UUID,
+        gs: Dict[str, Any],
+        full_submission: Union[Dict[str, Any], Exception, None]
+    ) -> Dict[str, Any]:
+        """Row values for a submission that does not exist locally yet"""
+        submission_id = gs["id"]
+
+        if not isinstance(full_submission, dict):
+            logger.error(f"Failed to fetch full submission details for {submission_id}: {full_submission}")
+            full_submission = gs  # Fallback to basic submission data
+
+        student_answers = await extract_student_answers(self.service, full_submission)
+
+        return {
+            "id": uuid.uuid4(),
+            "assignment_id": assignment.id,
+            "student_id": student_id,
+            "google_submission_id": submission_id,
+            "status": "submitted" if gs.get("state") == "TURNED_IN" else "returned",
+            "submitted_at": self.service.parse_timestamp(gs.get("creationTime")),
+            "total_score": full_submission.get("assignedGrade"),
+            "student_answers": student_answers if student_answers else None,
+        }
+
+    async def update_submission(
+        self,
+        existing_submission: Submission,
+        gs: Dict[str, Any],
+        full_submission: Union[Dict[str, Any], Exception, None]
+    ):
+        """Refresh status, grade and (if missing) answers of a local submission"""
+        existing_submission.status = "submitted" if gs.get("state") == "TURNED_IN" else "returned"
+        if gs.get("assignedGrade"):
+            existing_submission.total_score = gs.get("assignedGrade")
+
+        # If student_answers is null, fill them from the full submission details
+        if existing_submission.student_answers is None:
+            if isinstance(full_submission, Exception):
+                raise full_submission
+            student_answers = await extract_student_answers(
+                self.service, full_submission or gs, download_drive_files=True
+            )
+            if student_answers:
+                existing_submission.student_answers = student_answers
+                logger.info(f"Updated student answers for submission {gs['id']}")
@@ -1,16 +1,65 @@
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union, BinaryIO
+import asyncio
+import io
+import hashlib
 import logging
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import httplib2
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
 
 from app.core.config import settings
+from app.core.rate_limit import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Google API calls are blocking; run them here instead of on the event loop
+google_api_executor = ThreadPoolExecutor(
+    max_workers=settings.GOOGLE_API_MAX_WORKERS,
+    thread_name_prefix="google-api"
+)
+
+# Client-side pacing under the Classroom per-user quota
+google_api_quota = TokenBucket(
+    rate=settings.GOOGLE_API_RATE_PER_SECOND,
+    capacity=settings.GOOGLE_API_BURST
+)
+
+# Drive downloads stream on their own pool so large files can't starve
+# API calls; its size bounds parallel downloads per process
+drive_download_executor = ThreadPoolExecutor(
+    max_workers=settings.DRIVE_DOWNLOAD_CONCURRENCY,
+    thread_name_prefix="drive-download"
+)
+
+# Google-native files are exported instead of downloaded
+EXPORT_MIME_TYPES = {
+    'application/vnd.google-apps.document': 'text/plain',
+    'application/vnd.google-apps.spreadsheet': 'text/csv',
+    'application/vnd.google-apps.presentation': 'text/plain',
+}
+GOOGLE_APPS_LINK_MARKERS = {
+    'docs.google.com/document/': 'application/vnd.google-apps.document',
+    'docs.google.com/spreadsheets/': 'application/vnd.google-apps.spreadsheet',
+    'docs.google.com/presentation/': 'application/vnd.google-apps.presentation',
+}
+UNKNOWN_MIME_TYPE = 'unknown'
+
+# Upper bound of calls per Google batch HTTP request
+BATCH_SIZE = 100
+
+# Refresh access tokens this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
 
 class GoogleClassroomService:
     """Service for interacting with Google Classroom API"""
@@ -18,10 +67,18 @@ class GoogleClassroomService:
     def __init__(self, refresh_token: str):
         self.refresh_token = refresh_token
         self.service = None
+        self.credentials = None
+        self._drive = None
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize Google Classroom service with credentials"""
+        """Initialize Google Classroom service with credentials
+        
+        No network calls: the access token is obtained lazily and the
+        discovery document ships with the client library.
+        """
         try:
             # Create credentials from refresh token
             creds = Credentials(
@@ -33,16 +90,93 @@ class GoogleClassroomService:
                 scopes=settings.GOOGLE_CLASSROOM_SCOPES
             )
             
-            # Refresh the token
-            creds.refresh(Request())
-            
             # Build the service
-            self.service = build('classroom', 'v1', credentials=creds)
+            self.credentials = creds
+            self.service = build('classroom', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
             
         except Exception as e:
             logger.error(f"Failed to initialize Google Classroom service: {e}")
             raise
     
+    @property
+    def drive(self):
+        """Drive client sharing this service's credentials (built once)"""
+        if self._drive is None:
+            self._drive = build('drive', 'v3', credentials=self.credentials, static_discovery=True, cache_discovery=False)
+        return self._drive
+    
+    def _ensure_token(self):
+        """Refresh the access token only when missing or about to expire"""
+        with self._refresh_lock:
+            creds = self.credentials
+            expiry = creds.expiry  # naive UTC
+            if creds.token and expiry and expiry - TOKEN_REFRESH_MARGIN > datetime.utcnow():
+                return
+            creds.refresh(Request())
+    
+    def _http(self) -> AuthorizedHttp:
+        """Per-thread authorized transport (httplib2 is not thread-safe)"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+    
+    async def _execute(self, request, cost: int = 1):
+        """Execute an API request on the worker pool, paced by the quota bucket"""
+        await google_api_quota.acquire(cost)
+        loop = asyncio.get_running_loop()
+        
+        def execute():
+            try:
+                self._ensure_token()
+            except RefreshError:
+                # Revoked or expired grant: don't keep serving this instance
+                google_service_cache.invalidate(self.refresh_token)
+                raise
+            return request.execute(http=self._http())
+        
+        return await loop.run_in_executor(google_api_executor, execute)
+    
+    async def batch_get_student_submissions(
+        self,
+        course_id: str,
+        items: List[Tuple[str, str]]
+    ) -> Dict[str, Union[Dict[str, Any], Exception]]:
+        """Get many submissions via batch HTTP requests
+        
+        ``items`` are ``(coursework_id, submission_id)`` pairs. Returns the
+        submission resource (or the per-call error) keyed by submission id.
+        Batches of up to 100 calls are sent concurrently.
+        """
+        results: Dict[str, Union[Dict[str, Any], Exception]] = {}
+        
+        def callback(request_id, response, exception):
+            results[request_id] = exception if exception is not None else response
+        
+        async def send(chunk: List[Tuple[str, str]]):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for coursework_id, submission_id in chunk:
+                batch.add(
+                    self.service.courses().courseWork().studentSubmissions().get(
+                        courseId=course_id,
+                        courseWorkId=coursework_id,
+                        id=submission_id
+                    ),
+                    request_id=submission_id
+                )
+            try:
+                await self._execute(batch, cost=len(chunk))
+            except Exception as e:
+                logger.error(f"Batch submission request failed: {e}")
+                for _, submission_id in chunk:
+                    results.setdefault(submission_id, e)
+        
+        await asyncio.gather(*(
+            send(items[i:i + BATCH_SIZE]) for i in range(0, len(items), BATCH_SIZE)
+        ))
+        return results
+    
     async def list_courses(self, course_states: List[str] = None) -> List[Dict[str, Any]]:
         """List all courses (classrooms) for the authenticated teacher"""
         if not course_states:
@@ -59,7 +193,7 @@ class GoogleClassroomService:
                     pageToken=page_token
                 )
                 
-                response = request.execute()
+                response = await self._execute(request)
                 courses.extend(response.get('courses', []))
                 
                 page_token = response.get('nextPageToken')
@@ -75,14 +209,23 @@ class GoogleClassroomService:
     async def get_course(self, course_id: str) -> Dict[str, Any]:
         """Get a specific course"""
         try:
-            course = self.service.courses().get(id=course_id).execute()
+            course = await self._execute(self.service.courses().get(id=course_id))
             return course
         except HttpError as e:
             logger.error(f"Failed to get course {course_id}: {e}")
             raise Exception(f"Course not found: {e}")
     
-    async def list_course_work(self, course_id: str) -> List[Dict[str, Any]]:
-        """List all assignments (coursework) for a course"""
+    async def list_course_work(
+        self,
+        course_id: str,
+        updated_after: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """List assignments (coursework) for a course
+        
+        With ``updated_after`` the listing is ordered by updateTime and stops
+        at the first item that is not newer, so only changed coursework is
+        fetched.
+        """
         try:
             coursework = []
             page_token = None
@@ -91,11 +234,20 @@ class GoogleClassroomService:
                 request = self.service.courses().courseWork().list(
                     courseId=course_id,
                     pageSize=100,
-                    pageToken=page_token
+                    pageToken=page_token,
+                    orderBy="updateTime desc" if updated_after else None
                 )
                 
-                response = request.execute()
-                coursework.extend(response.get('courseWork', []))
+                response = await self._execute(request)
+                page = response.get('courseWork', [])
+                
+                if updated_after:
+                    newer = [cw for cw in page if self.parse_timestamp(cw.get('updateTime')) > updated_after]
+                    coursework.extend(newer)
+                    if len(newer) < len(page):
+                        break
+                else:
+                    coursework.extend(page)
                 
                 page_token = response.get('nextPageToken')
                 if not page_token:
@@ -110,10 +262,10 @@ class GoogleClassroomService:
     async def get_course_work(self, course_id: str, coursework_id: str) -> Dict[str, Any]:
         """Get a specific assignment"""
         try:
-            coursework = self.service.courses().courseWork().get(
+            coursework = await self._execute(self.service.courses().courseWork().get(
                 courseId=course_id,
                 id=coursework_id
-            ).execute()
+            ))
             return coursework
         except HttpError as e:
             logger.error(f"Failed to get coursework {coursework_id}: {e}")
@@ -166,10 +318,10 @@ class GoogleClassroomService:
                 }
             
             # Create the assignment
-            coursework = self.service.courses().courseWork().create(
+            coursework = await self._execute(self.service.courses().courseWork().create(
                 courseId=course_id,
                 body=coursework_body
-            ).execute()
+            ))
             
             return coursework
             
@@ -189,10 +341,10 @@ class GoogleClassroomService:
         """Update an existing assignment in Google Classroom"""
         try:
             # Get current coursework
-            current = self.service.courses().courseWork().get(
+            current = await self._execute(self.service.courses().courseWork().get(
                 courseId=course_id,
                 id=coursework_id
-            ).execute()
+            ))
             
             # Prepare update body
             update_body = current.copy()
@@ -226,12 +378,12 @@ class GoogleClassroomService:
                 return current  # Nothing to update
             
             # Update the assignment
-            coursework = self.service.courses().courseWork().patch(
+            coursework = await self._execute(self.service.courses().courseWork().patch(
                 courseId=course_id,
                 id=coursework_id,
                 updateMask=",".join(update_mask),
                 body=update_body
-            ).execute()
+            ))
             
             return coursework
             
@@ -245,7 +397,11 @@ class GoogleClassroomService:
         coursework_id: str,
         states: List[str] = None
     ) -> List[Dict[str, Any]]:
-        """List all student submissions for an assignment"""
+        """List all student submissions for an assignment
+        
+        Pass ``coursework_id="-"`` to list submissions across every
+        assignment of the course in one paged listing.
+        """
         if not states:
             states = ['TURNED_IN', 'RETURNED']
         
@@ -262,7 +418,7 @@ class GoogleClassroomService:
                     pageToken=page_token
                 )
                 
-                response = request.execute()
+                response = await self._execute(request)
                 submissions.extend(response.get('studentSubmissions', []))
                 
                 page_token = response.get('nextPageToken')
@@ -283,11 +439,11 @@ class GoogleClassroomService:
     ) -> Dict[str, Any]:
         """Get a specific student submission"""
         try:
-            submission = self.service.courses().courseWork().studentSubmissions().get(
+            submission = await self._execute(self.service.courses().courseWork().studentSubmissions().get(
                 courseId=course_id,
                 courseWorkId=coursework_id,
                 id=submission_id
-            ).execute()
+            ))
             return submission
         except HttpError as e:
             logger.error(f"Failed to get submission {submission_id}: {e}")
@@ -312,20 +468,20 @@ class GoogleClassroomService:
             
             # First, patch the submission with grades
             if body:
-                self.service.courses().courseWork().studentSubmissions().patch(
+                await self._execute(self.service.courses().courseWork().studentSubmissions().patch(
                     courseId=course_id,
                     courseWorkId=coursework_id,
                     id=submission_id,
                     updateMask=','.join(body.keys()),
                     body=body
-                ).execute()
+                ))
             
             # Then return the submission
-            result = self.service.courses().courseWork().studentSubmissions().return_(
+            result = await self._execute(self.service.courses().courseWork().studentSubmissions().return_(
                 courseId=course_id,
                 courseWorkId=coursework_id,
                 id=submission_id
-            ).execute()
+            ))
             
             return result
             
@@ -346,7 +502,7 @@ class GoogleClassroomService:
                     pageToken=page_token
                 )
                 
-                response = request.execute()
+                response = await self._execute(request)
                 students.extend(response.get('students', []))
                 
                 page_token = response.get('nextPageToken')
@@ -359,8 +515,49 @@ class GoogleClassroomService:
             logger.error(f"Failed to list students for course {course_id}: {e}")
             raise Exception(f"Failed to get students: {e}")
     
-    async def download_attachment(self, attachment: Dict[str, Any]) -> bytes:
-        """Download an attachment from Google Drive"""
+    def _drive_mime_type(self, drive_file: Dict[str, Any]) -> Optional[str]:
+        """Mime type from the attachment payload, without a metadata call
+        
+        Classroom's DriveFile carries no mimeType, but its alternateLink tells
+        Google-native files apart. None means a regular (binary) Drive file.
+        """
+        if drive_file.get('mimeType'):
+            return drive_file['mimeType']
+        link = drive_file.get('alternateLink') or ''
+        for marker, mime_type in GOOGLE_APPS_LINK_MARKERS.items():
+            if marker in link:
+                return mime_type
+        if '/file/d/' in link:
+            return None
+        return UNKNOWN_MIME_TYPE
+    
+    async def _download(self, request, fd: BinaryIO):
+        """Stream a media request into ``fd`` in chunks on the download pool"""
+        await google_api_quota.acquire()
+        loop = asyncio.get_running_loop()
+        
+        def download():
+            try:
+                self._ensure_token()
+            except RefreshError:
+                google_service_cache.invalidate(self.refresh_token)
+                raise
+            # MediaIoBaseDownload uses the request's transport; give it this
+            # thread's own
+            request.http = self._http()
+            downloader = MediaIoBaseDownload(fd, request, chunksize=settings.DRIVE_DOWNLOAD_CHUNK_SIZE)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk(num_retries=3)
+        
+        await loop.run_in_executor(drive_download_executor, download)
+    
+    async def download_attachment_to(self, attachment: Dict[str, Any], fd: BinaryIO) -> Optional[str]:
+        """Download a Drive attachment into ``fd`` without holding it in memory
+        
+        Google Docs/Slides export as text and Sheets as CSV. Returns the
+        content's mime type when known (export type or Drive mime type).
+        """
         try:
             # Get the Drive file ID from the attachment
             drive_file = attachment.get('driveFile')
@@ -376,49 +573,36 @@ class GoogleClassroomService:
             
             # Use the Drive API to download the file
             # Note: This requires the Drive API to be enabled and proper scopes
-            drive_service = build('drive', 'v3', credentials=self.service._http.credentials)
-            
-            # Get file metadata first
-            try:
-                file_metadata = drive_service.files().get(fileId=file_id).execute()
-                logger.info(f"File metadata: {file_metadata.get('mimeType', 'unknown')} - {file_metadata.get('name', file_title)}")
-            except HttpError as e:
-                if e.resp.status == 403:
-                    raise Exception(f"Access denied to Drive file '{file_title}'. Make sure the teacher has access to the file and Google Drive scope is granted.")
-                elif e.resp.status == 404:
-                    raise Exception(f"Drive file '{file_title}' not found. The file may have been deleted or moved.")
-                else:
-                    raise Exception(f"Failed to get file metadata for '{file_title}': {e}")
+            drive_service = self.drive
+            
+            mime_type = self._drive_mime_type(drive_file)
+            if mime_type == UNKNOWN_MIME_TYPE:
+                # Only ask Drive when the payload doesn't tell us
+                try:
+                    file_metadata = await self._execute(drive_service.files().get(fileId=file_id, fields='mimeType,name'))
+                    mime_type = file_metadata.get('mimeType')
+                    logger.info(f"File metadata: {mime_type} - {file_metadata.get('name', file_title)}")
+                except HttpError as e:
+                    if e.resp.status == 403:
+                        raise Exception(f"Access denied to Drive file '{file_title}'. Make sure the teacher has access to the file and Google Drive scope is granted.")
+                    elif e.resp.status == 404:
+                        raise Exception(f"Drive file '{file_title}' not found. The file may have been deleted or moved.")
+                    else:
+                        raise Exception(f"Failed to get file metadata for '{file_title}': {e}")
             
             # Download the file
             try:
-                if file_metadata.get('mimeType') == 'application/vnd.google-apps.document':
-                    # Google Docs - export as plain text for immediate reading
-                    file_content = drive_service.files().export(
-                        fileId=file_id,
-                        mimeType='text/plain'
-                    ).execute()
-                    logger.info(f"Exported Google Doc as text: {len(file_content)} bytes")
-                elif file_metadata.get('mimeType') == 'application/vnd.google-apps.spreadsheet':
-                    # Google Sheets - export as CSV
-                    file_content = drive_service.files().export(
-                        fileId=file_id,
-                        mimeType='text/csv'
-                    ).execute()
-                    logger.info(f"Exported Google Sheet as CSV: {len(file_content)} bytes")
-                elif file_metadata.get('mimeType') == 'application/vnd.google-apps.presentation':
-                    # Google Slides - export as plain text
-                    file_content = drive_service.files().export(
-                        fileId=file_id,
-                        mimeType='text/plain'
-                    ).execute()
-                    logger.info(f"Exported Google Slides as text: {len(file_content)} bytes")
-                else:
-                    # Regular file
-                    file_content = drive_service.files().get_media(fileId=file_id).execute()
-                    logger.info(f"Downloaded regular file: {len(file_content)} bytes")
+                export_type = EXPORT_MIME_TYPES.get(mime_type)
+                if export_type:
+                    # Google Docs, Sheets and Slides: export as text/CSV
+                    await self._download(drive_service.files().export_media(fileId=file_id, mimeType=export_type), fd)
+                    logger.info(f"Exported {file_title} as {export_type}")
+                    return export_type
                 
-                return file_content
+                # Regular file
+                await self._download(drive_service.files().get_media(fileId=file_id), fd)
+                logger.info(f"Downloaded regular file {file_title}")
+                return mime_type
                 
             except HttpError as e:
                 if e.resp.status == 403:
@@ -433,6 +617,24 @@ class GoogleClassroomService:
             logger.error(f"Failed to download attachment: {e}")
             raise
     
+    async def download_attachment(self, attachment: Dict[str, Any]) -> bytes:
+        """Download an attachment from Google Drive into memory"""
+        buffer = io.BytesIO()
+        await self.download_attachment_to(attachment, buffer)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+        """Parse a Google API RFC 3339 timestamp (e.g. updateTime) to an aware UTC datetime"""
+        if not value:
+            return None
+        
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+        except ValueError:
+            # Python < 3.11 rejects fractional seconds that are not 3 or 6 digits
+            return datetime.fromisoformat(value.rstrip("Z").split(".")[0]).replace(tzinfo=timezone.utc)
+    
     def parse_due_date(self, due_date_dict: Dict[str, Any]) -> Optional[datetime]:
         """Parse Google Classroom due date format to datetime"""
         if not due_date_dict:
@@ -493,11 +695,11 @@ class GoogleClassroomService:
                 rubric_body["criteria"].append(rubric_criterion)
             
             # Create rubric
-            rubric = self.service.courses().courseWork().rubric().create(
+            rubric = await self._execute(self.service.courses().courseWork().rubric().create(
                 courseId=course_id,
                 courseWorkId=coursework_id,
                 body=rubric_body
-            ).execute()
+            ))
             
             return rubric
             
@@ -508,10 +710,10 @@ class GoogleClassroomService:
     async def get_rubric(self, course_id: str, coursework_id: str) -> Dict[str, Any]:
         """Get rubric for an assignment"""
         try:
-            rubric = self.service.courses().courseWork().rubric().get(
+            rubric = await self._execute(self.service.courses().courseWork().rubric().get(
                 courseId=course_id,
                 courseWorkId=coursework_id
-            ).execute()
+            ))
             return rubric
         except HttpError as e:
             if e.resp.status == 404:
@@ -558,11 +760,11 @@ class GoogleClassroomService:
                 rubric_body["criteria"].append(rubric_criterion)
             
             # Update rubric
-            rubric = self.service.courses().courseWork().rubric().patch(
+            rubric = await self._execute(self.service.courses().courseWork().rubric().patch(
                 courseId=course_id,
                 courseWorkId=coursework_id,
                 body=rubric_body
-            ).execute()
+            ))
             
             return rubric
             
@@ -573,11 +775,57 @@ class GoogleClassroomService:
     async def delete_rubric(self, course_id: str, coursework_id: str) -> bool:
         """Delete a rubric from an assignment"""
         try:
-            self.service.courses().courseWork().rubric().delete(
+            await self._execute(self.service.courses().courseWork().rubric().delete(
                 courseId=course_id,
                 courseWorkId=coursework_id
-            ).execute()
+            ))
             return True
         except HttpError as e:
             logger.error(f"Failed to delete rubric: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class GoogleServiceCache:
+    """Per-teacher GoogleClassroomService instances, reused across requests
+    
+    Keyed by a hash of the refresh token, so a re-authenticated teacher gets
+    a fresh service. Bounded LRU shared by threads and event loops.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._services: "OrderedDict[str, GoogleClassroomService]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+    
+    def get(self, refresh_token: str) -> GoogleClassroomService:
+        key = self._key(refresh_token)
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                self._services.move_to_end(key)
+                return service
+        
+        service = GoogleClassroomService(refresh_token)
+        with self._lock:
+            service = self._services.setdefault(key, service)
+            self._services.move_to_end(key)
+            while len(self._services) > self.max_entries:
+                self._services.popitem(last=False)
+        return service
+    
+    def invalidate(self, refresh_token: str):
+        with self._lock:
+            self._services.pop(self._key(refresh_token), None)
+
+
+# Global instance
+google_service_cache = GoogleServiceCache(max_entries=settings.GOOGLE_SERVICE_CACHE_SIZE)
+
+
+def get_classroom_service(refresh_token: str) -> GoogleClassroomService:
+    """Cached Google Classroom service for a teacher's refresh token"""
+    return google_service_cache.get(refresh_token)
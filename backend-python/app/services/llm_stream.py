@@ -0,0 +1,130 @@
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.core.circuit_breaker import MCPStatusError, circuit_breakers
+from app.core.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+SCORE_PATTERN = re.compile(r'"score"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}\s]')
+FEEDBACK_PATTERN = re.compile(r'"feedback"\s*:\s*"')
+
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class IncrementalJSONExtractor:
+    """Pull ``score`` and ``feedback`` out of a JSON object while it is still streaming
+
+    The model's answer may be wrapped in prose or a code fence, so this does
+    not parse the document; it scans the accumulated text for the two
+    fields and decodes as much of the feedback string as is complete.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.score: Optional[float] = None
+        self.feedback = ""
+        self.feedback_complete = False
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Add a chunk and return the fields that changed (feedback as a delta)"""
+        self.buffer += chunk
+        updates: Dict[str, Any] = {}
+
+        if self.score is None:
+            match = SCORE_PATTERN.search(self.buffer)
+            if match:
+                self.score = float(match.group(1))
+                updates["score"] = self.score
+
+        if not self.feedback_complete:
+            match = FEEDBACK_PATTERN.search(self.buffer)
+            if match:
+                decoded, complete = self._decode_partial_string(self.buffer, match.end())
+                if len(decoded) > len(self.feedback):
+                    updates["feedback_delta"] = decoded[len(self.feedback):]
+                    self.feedback = decoded
+                if complete:
+                    self.feedback_complete = True
+                    updates["feedback_complete"] = True
+
+        return updates
+
+    @staticmethod
+    def _decode_partial_string(text: str, start: int) -> Tuple[str, bool]:
+        """Decode a JSON string body from ``start``; stop before an incomplete escape"""
+        out = []
+        i = start
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                return "".join(out), True
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+
+            if i + 1 >= len(text):
+                break
+            escape = text[i + 1]
+            if escape == 'u':
+                if i + 6 > len(text):
+                    break
+                try:
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    out.append(text[i:i + 6])
+                i += 6
+            else:
+                out.append(JSON_ESCAPES.get(escape, escape))
+                i += 2
+
+        return "".join(out), False
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_mcp_completion(mcp_request: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Stream a completion from the MCP gateway
+
+    Yields ``("delta", {"delta": text})`` per chunk and one final
+    ``("done", summary)``. Error responses raise HTTPStatusError and error
+    events MCPStatusError, both with the gateway's status.
+    """
+    client = http_clients.get("mcp")
+
+    # An open breaker raises before any request is made
+    with circuit_breakers.guard("mcp", f"mcp:{mcp_request['model']}"):
+        async with client.stream("POST", "/generate/stream", json=mcp_request) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                # 5xx count against the model's breaker, 4xx don't
+                response.raise_for_status()
+                raise Exception(f"MCP server error: {response.status_code} - {body.decode(errors='ignore')}")
+
+            event = "message"
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event == "error":
+                        raise MCPStatusError(
+                            f"MCP streaming error: {data.get('error')}",
+                            data.get("status", 500),
+                            data.get("retry_after")
+                        )
+                    if event == "done":
+                        yield "done", data
+                        return
+                    yield "delta", data
+                elif not line:
+                    event = "message"
+
+        raise Exception("MCP stream ended without a completion event")
@@ -0,0 +1,326 @@
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pdf2image
+import pypdf
+from google.cloud import vision
+from google.auth import exceptions as auth_exceptions
+
+from app.core.config import settings
+from app.services.text_layer import extract_text_layer
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_OCR_TYPES = ['.png', '.jpg', '.jpeg', '.pdf', '.bmp', '.gif', '.tiff', '.webp']
+
+# Called with (pages_completed, pages_total) as pages finish
+ProgressCallback = Callable[[int, int], None]
+
+# Global Vision client
+vision_client = None
+
+
+def get_vision_client():
+    """Get or create Google Vision API client"""
+    global vision_client
+    if vision_client is None:
+        try:
+            # Uses Application Default Credentials
+            vision_client = vision.ImageAnnotatorClient()
+            logger.info("Google Vision API client initialized with ADC")
+        except auth_exceptions.DefaultCredentialsError:
+            api_key = os.getenv('GOOGLE_VISION_API_KEY')
+            if api_key and api_key != 'your-google-vision-api-key':
+                # API key authentication would need the REST API directly
+                logger.warning("Google Vision requires service account credentials")
+                raise Exception("OCR service requires Google Cloud service account credentials")
+            logger.warning("No Google Vision API credentials found")
+            raise Exception("OCR service not configured - missing credentials")
+    return vision_client
+
+
+def pdf_page_count(pdf_content: bytes) -> int:
+    return pdf2image.pdfinfo_from_bytes(pdf_content)["Pages"]
+
+
+def iter_pdf_pages(pdf_content: bytes, page_numbers: Optional[List[int]] = None) -> Iterator[Tuple[int, bytes]]:
+    """Rasterise PDF pages one at a time into (page number, encoded image)
+
+    Only one page is decoded at once, so memory stays flat however long the
+    PDF is. ``page_numbers`` (1-based) limits which pages are rendered.
+    """
+    if page_numbers is None:
+        page_numbers = range(1, pdf_page_count(pdf_content) + 1)
+
+    for page_number in page_numbers:
+        images = pdf2image.convert_from_bytes(
+            pdf_content,
+            dpi=settings.OCR_PDF_DPI,
+            grayscale=settings.OCR_PDF_GRAYSCALE,
+            first_page=page_number,
+            last_page=page_number
+        )
+        for image in images:
+            yield page_number, encode_image(image)
+            image.close()
+
+
+def read_text_layer(pdf_content: bytes) -> Optional[List[Optional[dict]]]:
+    """Usable embedded text per page, or None if the PDF can't be parsed"""
+    try:
+        return extract_text_layer(pypdf.PdfReader(io.BytesIO(pdf_content)))
+    except Exception as e:
+        logger.warning(f"Could not read PDF text layer, OCR'ing every page: {e}")
+        return None
+
+
+def encode_image(image) -> bytes:
+    """Encode a PIL image once into a compressed in-memory buffer"""
+    buffer = io.BytesIO()
+    image.save(buffer, format=settings.OCR_IMAGE_FORMAT, optimize=True)
+    return buffer.getvalue()
+
+
+def parse_text_detection(response) -> dict:
+    """Turn one Vision AnnotateImageResponse into our OCR result shape"""
+    if response.error.message:
+        raise Exception(f"Vision API error: {response.error.message}")
+
+    texts = response.text_annotations
+    result = {
+        "text": "",
+        "lines": [],
+        "confidence": 0.0
+    }
+
+    if texts:
+        # First annotation contains the entire detected text
+        result["text"] = texts[0].description
+
+        # Individual text annotations
+        for text in texts[1:]:
+            vertices = [(vertex.x, vertex.y) for vertex in text.bounding_poly.vertices]
+            result["lines"].append({
+                "text": text.description,
+                "bbox": vertices,
+                "confidence": 0.95  # Vision API doesn't provide confidence scores for text detection
+            })
+
+        result["confidence"] = 0.95
+
+    return result
+
+
+class VisionBatcher:
+    """Coalesces single-image requests into batch_annotate_images calls
+
+    Images submitted from any thread wait at most ``window_ms`` to share a
+    batch of up to ``batch_size`` (Vision's per-request limit is 16), and at
+    most ``max_concurrency`` batches are in flight per process. Threads are
+    started lazily and restarted after a fork, so a global instance is safe
+    under Celery's prefork pool.
+    """
+
+    def __init__(self, batch_size: int, window_ms: int, max_concurrency: int):
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.max_concurrency = max_concurrency
+        self.batches_sent = 0
+        self.images_sent = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._slots = threading.BoundedSemaphore(self.max_concurrency)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="vision")
+            threading.Thread(target=self._collect, name="vision-batcher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, content: bytes, languages: Optional[List[str]] = None) -> Future:
+        """Queue one encoded image; the future resolves to its OCR result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((content, languages or [], future))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._slots.acquire()
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            requests = [
+                vision.AnnotateImageRequest(
+                    image=vision.Image(content=content),
+                    features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+                    image_context=vision.ImageContext(language_hints=languages)
+                )
+                for content, languages, _ in batch
+            ]
+            response = get_vision_client().batch_annotate_images(requests=requests)
+            self.batches_sent += 1
+            self.images_sent += len(batch)
+
+            for (_, _, future), image_response in zip(batch, response.responses):
+                try:
+                    future.set_result(parse_text_detection(image_response))
+                except Exception as e:
+                    future.set_exception(e)
+        except Exception as e:
+            logger.error(f"Vision batch of {len(batch)} failed: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "window_ms": int(self.window * 1000),
+            "max_concurrency": self.max_concurrency,
+            "batches_sent": self.batches_sent,
+            "images_sent": self.images_sent,
+        }
+
+
+# Global instance
+vision_batcher = VisionBatcher(
+    batch_size=min(settings.VISION_BATCH_SIZE, 16),
+    window_ms=settings.VISION_BATCH_WINDOW_MS,
+    max_concurrency=settings.VISION_MAX_CONCURRENCY
+)
+
+
+def process_image_with_vision(content: bytes, languages: Optional[List[str]] = None) -> dict:
+    """Process a single encoded image with Google Vision API"""
+    return vision_batcher.submit(content, languages).result()
+
+
+def _page_result(page_number: int, future: Future) -> dict:
+    try:
+        result = future.result()
+        return {
+            "page": page_number,
+            "text": result["text"],
+            "lines": result["lines"],
+            "confidence": result["confidence"]
+        }
+    except Exception as e:
+        logger.error(f"Failed to process page {page_number}: {e}")
+        return {
+            "page": page_number,
+            "text": "",
+            "lines": [],
+            "confidence": 0.0,
+            "error": str(e)
+        }
+
+
+def run_vision_ocr(
+    file_content: bytes,
+    filename: str,
+    languages: Optional[List[str]] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> dict:
+    """OCR an image or PDF with Google Vision, reporting per-page progress
+
+    Blocking; meant to run in a Celery worker. Works entirely in memory.
+    """
+    languages = languages or ["en"]
+    suffix = os.path.splitext(filename)[1].lower()
+
+    if suffix != '.pdf':
+        if on_progress:
+            on_progress(0, 1)
+        result = process_image_with_vision(file_content, languages)
+        if on_progress:
+            on_progress(1, 1)
+        return {
+            "file_type": "image",
+            "filename": filename,
+            "text": result["text"],
+            "lines": result["lines"],
+            "confidence": result["confidence"],
+            "source": "ocr",
+            "processed_at": datetime.utcnow().isoformat(),
+            "language": languages[0]
+        }
+
+    # Typed pages come straight from the text layer; only the rest are OCR'd
+    text_layer = read_text_layer(file_content)
+    if text_layer is None:
+        text_layer = [None] * pdf_page_count(file_content)
+    page_total = len(text_layer)
+
+    pages = {}
+    for page_number, layer in enumerate(text_layer, 1):
+        if layer:
+            pages[page_number] = {
+                "page": page_number,
+                "text": layer["text"],
+                "lines": [],
+                "confidence": layer["quality"],
+                "source": "text_layer"
+            }
+    ocr_pages = [page_number for page_number, layer in enumerate(text_layer, 1) if not layer]
+    if on_progress:
+        on_progress(len(pages), page_total)
+
+    # Rasterise pages lazily and keep enough in flight to fill every
+    # concurrent batch, but no more, so memory stays bounded
+    max_in_flight = vision_batcher.batch_size * vision_batcher.max_concurrency
+    pending = deque()
+
+    def collect_oldest():
+        page_number, future = pending.popleft()
+        pages[page_number] = {**_page_result(page_number, future), "source": "ocr"}
+        if on_progress:
+            on_progress(len(pages), page_total)
+
+    if ocr_pages:
+        for page_number, page_content in iter_pdf_pages(file_content, ocr_pages):
+            pending.append((page_number, vision_batcher.submit(page_content, languages)))
+            if len(pending) >= max_in_flight:
+                collect_oldest()
+        while pending:
+            collect_oldest()
+
+    results = [pages[page_number] for page_number in sorted(pages)]
+
+    return {
+        "file_type": "pdf",
+        "filename": filename,
+        "pages": len(results),
+        "text": "\n\n".join([r["text"] for r in results if r["text"]]),
+        "page_results": results,
+        "text_layer_pages": page_total - len(ocr_pages),
+        "ocr_pages": len(ocr_pages),
+        "processed_at": datetime.utcnow().isoformat(),
+        "language": languages[0]
+    }
@@ -0,0 +1,66 @@
+"""Content-addressed OCR result cache
+
+Results are keyed on the SHA-256 of the file bytes plus the OCR engine, the
+language set and the engine version, so a re-uploaded or re-synced file
+costs a hash instead of an OCR pass. Bumping an engine version in settings
+invalidates that engine's entries.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.bulk import upsert_insert
+from app.db.models import OCRCache
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def language_key(languages: Optional[Iterable[str]]) -> str:
+    """Order-independent key for a language set"""
+    return ",".join(sorted(set(languages or ["en"])))
+
+
+def _key(digest: str, engine: str, languages) -> dict:
+    return {
+        "content_hash": digest,
+        "engine": engine,
+        "languages": language_key(languages),
+        "engine_version": settings.OCR_ENGINE_VERSIONS.get(engine, "unknown"),
+    }
+
+
+def get_cached_result(db: Session, digest: str, engine: str, languages=None) -> Optional[dict]:
+    """Return a cached OCR result and count the hit, or None on a miss"""
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+
+    key = _key(digest, engine, languages)
+    entry = db.query(OCRCache).filter_by(**key).first()
+    if not entry:
+        logger.info(f"OCR cache miss: {engine} {digest[:12]}")
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_hit_at = datetime.utcnow()
+    db.commit()
+    logger.info(f"OCR cache hit: {engine} {digest[:12]} ({entry.hit_count} hits)")
+    return dict(entry.result)
+
+
+def store_result(db: Session, digest: str, engine: str, languages, result: dict):
+    """Remember an OCR result; a concurrent insert of the same key wins"""
+    if not settings.OCR_CACHE_ENABLED:
+        return
+
+    key = _key(digest, engine, languages)
+    stmt = upsert_insert(db, OCRCache).values(result=result, hit_count=0, **key)
+    db.execute(stmt.on_conflict_do_nothing(index_elements=list(key)))
+    db.commit()
@@ -1,10 +1,15 @@
 import os
+import asyncio
+import hashlib
 import aiofiles
 from pathlib import Path
-from typing import Optional, BinaryIO
+from typing import Optional, BinaryIO, AsyncIterable, AsyncIterator, NamedTuple
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 import logging
 
@@ -12,6 +17,42 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# boto3 calls are blocking; run them here instead of on the event loop
+s3_executor = ThreadPoolExecutor(
+    max_workers=settings.S3_MAX_CONCURRENCY,
+    thread_name_prefix="s3"
+)
+
+
+class FileTooLargeError(Exception):
+    """Raised when a streamed upload exceeds the size limit"""
+    pass
+
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def upload_chunks(file, chunk_size: int = settings.STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read an UploadFile in fixed-size chunks"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def file_chunks(fd: BinaryIO, chunk_size: int = settings.STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a local (e.g. spooled temporary) file in fixed-size chunks"""
+    fd.seek(0)
+    while True:
+        chunk = fd.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
 
 class StorageService:
     """Handle file storage (local or S3)"""
@@ -24,7 +65,9 @@ class StorageService:
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
+                region_name=settings.AWS_REGION,
+                # One pooled connection per executor thread
+                config=BotoConfig(max_pool_connections=settings.S3_MAX_CONCURRENCY)
             )
             self.bucket_name = settings.S3_BUCKET_NAME
         else:
@@ -32,6 +75,124 @@ class StorageService:
             self.upload_dir = Path(settings.UPLOAD_DIR)
             self.upload_dir.mkdir(parents=True, exist_ok=True)
     
+    async def _s3(self, method: str, **kwargs):
+        """Call an S3 client method on the S3 executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(s3_executor, partial(getattr(self.s3_client, method), **kwargs))
+    
+    def _stored_filename(self, filename: str) -> str:
+        # Generate unique filename
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        file_extension = Path(filename).suffix
+        return f"{timestamp}_{unique_id}{file_extension}"
+    
+    async def save_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str,
+        folder: str = "submissions",
+        max_size: int = settings.MAX_FILE_SIZE
+    ) -> StoredFile:
+        """Save a stream of chunks without buffering the whole file
+        
+        Size and SHA-256 are computed on the fly; FileTooLargeError is raised
+        (and the partial file discarded) as soon as ``max_size`` is exceeded.
+        """
+        stored_filename = self._stored_filename(filename)
+        digest = hashlib.sha256()
+        size = 0
+        
+        async def checked_chunks():
+            nonlocal size
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                digest.update(chunk)
+                yield chunk
+        
+        if self.use_s3:
+            key = f"{folder}/{stored_filename}"
+            await self._upload_s3_stream(checked_chunks(), key, self._get_content_type(filename))
+            path = f"s3://{self.bucket_name}/{key}"
+        else:
+            folder_path = self.upload_dir / folder
+            folder_path.mkdir(parents=True, exist_ok=True)
+            
+            file_path = folder_path / stored_filename
+            try:
+                async with aiofiles.open(file_path, 'wb') as f:
+                    async for chunk in checked_chunks():
+                        await f.write(chunk)
+            except BaseException:
+                file_path.unlink(missing_ok=True)
+                raise
+            path = str(file_path)
+        
+        return StoredFile(path=path, size=size, sha256=digest.hexdigest())
+    
+    async def _upload_s3_stream(self, chunks: AsyncIterable[bytes], key: str, content_type: str):
+        """Upload chunks to S3, switching to multipart once a full part is buffered"""
+        part_size = settings.S3_MULTIPART_PART_SIZE
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                if len(buffer) < part_size:
+                    continue
+                if upload_id is None:
+                    upload_id = (await self._s3(
+                        'create_multipart_upload',
+                        Bucket=self.bucket_name,
+                        Key=key,
+                        ContentType=content_type
+                    ))['UploadId']
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                buffer.clear()
+            
+            if upload_id is None:
+                # Small object: one plain PUT
+                await self._s3(
+                    'put_object',
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=bytes(buffer),
+                    ContentType=content_type
+                )
+                return
+            
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._s3(
+                'complete_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except BaseException as e:
+            if upload_id is not None:
+                await self._s3('abort_multipart_upload', Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            if isinstance(e, ClientError):
+                logger.error(f"S3 upload failed: {e}")
+                raise Exception(f"Failed to upload file: {str(e)}")
+            raise
+    
+    async def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = await self._s3(
+            'upload_part',
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+    
     async def save_file(
         self, 
         file_content: bytes, 
@@ -39,17 +200,14 @@ class StorageService:
         folder: str = "submissions"
     ) -> str:
         """Save file and return its path/URL"""
-        # Generate unique filename
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = Path(filename).suffix
-        stored_filename = f"{timestamp}_{unique_id}{file_extension}"
+        stored_filename = self._stored_filename(filename)
         
         if self.use_s3:
             # Save to S3
             key = f"{folder}/{stored_filename}"
             try:
-                self.s3_client.put_object(
+                await self._s3(
+                    'put_object',
                     Bucket=self.bucket_name,
                     Key=key,
                     Body=file_content,
@@ -71,21 +229,59 @@ class StorageService:
             
             return str(file_path)
     
-    async def get_file(self, file_path: str) -> bytes:
-        """Retrieve file content"""
+    async def get_file(self, file_path: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Retrieve file content, optionally only bytes ``start``..``end`` (inclusive)"""
+        ranged = start > 0 or end is not None
         if file_path.startswith("s3://"):
             # Get from S3
             bucket, key = self._parse_s3_path(file_path)
+            params = {'Bucket': bucket, 'Key': key}
+            if ranged:
+                params['Range'] = f"bytes={start}-{'' if end is None else end}"
             try:
-                response = self.s3_client.get_object(Bucket=bucket, Key=key)
-                return response['Body'].read()
+                # Read the body on the executor too; it streams from the socket
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    s3_executor,
+                    lambda: self.s3_client.get_object(**params)['Body'].read()
+                )
             except ClientError as e:
                 logger.error(f"S3 download failed: {e}")
                 raise Exception(f"Failed to download file: {str(e)}")
         else:
             # Get from local storage
             async with aiofiles.open(file_path, 'rb') as f:
-                return await f.read()
+                if not ranged:
+                    return await f.read()
+                await f.seek(start)
+                return await f.read(-1 if end is None else end - start + 1)
+    
+    def blob_path(self, sha256: str, blob_id) -> str:
+        """Location of a content-addressed blob
+        
+        The blob id is part of the path, so a blob re-created after its last
+        reference was dropped never shares a location with the old one.
+        """
+        key = f"blobs/{sha256[:2]}/{sha256}/{blob_id}"
+        if self.use_s3:
+            return f"s3://{self.bucket_name}/{key}"
+        return str(self.upload_dir / key)
+    
+    async def move_file(self, src_path: str, dst_path: str):
+        """Move a stored file to a new path in the same backend"""
+        if src_path.startswith("s3://"):
+            src_bucket, src_key = self._parse_s3_path(src_path)
+            dst_bucket, dst_key = self._parse_s3_path(dst_path)
+            await self._s3(
+                'copy_object',
+                Bucket=dst_bucket,
+                Key=dst_key,
+                CopySource={'Bucket': src_bucket, 'Key': src_key}
+            )
+            await self._s3('delete_object', Bucket=src_bucket, Key=src_key)
+        else:
+            Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src_path, dst_path)
     
     async def delete_file(self, file_path: str) -> bool:
         """Delete a file"""
@@ -93,7 +289,7 @@ class StorageService:
             if file_path.startswith("s3://"):
                 # Delete from S3
                 bucket, key = self._parse_s3_path(file_path)
-                self.s3_client.delete_object(Bucket=bucket, Key=key)
+                await self._s3('delete_object', Bucket=bucket, Key=key)
             else:
                 # Delete local file
                 os.remove(file_path)
@@ -107,8 +303,9 @@ class StorageService:
         if file_path.startswith("s3://"):
             bucket, key = self._parse_s3_path(file_path)
             try:
-                url = self.s3_client.generate_presigned_url(
-                    'get_object',
+                url = await self._s3(
+                    'generate_presigned_url',
+                    ClientMethod='get_object',
                     Params={'Bucket': bucket, 'Key': key},
                     ExpiresIn=expiration
                 )
@@ -0,0 +1,103 @@
+"""Embedded PDF text-layer extraction, used to skip OCR for typed pages
+
+A page is only taken from its text layer when the text is good and covers
+the page, and the page carries no sizeable image; a printed worksheet with
+scanned or handwritten answers still goes to OCR.
+
+This module exists twice, as app/services/text_layer.py and
+ocr-service/text_layer.py, because the OCR service ships in its own image
+without ``app``; keep the two copies identical.
+"""
+import logging
+import unicodedata
+from typing import List, Optional
+
+import pypdf
+
+logger = logging.getLogger(__name__)
+
+# A page's text layer is used when it has at least this many characters...
+MIN_TEXT_CHARS = 40
+# ...and scores at least this (share of characters that look like real text)
+MIN_TEXT_QUALITY = 0.85
+# ...and has at least this many characters per square inch (a printed
+# header above vector handwriting has far fewer)...
+MIN_TEXT_DENSITY = 5.0
+# ...and no embedded image this large (pixels): a scan or photo of answers
+MAX_IMAGE_PIXELS = 200_000
+
+POINTS_PER_SQUARE_INCH = 72 * 72
+
+
+def score_text_layer(text: str) -> float:
+    """Score extracted text from 0 to 1; 0 for text too short to trust
+
+    Broken font encodings show up as control, private-use or replacement
+    characters, and glyph soup has few letters or digits.
+    """
+    text = (text or "").strip()
+    if len(text) < MIN_TEXT_CHARS:
+        return 0.0
+
+    visible = [ch for ch in text if not ch.isspace()]
+    if not visible:
+        return 0.0
+    printable = sum(1 for ch in visible if ch != "\ufffd" and unicodedata.category(ch)[0] in "LNPS")
+    alphanumeric = sum(1 for ch in visible if ch.isalnum())
+    if alphanumeric < len(visible) / 2:
+        return 0.0
+    return printable / len(visible)
+
+
+def largest_image_pixels(resources, depth: int = 0) -> int:
+    """Pixel count of the largest image XObject, including inside form XObjects"""
+    if resources is None or depth > 3:
+        return 0
+    resources = resources.get_object()
+    if "/XObject" not in resources:
+        return 0
+    largest = 0
+    xobjects = resources["/XObject"].get_object()
+    for name in xobjects:
+        xobject = xobjects[name].get_object()
+        if xobject.get("/Subtype") == "/Image":
+            largest = max(largest, int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0)))
+        elif xobject.get("/Subtype") == "/Form":
+            largest = max(largest, largest_image_pixels(xobject.get("/Resources"), depth + 1))
+    return largest
+
+
+def text_density(text: str, page: pypdf.PageObject) -> float:
+    """Visible characters per square inch of the page"""
+    area = float(page.mediabox.width) * float(page.mediabox.height) / POINTS_PER_SQUARE_INCH
+    if area <= 0:
+        return 0.0
+    return sum(1 for ch in text if not ch.isspace()) / area
+
+
+def extract_text_layer(reader: pypdf.PdfReader) -> List[Optional[dict]]:
+    """Per page, ``{"text", "quality"}`` if its text layer is usable, else None"""
+    pages = []
+    for page_num, page in enumerate(reader.pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Text layer extraction failed on page {page_num + 1}: {e}")
+            text = ""
+        quality = score_text_layer(text)
+        if quality < MIN_TEXT_QUALITY or text_density(text, page) < MIN_TEXT_DENSITY:
+            pages.append(None)
+            continue
+
+        # Text plus a scanned or photographed image: the image may hold answers
+        try:
+            image_pixels = largest_image_pixels(page.get("/Resources"))
+        except Exception as e:
+            logger.warning(f"Could not inspect images on page {page_num + 1}, OCR'ing it: {e}")
+            image_pixels = MAX_IMAGE_PIXELS
+        if image_pixels >= MAX_IMAGE_PIXELS:
+            pages.append(None)
+            continue
+
+        pages.append({"text": text.strip(), "quality": round(quality, 3)})
+    return pages
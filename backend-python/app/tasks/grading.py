@@ -1,6 +1,6 @@
 from celery import shared_task
-import httpx
 import asyncio
+import functools
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import logging
@@ -9,7 +9,11 @@ import json
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.circuit_breaker import circuit_breakers
+from app.db.database import engine as async_engine
 from app.db.models import Submission, SubmissionFile, Assignment, Question
+from app.services.batch_grading import batch_grading_engine
 
 logger = logging.getLogger(__name__)
 
@@ -56,56 +60,60 @@ def grade_submission(self, submission_id: str, model: str = "azure-gpt-4"):
         # Build grading prompt
         grading_prompt = build_grading_prompt(assignment, questions, submission_content)
         
-        # Call MCP server for grading
-        with httpx.Client(timeout=120.0) as client:
-            mcp_request = {
-                "model": model,
-                "messages": [
-                    {"role": "user", "content": grading_prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 2000,
-                "system_prompt": "You are an expert teacher grading student assignments. Provide detailed, constructive feedback with specific scores."
-            }
-            
+        # Call MCP server for grading over the worker's shared client
+        client = http_clients.get_sync("mcp")
+        mcp_request = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": grading_prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 2000,
+            "system_prompt": "You are an expert teacher grading student assignments. Provide detailed, constructive feedback with specific scores."
+        }
+        
+        # An open breaker fails fast into the retry below
+        with circuit_breakers.guard("mcp", f"mcp:{model}"):
             response = client.post(
-                f"{settings.MCP_SERVER_URL}/generate",
+                "/generate",
                 json=mcp_request,
-                headers={"Content-Type": "application/json"}
+                timeout=120.0
             )
+            if response.status_code >= 500:
+                response.raise_for_status()
+        
+        if response.status_code == 200:
+            llm_response = response.json()
+            
+            # Parse grading response
+            grading_result = parse_grading_response(llm_response["content"], assignment.max_points)
+            
+            # Update submission with grading results
+            submission.total_score = grading_result["total_score"]
+            submission.feedback = grading_result["feedback"]
+            submission.ai_feedback = {
+                "model": model,
+                "detailed_scores": grading_result.get("detailed_scores", {}),
+                "strengths": grading_result.get("strengths", []),
+                "improvements": grading_result.get("improvements", []),
+                "tokens_used": llm_response.get("usage", {}).get("total_tokens", 0),
+                "graded_at": datetime.utcnow().isoformat()
+            }
+            submission.status = "graded"
+            submission.graded_at = datetime.utcnow()
+            
+            db.commit()
+            
+            logger.info(f"Grading completed for submission {submission_id}")
+            return {
+                "status": "completed",
+                "submission_id": submission_id,
+                "total_score": grading_result["total_score"],
+                "model": model
+            }
+        else:
+            raise Exception(f"MCP server error: {response.status_code} - {response.text}")
             
-            if response.status_code == 200:
-                llm_response = response.json()
-                
-                # Parse grading response
-                grading_result = parse_grading_response(llm_response["content"], assignment.max_points)
-                
-                # Update submission with grading results
-                submission.total_score = grading_result["total_score"]
-                submission.feedback = grading_result["feedback"]
-                submission.ai_feedback = {
-                    "model": model,
-                    "detailed_scores": grading_result.get("detailed_scores", {}),
-                    "strengths": grading_result.get("strengths", []),
-                    "improvements": grading_result.get("improvements", []),
-                    "tokens_used": llm_response.get("usage", {}).get("total_tokens", 0),
-                    "graded_at": datetime.utcnow().isoformat()
-                }
-                submission.status = "graded"
-                submission.graded_at = datetime.utcnow()
-                
-                db.commit()
-                
-                logger.info(f"Grading completed for submission {submission_id}")
-                return {
-                    "status": "completed",
-                    "submission_id": submission_id,
-                    "total_score": grading_result["total_score"],
-                    "model": model
-                }
-            else:
-                raise Exception(f"MCP server error: {response.status_code} - {response.text}")
-                
     except Exception as e:
         logger.error(f"Grading failed for submission {submission_id}: {e}")
         
@@ -233,4 +241,30 @@ def batch_grade_submissions(submission_ids: list, model: str = "azure-gpt-4"):
             logger.error(f"Failed to queue grading for submission {submission_id}: {e}")
             results.append({"submission_id": submission_id, "error": str(e)})
     
-    return results
\ No newline at end of file
+    return results
+
+
+@shared_task(bind=True, acks_late=True, max_retries=3)
+def run_batch_grading_job(self, job_id: str):
+    """Grade the submissions of a persisted batch grading job
+    
+    acks_late redelivers the job if the worker dies; the rerun skips
+    submissions that already have a result. A delivery that finds the job
+    leased by a live run checks back once the lease could have expired.
+    """
+    # The grading endpoints import this module, so import them lazily
+    from app.api.v1.endpoints.grading import grade_single_submission_internal
+    
+    grade_one = functools.partial(grade_single_submission_internal, claimed=True)
+    
+    async def run():
+        try:
+            return await batch_grading_engine.run(UUID(job_id), grade_one)
+        finally:
+            # Async pools are bound to this task's event loop
+            await http_clients.shutdown()
+            await async_engine.dispose()
+    
+    if not asyncio.run(run()):
+        raise self.retry(countdown=settings.GRADING_JOB_LEASE_SECONDS)
+    return {"status": "completed", "job_id": job_id}
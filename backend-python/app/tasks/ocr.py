@@ -1,14 +1,20 @@
 from celery import shared_task
-import httpx
 import asyncio
+from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import logging
+import os
+import socket
+import time
 from uuid import UUID
 import json
 
 from app.core.config import settings
-from app.db.models import SubmissionFile
+from app.core.http import http_clients
+from app.db.models import SubmissionFile, OCRJob
+from app.services.ocr import run_vision_ocr
+from app.services.ocr_cache import content_hash, get_cached_result, store_result
 from app.services.storage import storage_service
 
 logger = logging.getLogger(__name__)
@@ -18,11 +24,148 @@ engine = create_engine(settings.DATABASE_URL.replace("+asyncpg", ""))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# How often to poll the OCR service for progress of a submitted job
+OCR_POLL_INTERVAL = 2.0
+OCR_JOB_TIMEOUT = 30 * 60
+
+
+def _worker_id(task) -> str:
+    return f"{task.request.hostname or socket.gethostname()}:{os.getpid()}"
+
+
+def _start_job(db, job: OCRJob, task):
+    """Mark a job as picked up by this worker"""
+    job.status = "processing"
+    job.worker_id = _worker_id(task)
+    job.started_at = datetime.utcnow()
+    job.retry_count = task.request.retries
+    job.error_message = None
+    db.commit()
+
+
+def _progress_recorder(db, job: OCRJob):
+    """Callback that stores per-page progress on the job row"""
+    def record(completed: int, total: int):
+        if job.pages_completed != completed or job.pages_total != total:
+            job.pages_completed = completed
+            job.pages_total = total
+            db.commit()
+    return record
+
+
+def _finish_job(db, job: OCRJob, result: dict):
+    job.result = result
+    job.status = "completed"
+    job.completed_at = datetime.utcnow()
+    if job.pages_total:
+        job.pages_completed = job.pages_total
+    db.commit()
+
+
+def _fail_job(db, job: OCRJob, error: Exception, final: bool):
+    job.error_message = str(error)
+    job.status = "failed" if final else "queued"
+    if final:
+        job.completed_at = datetime.utcnow()
+    db.commit()
+
+
+def _run_surya_job(file_content: bytes, filename: str, on_progress) -> dict:
+    """Submit a file to the Surya OCR service and poll it until done
+
+    The service keys jobs by content, so after a retry the resubmitted file
+    attaches to the job that is still running (or finished) there.
+    """
+    client = http_clients.get_sync("ocr")
+    files = {"file": (filename, file_content, "application/octet-stream")}
+    response = client.post("/ocr/jobs", files=files, data={"languages": json.dumps(["en"])})
+    if response.status_code != 202:
+        raise Exception(f"OCR service error: {response.status_code} - {response.text}")
+    remote_job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + OCR_JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        response = client.get(f"/ocr/status/{remote_job_id}")
+        if response.status_code != 200:
+            raise Exception(f"OCR service error: {response.status_code} - {response.text}")
+
+        remote = response.json()
+        if remote.get("pages_total"):
+            on_progress(remote.get("pages_completed", 0), remote["pages_total"])
+        if remote["status"] == "completed":
+            return remote["result"]
+        if remote["status"] == "failed":
+            raise Exception(f"OCR service job failed: {remote.get('error')}")
+
+        time.sleep(OCR_POLL_INTERVAL)
+
+    raise Exception(f"OCR service job {remote_job_id} timed out")
+
+
+@shared_task(bind=True, max_retries=3)
+def process_ocr_job(self, job_id: str, languages: list = None):
+    """Run a queued direct-upload OCR job with Google Vision"""
+    
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(OCRJob).filter(OCRJob.id == UUID(job_id)).first()
+        if not job:
+            logger.error(f"OCRJob {job_id} not found")
+            return
+        
+        _start_job(db, job, self)
+        
+        file_content = asyncio.run(storage_service.get_file(job.file_path))
+        
+        # Identical bytes were OCR'd before: reuse that result
+        digest = content_hash(file_content)
+        result = get_cached_result(db, digest, "vision", languages)
+        if result is None:
+            result = run_vision_ocr(file_content, job.filename, languages, on_progress=_progress_recorder(db, job))
+            store_result(db, digest, "vision", languages, result)
+        else:
+            result["filename"] = job.filename
+            job.pages_total = result.get("pages", 1)
+        result["job_id"] = job_id
+        result["status"] = "completed"
+        _finish_job(db, job, result)
+        
+        # The upload was only kept for the worker
+        asyncio.run(storage_service.delete_file(job.file_path))
+        
+        logger.info(f"OCR job {job_id} completed ({job.pages_total} pages)")
+        return {"status": "completed", "job_id": job_id}
+        
+    except Exception as e:
+        logger.error(f"OCR job {job_id} failed: {e}")
+        
+        if job is None:
+            raise
+        
+        final = self.request.retries >= self.max_retries
+        _fail_job(db, job, e, final)
+        
+        if not final:
+            logger.info(f"Retrying OCR job {job_id} (attempt {self.request.retries + 1})")
+            raise self.retry(countdown=60 * (2 ** self.request.retries))
+        
+        # No retry will read the upload again
+        asyncio.run(storage_service.delete_file(job.file_path))
+        
+        return {"status": "failed", "job_id": job_id, "error": str(e)}
+    
+    finally:
+        db.close()
+
+
 @shared_task(bind=True, max_retries=3)
 def process_file_ocr(self, file_id: str):
-    """Process a file with OCR using Surya OCR service"""
+    """Process a submission file with OCR using Surya OCR service"""
     
     db = SessionLocal()
+    submission_file = None
+    job = None
     try:
         # Get submission file
         submission_file = db.query(SubmissionFile).filter(SubmissionFile.id == UUID(file_id)).first()
@@ -30,48 +173,59 @@ def process_file_ocr(self, file_id: str):
             logger.error(f"SubmissionFile {file_id} not found")
             return
         
+        # One job row per file, reused across retries
+        job = db.query(OCRJob).filter(OCRJob.file_id == submission_file.id).order_by(OCRJob.created_at.desc()).first()
+        if not job or job.status in ("completed", "failed"):
+            job = OCRJob(file_id=submission_file.id, filename=submission_file.filename, engine="surya", pages_completed=0)
+            db.add(job)
+        
         # Update status to processing
         submission_file.ocr_status = "processing"
-        db.commit()
+        _start_job(db, job, self)
         
         # Get file content
         file_content = asyncio.run(storage_service.get_file(submission_file.file_path))
         
-        # Send to OCR service
-        with httpx.Client(timeout=300.0) as client:
-            files = {"file": (submission_file.filename, file_content, "application/octet-stream")}
-            response = client.post(
-                f"{settings.SURYA_OCR_URL}/ocr/process",
-                files=files,
-                data={"languages": json.dumps(["en"])}
-            )
+        # Reuse the result for identical bytes, otherwise submit to the
+        # OCR service and follow its page progress
+        digest = content_hash(file_content)
+        ocr_result = get_cached_result(db, digest, "surya", ["en"])
+        if ocr_result is None:
+            ocr_result = _run_surya_job(file_content, submission_file.filename, _progress_recorder(db, job))
+            store_result(db, digest, "surya", ["en"], ocr_result)
+        else:
+            job.pages_total = ocr_result.get("pages", 1)
+        
+        # Update submission file with OCR result
+        submission_file.ocr_result = ocr_result
+        submission_file.ocr_status = "completed"
+        _finish_job(db, job, ocr_result)
+        
+        logger.info(f"OCR completed for file {file_id}")
+        return {
+            "status": "completed",
+            "file_id": file_id,
+            "job_id": str(job.id),
+            "text_length": len(ocr_result.get("text", ""))
+        }
             
-            if response.status_code == 200:
-                ocr_result = response.json()
-                
-                # Update submission file with OCR result
-                submission_file.ocr_result = ocr_result
-                submission_file.ocr_status = "completed"
-                db.commit()
-                
-                logger.info(f"OCR completed for file {file_id}")
-                return {
-                    "status": "completed",
-                    "file_id": file_id,
-                    "text_length": len(ocr_result.get("text", ""))
-                }
-            else:
-                raise Exception(f"OCR service error: {response.status_code} - {response.text}")
-                
     except Exception as e:
         logger.error(f"OCR processing failed for file {file_id}: {e}")
         
+        if submission_file is None:
+            raise
+        
+        final = self.request.retries >= self.max_retries
+        
         # Update status to failed
         submission_file.ocr_status = "failed"
-        db.commit()
+        if job is not None:
+            _fail_job(db, job, e, final)
+        else:
+            db.commit()
         
         # Retry if we haven't exceeded max retries
-        if self.request.retries < self.max_retries:
+        if not final:
             logger.info(f"Retrying OCR for file {file_id} (attempt {self.request.retries + 1})")
             raise self.retry(countdown=60 * (2 ** self.request.retries))
         
@@ -6,7 +6,7 @@ from uuid import UUID
 
 from app.core.config import settings
 from app.db.models import Teacher, Classroom
-from app.services.google_classroom import GoogleClassroomService
+from app.services.google_classroom import get_classroom_service
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +27,7 @@ def sync_google_classroom(teacher_id: str):
             return
         
         # Initialize Google Classroom service
-        gc_service = GoogleClassroomService(teacher.refresh_token)
+        gc_service = get_classroom_service(teacher.refresh_token)
         
         # Sync classrooms
         # This is a placeholder - actual implementation would be async
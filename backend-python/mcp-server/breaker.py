@@ -0,0 +1,215 @@
+"""Circuit breakers per provider and per model for upstream LLM calls
+
+A breaker opens after too many consecutive failures or too high an error
+rate over its recent calls. While open, calls fail immediately so the
+router (or the caller's fallback) moves on instead of waiting for a
+timeout. After a cool-down it lets a few probe calls through (half-open);
+their success closes it again, a failure reopens it.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """Whether an upstream error says the provider is unhealthy
+
+    Timeouts, connection errors and 5xx count; client errors and rate
+    limits (handled by admission control) don't. Provider errors reach
+    here as HTTPExceptions carrying the provider's status.
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return isinstance(exc, Exception)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state machine for one provider or model"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+        self.last_transition_at: Optional[datetime] = None
+
+    def _transition(self, state: str):
+        transition = f"{self.state}->{state}"
+        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        self.last_transition_at = datetime.utcnow()
+        self.state = state
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Circuit {transition} for {self.name}: failing fast for {self.open_seconds:.0f}s")
+        else:
+            if state == CLOSED:
+                self.outcomes.clear()
+                self.consecutive_failures = 0
+            logger.info(f"Circuit {transition} for {self.name}")
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def ready(self) -> bool:
+        """Whether a call would be let through right now (no side effects)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self.retry_after() == 0
+        return self.probes_in_flight < self.half_open_probes
+
+    def acquire(self):
+        """Let a call through; call only after ``ready()`` returned True"""
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self.probes_in_flight += 1
+
+    def finish(self, ok: Optional[bool]):
+        """Record a call's outcome; None means it said nothing about health"""
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if ok is False:
+                self._transition(OPEN)
+            elif ok:
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+            return
+
+        if ok is None or self.state != CLOSED:
+            return
+
+        self.outcomes.append(ok)
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        failures = self.outcomes.count(False)
+        if self.consecutive_failures >= self.failure_threshold or (
+            len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate
+        ):
+            self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "retry_after_ms": int(self.retry_after() * 1000) if self.state == OPEN else 0,
+            "consecutive_failures": self.consecutive_failures,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": self.outcomes.count(False),
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "last_transition_at": self.last_transition_at.isoformat() if self.last_transition_at else None,
+        }
+
+
+class BreakerRegistry:
+    """Provider and model breakers; a call needs both to be closed or probing"""
+
+    def __init__(self, defaults: Dict[str, Any], overrides: Dict[str, Dict[str, Any]]):
+        self.defaults = defaults
+        self.overrides = overrides
+        self.providers: Dict[str, CircuitBreaker] = {}
+        self.models: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, breakers: Dict[str, CircuitBreaker], name: str) -> CircuitBreaker:
+        if name not in breakers:
+            breakers[name] = CircuitBreaker(name, **{**self.defaults, **self.overrides.get(name, {})})
+        return breakers[name]
+
+    def _breakers(self, provider: str, model: str) -> List[CircuitBreaker]:
+        return [self._get(self.providers, provider), self._get(self.models, model)]
+
+    def ready(self, provider: str, model: str) -> bool:
+        return all(breaker.ready() for breaker in self._breakers(provider, model))
+
+    @asynccontextmanager
+    async def guard(self, provider: str, model: str):
+        """Wrap one upstream call, failing fast with CircuitOpenError when open"""
+        breakers = self._breakers(provider, model)
+        for breaker in breakers:
+            if not breaker.ready():
+                breaker.rejected += 1
+                raise CircuitOpenError(breaker.name, breaker.retry_after())
+        for breaker in breakers:
+            breaker.acquire()
+
+        ok = None
+        try:
+            yield
+            ok = True
+        except Exception as e:
+            ok = False if is_breaker_failure(e) else None
+            raise
+        finally:
+            # Cancelled calls (hedge losers, disconnects) leave ok as None
+            for breaker in breakers:
+                breaker.finish(ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {name: breaker.stats() for name, breaker in self.providers.items()},
+            "models": {name: breaker.stats() for name, breaker in self.models.items()},
+        }
+
+
+def build_breakers() -> BreakerRegistry:
+    """Create the breakers from environment settings
+
+    LLM_BREAKER_OVERRIDES (JSON) tunes individual providers or models, e.g.
+    ``{"azure": {"failure_threshold": 3, "open_seconds": 60}}``.
+    """
+    defaults = {
+        "failure_threshold": int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+        "error_rate": float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+        "window": int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+        "min_calls": int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+        "open_seconds": float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+        "half_open_probes": int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1")),
+    }
+    return BreakerRegistry(defaults, json.loads(os.getenv("LLM_BREAKER_OVERRIDES", "{}")))
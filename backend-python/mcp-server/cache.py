@@ -0,0 +1,168 @@
+"""Content-addressed LLM response cache for the MCP gateway"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis tier is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_request_hash(payload: Dict[str, Any]) -> str:
+    """SHA-256 of a canonical JSON encoding of the request fields that affect output"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LRUCacheTier:
+    """In-process LRU with per-entry TTL and a total size budget"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, size, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+        self.current_bytes += size
+
+        # Evict least recently used entries until both budgets are met
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class RedisCacheTier:
+    """Shared cache tier so replicas (and restarts) reuse each other's responses"""
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "mcp:llm-cache:"):
+        self.client = aioredis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        try:
+            await self.client.set(self.prefix + key, json.dumps(value, default=str), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Redis cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ttl_seconds": self.ttl_seconds}
+
+
+class ResponseCache:
+    """Looks up responses tier by tier and back-fills faster tiers on a hit"""
+
+    def __init__(self, tiers: List[Any]):
+        self.tiers = tiers
+        self.hits = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+        self.stores = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        for index, tier in enumerate(self.tiers):
+            value = await tier.get(key)
+            if value is not None:
+                self.hits[tier.name] += 1
+                for faster_tier in self.tiers[:index]:
+                    await faster_tier.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self.stores += 1
+        for tier in self.tiers:
+            await tier.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            "enabled": True,
+            "hits": total_hits,
+            "hits_by_tier": dict(self.hits),
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+            "tiers": {tier.name: tier.stats() for tier in self.tiers},
+        }
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """Create the cache from environment settings (None when disabled)"""
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    ttl_seconds = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    tiers = [
+        LRUCacheTier(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+            ttl_seconds=ttl_seconds,
+        )
+    ]
+
+    redis_url = os.getenv("REDIS_URL")
+    if os.getenv("LLM_CACHE_REDIS", "false").lower() == "true" and redis_url:
+        if aioredis is None:
+            logger.warning("LLM_CACHE_REDIS is set but the redis package is not installed")
+        else:
+            tiers.append(RedisCacheTier(redis_url, ttl_seconds))
+            logger.info("LLM response cache Redis tier enabled")
+
+    return ResponseCache(tiers)
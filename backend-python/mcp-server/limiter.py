@@ -0,0 +1,222 @@
+"""Per provider/model admission control for upstream LLM calls
+
+Each limiter combines a concurrency cap with request-per-minute and
+token-per-minute buckets. Callers queue instead of being rejected. Limits
+adapt AIMD-style: a 429 halves the rate (honouring Retry-After) and
+successes creep it back up to the configured ceiling.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Provider defaults; override with LLM_PROVIDER_LIMITS / LLM_MODEL_LIMITS (JSON)
+DEFAULT_PROVIDER_LIMITS = {
+    "openai": {"concurrency": 16, "rpm": 500, "tpm": 150000},
+    "azure": {"concurrency": 8, "rpm": 240, "tpm": 40000},
+    "anthropic": {"concurrency": 8, "rpm": 50, "tpm": 40000},
+    "google": {"concurrency": 8, "rpm": 60, "tpm": 120000},
+}
+
+# Never adapt below this share of the configured limits
+MIN_LIMIT_FACTOR = 0.1
+# Share of the configured rate won back per successful call
+RECOVERY_STEP = 0.02
+# Used when a 429 carries no Retry-After
+DEFAULT_RETRY_AFTER = 5.0
+
+
+def estimate_tokens(messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int]) -> int:
+    """Rough token cost of a call (about 4 characters per prompt token)"""
+    chars = sum(len(m.get("content", "")) for m in messages) + len(system_prompt or "")
+    return chars // 4 + (max_tokens or 1024)
+
+
+def rate_limit_retry_after(exc: Exception) -> Optional[float]:
+    """Seconds to back off if ``exc`` is a provider 429, else None"""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status != 429 and type(exc).__name__ not in ("RateLimitError", "ResourceExhausted"):
+        return None
+
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After") or DEFAULT_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class TokenBucket:
+    """Async token bucket whose waiters are served in FIFO order"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float):
+        # Oversized requests would never fit; let them drain the bucket instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class Limiter:
+    """Concurrency cap plus RPM/TPM buckets for one provider or model
+
+    Limits left out (None) are not enforced.
+    """
+
+    def __init__(self, name: str, concurrency: int = 64, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.name = name
+        self.max_concurrency = concurrency
+        self.max_rpm = rpm
+        self.concurrency = concurrency
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.cooldown_until = 0.0
+        self._slots = asyncio.Condition()
+
+    async def acquire(self, tokens: int):
+        """Wait for a slot, a request and ``tokens`` worth of budget"""
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            # Retry-After from the provider pauses all admissions
+            while (delay := self.cooldown_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens:
+                await self.tokens.acquire(tokens)
+            async with self._slots:
+                await self._slots.wait_for(lambda: self.in_flight < self.concurrency)
+                self.in_flight += 1
+        finally:
+            self.queued -= 1
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def release(self):
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    def record_success(self):
+        """Additive increase back towards the configured limits"""
+        if self.requests and self.requests.capacity < self.max_rpm:
+            self._set_rpm(min(self.max_rpm, self.requests.capacity + self.max_rpm * RECOVERY_STEP))
+        elif self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+
+    def record_rate_limited(self, retry_after: float):
+        """Multiplicative decrease and a pause until Retry-After"""
+        self.rate_limited += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + retry_after)
+        if self.requests:
+            self._set_rpm(max(self.max_rpm * MIN_LIMIT_FACTOR, self.requests.capacity / 2))
+        self.concurrency = max(1, self.concurrency // 2)
+        logger.warning(
+            f"{self.name} rate limited: backing off {retry_after:.1f}s, "
+            f"rpm={self.requests.capacity if self.requests else None}, concurrency={self.concurrency}"
+        )
+
+    def _set_rpm(self, rpm: float):
+        self.requests.capacity = rpm
+        self.requests.rate = rpm / 60
+        self.requests.tokens = min(self.requests.tokens, rpm)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "max_concurrency": self.max_concurrency,
+            "rpm": round(self.requests.capacity, 1) if self.requests else None,
+            "max_rpm": self.max_rpm,
+            "tpm": self.tokens.capacity if self.tokens else None,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "avg_wait_ms": int(self.total_wait / self.admitted * 1000) if self.admitted else 0,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "cooldown_ms": max(0, int((self.cooldown_until - time.monotonic()) * 1000)),
+        }
+
+
+class AdmissionController:
+    """Admits calls through their provider limiter and, if configured, a model limiter"""
+
+    def __init__(self, provider_limits: Dict[str, Dict[str, float]], model_limits: Dict[str, Dict[str, float]]):
+        self.providers = {name: Limiter(name, **limits) for name, limits in provider_limits.items()}
+        self.models = {name: Limiter(name, **limits) for name, limits in model_limits.items()}
+
+    def _limiters(self, provider: str, model: str) -> List[Limiter]:
+        return [limiter for limiter in (self.providers.get(provider), self.models.get(model)) if limiter]
+
+    @asynccontextmanager
+    async def admit(self, provider: str, model: str, tokens: int):
+        """Hold admission for the duration of one upstream call
+
+        Rate limit errors raised inside the block adapt the limits.
+        """
+        limiters = self._limiters(provider, model)
+        acquired = []
+        try:
+            for limiter in limiters:
+                await limiter.acquire(tokens)
+                acquired.append(limiter)
+
+            try:
+                yield
+            except Exception as e:
+                retry_after = rate_limit_retry_after(e)
+                if retry_after is not None:
+                    for limiter in limiters:
+                        limiter.record_rate_limited(retry_after)
+                raise
+            else:
+                for limiter in limiters:
+                    limiter.record_success()
+        finally:
+            for limiter in acquired:
+                await limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {name: limiter.stats() for name, limiter in self.providers.items()},
+            "models": {name: limiter.stats() for name, limiter in self.models.items()},
+        }
+
+
+def build_admission_controller() -> AdmissionController:
+    """Create the controller from defaults and environment overrides"""
+    provider_limits = {name: dict(limits) for name, limits in DEFAULT_PROVIDER_LIMITS.items()}
+    for name, limits in json.loads(os.getenv("LLM_PROVIDER_LIMITS", "{}")).items():
+        provider_limits.setdefault(name, {}).update(limits)
+
+    model_limits = json.loads(os.getenv("LLM_MODEL_LIMITS", "{}"))
+    return AdmissionController(provider_limits, model_limits)
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Literal
+from typing import List, Optional, Dict, Any, Literal, AsyncIterator
 import os
 import logging
 from datetime import datetime
@@ -14,6 +15,12 @@ import google.generativeai as genai
 from openai import AsyncOpenAI
 from anthropic import AsyncAnthropic
 
+from cache import ResponseCache, build_response_cache, canonical_request_hash
+from limiter import build_admission_controller, estimate_tokens, rate_limit_retry_after
+from singleflight import SingleFlight, build_singleflight
+from routing import build_router
+from breaker import CircuitOpenError, build_breakers
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,6 +32,20 @@ openai_client = None
 azure_openai_client = None
 anthropic_client = None
 gemini_model = None
+response_cache: Optional[ResponseCache] = None
+singleflight: Optional[SingleFlight] = None
+
+# Per provider/model admission control (queues bursts instead of 429 storms)
+admission = build_admission_controller()
+
+# Latency-aware model choice and hedged requests
+router = build_router()
+
+# Fail fast on degraded providers/models instead of waiting for timeouts
+breakers = build_breakers()
+
+# Upper bound on one upstream call (keep below the API's 60 s client timeout)
+CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "55"))
 
 
 class LLMRequest(BaseModel):
@@ -34,6 +55,8 @@ class LLMRequest(BaseModel):
     max_tokens: Optional[int] = Field(None, description="Maximum tokens to generate")
     system_prompt: Optional[str] = Field(None, description="System prompt for the model")
     stream: bool = Field(False, description="Stream the response")
+    cache: bool = Field(True, description="Serve byte-identical requests from the response cache")
+    hedge: Optional[bool] = Field(None, description="Race a duplicate on an equivalent model when slow (default: server setting)")
 
 
 class LLMResponse(BaseModel):
@@ -42,6 +65,8 @@ class LLMResponse(BaseModel):
     usage: Dict[str, int]
     latency_ms: int
     provider: str
+    cached: bool = False
+    coalesced: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -162,7 +187,7 @@ AVAILABLE_MODELS = {
 @app.on_event("startup")
 async def startup_event():
     """Initialize LLM clients on startup"""
-    global openai_client, azure_openai_client, anthropic_client, gemini_model
+    global openai_client, azure_openai_client, anthropic_client, gemini_model, response_cache, singleflight
     
     # Initialize OpenAI
     if os.getenv("OPENAI_API_KEY"):
@@ -187,6 +212,64 @@ async def startup_event():
     if os.getenv("GEMINI_API_KEY"):
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
         logger.info("Google Gemini initialized")
+    
+    # Initialize response cache
+    response_cache = build_response_cache()
+    
+    # Coalesce identical in-flight requests
+    singleflight = build_singleflight()
+
+
+def provider_status() -> Dict[str, bool]:
+    """Which providers have a configured client"""
+    return {
+        "openai": openai_client is not None,
+        "azure": azure_openai_client is not None,
+        "anthropic": anthropic_client is not None,
+        "google": bool(os.getenv("GEMINI_API_KEY"))
+    }
+
+
+def model_available(model: str) -> bool:
+    """Configured, and neither its provider's nor its own breaker is open"""
+    model_info = AVAILABLE_MODELS.get(model)
+    return (
+        model_info is not None
+        and provider_status().get(model_info.provider, False)
+        and breakers.ready(model_info.provider, model)
+    )
+
+
+def circuit_open_error(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"{e.name} is failing, circuit open",
+        headers={"Retry-After": str(max(1, int(e.retry_after)))}
+    )
+
+
+def upstream_error(provider: str, e: Exception) -> HTTPException:
+    """Map a provider error to an HTTPException with the provider's status
+
+    Rate limits stay 429 with Retry-After and client errors (bad request,
+    auth, context length) keep their 4xx, so neither counts against the
+    breakers; errors without a status (connection failures) become 500.
+    """
+    retry_after = rate_limit_retry_after(e)
+    if retry_after is not None:
+        return HTTPException(
+            status_code=429,
+            detail=f"{provider} rate limit: {str(e)}",
+            headers={"Retry-After": str(int(retry_after))}
+        )
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if not isinstance(status, int) or not 400 <= status < 600:
+        status = 500
+    return HTTPException(status_code=status, detail=f"{provider} API error: {str(e)}")
+
+
+def request_tokens(request: LLMRequest) -> int:
+    return estimate_tokens(request.messages, request.system_prompt, request.max_tokens)
 
 
 async def call_openai(request: LLMRequest) -> LLMResponse:
@@ -209,7 +292,7 @@ async def call_openai(request: LLMRequest) -> LLMResponse:
             messages=messages,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
-            stream=False  # TODO: Implement streaming
+            stream=False
         )
         
         # Calculate latency
@@ -229,7 +312,7 @@ async def call_openai(request: LLMRequest) -> LLMResponse:
         
     except Exception as e:
         logger.error(f"OpenAI API error: {e}")
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+        raise upstream_error("OpenAI", e)
 
 
 async def call_azure_openai(request: LLMRequest) -> LLMResponse:
@@ -275,7 +358,7 @@ async def call_azure_openai(request: LLMRequest) -> LLMResponse:
         
     except Exception as e:
         logger.error(f"Azure OpenAI API error: {e}")
-        raise HTTPException(status_code=500, detail=f"Azure OpenAI API error: {str(e)}")
+        raise upstream_error("Azure OpenAI", e)
 
 
 async def call_anthropic(request: LLMRequest) -> LLMResponse:
@@ -323,7 +406,7 @@ async def call_anthropic(request: LLMRequest) -> LLMResponse:
         
     except Exception as e:
         logger.error(f"Anthropic API error: {e}")
-        raise HTTPException(status_code=500, detail=f"Anthropic API error: {str(e)}")
+        raise upstream_error("Anthropic", e)
 
 
 async def call_gemini(request: LLMRequest) -> LLMResponse:
@@ -383,7 +466,232 @@ async def call_gemini(request: LLMRequest) -> LLMResponse:
         
     except Exception as e:
         logger.error(f"Gemini API error: {e}")
-        raise HTTPException(status_code=500, detail=f"Gemini API error: {str(e)}")
+        raise upstream_error("Gemini", e)
+
+
+async def stream_openai(request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Stream OpenAI deltas"""
+    if not openai_client:
+        raise HTTPException(status_code=503, detail="OpenAI client not initialized")
+    
+    messages = []
+    if request.system_prompt:
+        messages.append({"role": "system", "content": request.system_prompt})
+    messages.extend(request.messages)
+    
+    stream = await openai_client.chat.completions.create(
+        model=request.model,
+        messages=messages,
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield {"delta": chunk.choices[0].delta.content}
+        if chunk.usage:
+            yield {"usage": {
+                "prompt_tokens": chunk.usage.prompt_tokens,
+                "completion_tokens": chunk.usage.completion_tokens,
+                "total_tokens": chunk.usage.total_tokens
+            }}
+
+
+async def stream_azure_openai(request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Stream Azure OpenAI deltas"""
+    if not azure_openai_client:
+        raise HTTPException(status_code=503, detail="Azure OpenAI client not initialized")
+    
+    messages = []
+    if request.system_prompt:
+        messages.append({"role": "system", "content": request.system_prompt})
+    messages.extend(request.messages)
+    
+    # Azure streams no usage block on this API version
+    stream = await azure_openai_client.chat.completions.create(
+        model=request.model.replace("azure-", ""),
+        messages=messages,
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        stream=True
+    )
+    
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield {"delta": chunk.choices[0].delta.content}
+
+
+async def stream_anthropic(request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Stream Anthropic text deltas"""
+    if not anthropic_client:
+        raise HTTPException(status_code=503, detail="Anthropic client not initialized")
+    
+    anthropic_messages = []
+    for msg in request.messages:
+        anthropic_messages.append({
+            "role": msg["role"] if msg["role"] != "system" else "assistant",
+            "content": msg["content"]
+        })
+    
+    async with anthropic_client.messages.stream(
+        model=request.model,
+        messages=anthropic_messages,
+        system=request.system_prompt or "You are a helpful AI assistant.",
+        temperature=request.temperature,
+        max_tokens=request.max_tokens or 4096
+    ) as stream:
+        async for text in stream.text_stream:
+            yield {"delta": text}
+        
+        final_message = await stream.get_final_message()
+        yield {"usage": {
+            "prompt_tokens": final_message.usage.input_tokens,
+            "completion_tokens": final_message.usage.output_tokens,
+            "total_tokens": final_message.usage.input_tokens + final_message.usage.output_tokens
+        }}
+
+
+async def stream_gemini(request: LLMRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Stream Google Gemini chunks"""
+    if not os.getenv("GEMINI_API_KEY"):
+        raise HTTPException(status_code=503, detail="Gemini API key not configured")
+    
+    model = genai.GenerativeModel(request.model)
+    
+    chat_history = []
+    last_message = ""
+    for msg in request.messages:
+        if msg["role"] == "user":
+            last_message = msg["content"]
+        elif msg["role"] == "assistant":
+            chat_history.append({"role": "user", "parts": [last_message]})
+            chat_history.append({"role": "model", "parts": [msg["content"]]})
+    
+    chat = model.start_chat(history=chat_history)
+    response = await chat.send_message_async(
+        last_message,
+        generation_config=genai.GenerationConfig(
+            temperature=request.temperature,
+            max_output_tokens=request.max_tokens
+        ),
+        stream=True
+    )
+    
+    async for chunk in response:
+        if chunk.text:
+            yield {"delta": chunk.text}
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_completion(request: LLMRequest) -> AsyncIterator[str]:
+    """Forward provider deltas as SSE and finish with a summary event
+    
+    Events: ``data: {"delta": ...}`` per chunk, then ``event: done`` with
+    model, provider, usage and latencies, or ``event: error`` on failure.
+    """
+    start_time = asyncio.get_event_loop().time()
+    
+    # A cached completion is replayed as a single delta
+    key = cache_key(request)
+    if response_cache and request.cache:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            yield sse_event({"delta": cached["content"]})
+            yield sse_event({**cached, "content": None, "cached": True, "first_token_ms": 0}, event="done")
+            return
+    
+    # Streams are routed away from a failing model but never hedged
+    request = request.model_copy(update={"model": router.choose(request.model, model_available)})
+    model_info = AVAILABLE_MODELS[request.model]
+    
+    providers = {
+        "openai": stream_openai,
+        "azure": stream_azure_openai,
+        "anthropic": stream_anthropic,
+        "google": stream_gemini,
+    }
+    
+    content = []
+    usage = {}
+    first_token_ms = None
+    
+    try:
+        async with breakers.guard(model_info.provider, request.model), \
+                admission.admit(model_info.provider, request.model, request_tokens(request)):
+            async for item in providers[model_info.provider](request):
+                if "delta" in item:
+                    if first_token_ms is None:
+                        first_token_ms = int((asyncio.get_event_loop().time() - start_time) * 1000)
+                    content.append(item["delta"])
+                    yield sse_event({"delta": item["delta"]})
+                else:
+                    usage = item["usage"]
+    except Exception as e:
+        # Carry the status a non-streaming call would have returned so
+        # clients can tell client errors and fail-fast from upstream failures
+        if isinstance(e, CircuitOpenError):
+            e = circuit_open_error(e)
+        if isinstance(e, HTTPException):
+            error = {"error": e.detail, "status": e.status_code}
+            if e.headers and "Retry-After" in e.headers:
+                error["retry_after"] = int(e.headers["Retry-After"])
+        else:
+            error = {"error": str(e), "status": 500}
+        logger.error(f"{model_info.provider} streaming error: {error['error']}")
+        yield sse_event({**error, "provider": model_info.provider}, event="error")
+        return
+    
+    response = LLMResponse(
+        model=request.model,
+        content="".join(content),
+        usage=usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        latency_ms=int((asyncio.get_event_loop().time() - start_time) * 1000),
+        provider=model_info.provider
+    )
+    
+    if response_cache and request.cache:
+        await response_cache.set(key, response.model_dump(mode="json"))
+    
+    yield sse_event({**response.model_dump(mode="json"), "content": None, "first_token_ms": first_token_ms}, event="done")
+
+
+def cache_key(request: LLMRequest) -> str:
+    """Canonical hash of every request field that can change the completion"""
+    return canonical_request_hash({
+        "model": request.model,
+        "messages": request.messages,
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+        "system_prompt": request.system_prompt,
+    })
+
+
+async def dispatch(request: LLMRequest) -> LLMResponse:
+    """Route a request to its provider through its breakers and admission control"""
+    model_info = AVAILABLE_MODELS[request.model]
+    
+    providers = {
+        "openai": call_openai,
+        "azure": call_azure_openai,
+        "anthropic": call_anthropic,
+        "google": call_gemini,
+    }
+    if model_info.provider not in providers:
+        raise HTTPException(status_code=501, detail=f"Provider {model_info.provider} not implemented")
+    
+    try:
+        async with breakers.guard(model_info.provider, request.model):
+            async with admission.admit(model_info.provider, request.model, request_tokens(request)):
+                return await asyncio.wait_for(providers[model_info.provider](request), CALL_TIMEOUT_SECONDS)
+    except CircuitOpenError as e:
+        raise circuit_open_error(e)
 
 
 @app.post("/generate", response_model=LLMResponse)
@@ -397,19 +705,57 @@ async def generate(request: LLMRequest):
             detail=f"Model '{request.model}' not available. Use /models endpoint to see available models."
         )
     
-    model_info = AVAILABLE_MODELS[request.model]
+    if request.stream:
+        return StreamingResponse(stream_completion(request), media_type="text/event-stream")
     
-    # Route to appropriate provider
-    if model_info.provider == "openai":
-        return await call_openai(request)
-    elif model_info.provider == "azure":
-        return await call_azure_openai(request)
-    elif model_info.provider == "anthropic":
-        return await call_anthropic(request)
-    elif model_info.provider == "google":
-        return await call_gemini(request)
-    else:
-        raise HTTPException(status_code=501, detail=f"Provider {model_info.provider} not implemented")
+    use_cache = response_cache is not None and request.cache
+    key = cache_key(request)
+    
+    # Serve identical requests from the cache
+    if use_cache:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return LLMResponse(**{**cached, "cached": True})
+    
+    async def call_model(model: str) -> LLMResponse:
+        response = await dispatch(request.model_copy(update={"model": model}))
+        if not response.content:
+            raise HTTPException(status_code=502, detail=f"{model} returned an empty response")
+        return response
+    
+    async def call_upstream() -> Dict[str, Any]:
+        try:
+            response = await router.run(request.model, call_model, model_available, hedge=request.hedge)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{request.model} did not respond in time")
+        if use_cache:
+            await response_cache.set(key, response.model_dump(mode="json"))
+        return response.model_dump(mode="json")
+    
+    if not singleflight:
+        return LLMResponse(**await call_upstream())
+    
+    # Identical requests already in flight share one upstream call
+    value, coalesced = await singleflight.do(key, call_upstream)
+    return LLMResponse(**{**value, "coalesced": coalesced})
+
+
+@app.post("/generate/stream")
+async def generate_stream(request: LLMRequest):
+    """Stream generated text as server-sent events"""
+    
+    # Validate model
+    if request.model not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model '{request.model}' not available. Use /models endpoint to see available models."
+        )
+    
+    return StreamingResponse(
+        stream_completion(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/models", response_model=List[ModelInfo])
@@ -429,16 +775,16 @@ async def get_model(model_id: str):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    providers_status = {
-        "openai": openai_client is not None,
-        "azure": azure_openai_client is not None,
-        "anthropic": anthropic_client is not None,
-        "google": bool(os.getenv("GEMINI_API_KEY"))
-    }
+    providers_status = provider_status()
     
     return {
         "status": "healthy",
         "service": "mcp-server",
         "providers": providers_status,
-        "available_models": len(AVAILABLE_MODELS)
+        "available_models": len(AVAILABLE_MODELS),
+        "cache": response_cache.stats() if response_cache else {"enabled": False},
+        "limits": admission.stats(),
+        "singleflight": singleflight.stats() if singleflight else {"enabled": False},
+        "routing": router.stats(),
+        "circuit_breakers": breakers.stats()
     }
\ No newline at end of file
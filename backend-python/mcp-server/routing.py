@@ -0,0 +1,231 @@
+"""Latency-aware routing and hedged requests across equivalent models
+
+Every upstream call feeds a rolling window of latency and errors per model,
+bounded by count and age. A request goes to its model unless that model is
+failing and an equivalent one (same underlying model on another provider)
+is healthier; a small share of its traffic still goes to the failing model
+so it can recover, and old samples age out. When hedging
+is on, a duplicate is sent to an equivalent model once the primary is slower
+than its own p95; the first valid response wins and the other is cancelled.
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from breaker import is_breaker_failure
+
+logger = logging.getLogger(__name__)
+
+# Same model served by different providers
+DEFAULT_EQUIVALENT_MODELS = {
+    "gpt-4": ["azure-gpt-4"],
+    "azure-gpt-4": ["gpt-4"],
+    "gpt-3.5-turbo": ["azure-gpt-35-turbo"],
+    "azure-gpt-35-turbo": ["gpt-3.5-turbo"],
+}
+
+# Percentiles need this many samples before they replace the default delay
+MIN_SAMPLES = 20
+
+
+class ModelStats:
+    """Rolling latency and error window for one model"""
+
+    def __init__(self, window: int, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=window)  # (recorded at, latency seconds, ok)
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    def count(self) -> int:
+        self._prune()
+        return len(self.samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        self._prune()
+        latencies = sorted(latency for _, latency, ok in self.samples if ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[int(p * (len(latencies) - 1))]
+
+    def error_rate(self) -> float:
+        self._prune()
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, _, ok in self.samples if not ok) / len(self.samples)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "samples": self.count(),
+            "p50_ms": int(p50 * 1000) if p50 is not None else None,
+            "p95_ms": int(p95 * 1000) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+class Router:
+    """Picks the model for a request and optionally hedges it"""
+
+    def __init__(
+        self,
+        equivalents: Dict[str, List[str]],
+        hedging: bool,
+        hedge_delay_ms: Optional[int],
+        default_hedge_delay_ms: int,
+        error_rate_threshold: float,
+        window: int,
+        window_seconds: float,
+        probe_rate: float
+    ):
+        self.equivalents = equivalents
+        self.hedging = hedging
+        self.hedge_delay_ms = hedge_delay_ms
+        self.default_hedge_delay_ms = default_hedge_delay_ms
+        self.error_rate_threshold = error_rate_threshold
+        self.window = window
+        self.window_seconds = window_seconds
+        self.probe_rate = probe_rate
+        self.models: Dict[str, ModelStats] = {}
+        self.rerouted = 0
+        self.probes = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.models:
+            self.models[model] = ModelStats(self.window, self.window_seconds)
+        return self.models[model]
+
+    def _healthy(self, model: str) -> bool:
+        stats = self._stats(model)
+        return stats.count() < MIN_SAMPLES or stats.error_rate() < self.error_rate_threshold
+
+    def alternates(self, model: str, available: Callable[[str], bool]) -> List[str]:
+        """Equivalent models that can serve right now, healthiest and fastest first"""
+        candidates = [m for m in self.equivalents.get(model, []) if available(m) and self._healthy(m)]
+        return sorted(candidates, key=lambda m: (self._stats(m).error_rate(), self._stats(m).percentile(0.5) or 0))
+
+    def choose(self, model: str, available: Callable[[str], bool]) -> str:
+        """The requested model, unless it is down or failing and an equivalent isn't"""
+        if available(model) and self._healthy(model):
+            return model
+        alternates = self.alternates(model, available)
+        if not alternates:
+            return model
+        if available(model) and random.random() < self.probe_rate:
+            # A trickle of traffic lets a failing model show it has recovered
+            # (and lets its half-open breaker probe)
+            self.probes += 1
+            return model
+        self.rerouted += 1
+        logger.info(f"Routing {model} to {alternates[0]}")
+        return alternates[0]
+
+    def hedge_delay(self, model: str) -> float:
+        if self.hedge_delay_ms is not None:
+            return self.hedge_delay_ms / 1000
+        p95 = self._stats(model).percentile(0.95)
+        return p95 if p95 is not None else self.default_hedge_delay_ms / 1000
+
+    async def _timed(self, model: str, call: Callable[[str], Awaitable[Any]]):
+        start = time.monotonic()
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser says nothing about the model's health
+            raise
+        except Exception as e:
+            # Client errors and rate limits say nothing about the model either
+            if is_breaker_failure(e):
+                self._stats(model).record(time.monotonic() - start, False)
+            raise
+        self._stats(model).record(time.monotonic() - start, True)
+        return result
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[str], Awaitable[Any]],
+        available: Callable[[str], bool],
+        hedge: Optional[bool] = None
+    ):
+        """Call ``call(model)`` on the chosen model, hedging when enabled
+
+        ``call`` must raise for invalid responses (and timeouts) so they
+        never win a race.
+        """
+        primary = self.choose(model, available)
+        backups = [m for m in self.alternates(model, available) + [model] if m != primary and available(m)]
+        hedge = self.hedging if hedge is None else hedge
+        if not hedge or not backups:
+            return await self._timed(primary, call)
+
+        primary_task = asyncio.create_task(self._timed(primary, call))
+        tasks = {primary_task: primary}
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_delay(primary))
+            if primary_task in done and primary_task.exception() is None:
+                return primary_task.result()
+
+            # Primary is slow (or already failed): race a duplicate on a backup
+            self.hedges_sent += 1
+            logger.info(f"Hedging {primary} with {backups[0]}")
+            tasks[asyncio.create_task(self._timed(backups[0], call))] = backups[0]
+
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary_task:
+                            self.hedges_won += 1
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "rerouted": self.rerouted,
+            "probes": self.probes,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "models": {model: stats.stats() for model, stats in self.models.items()},
+        }
+
+
+def build_router() -> Router:
+    """Create the router from environment settings"""
+    equivalents = dict(DEFAULT_EQUIVALENT_MODELS)
+    equivalents.update(json.loads(os.getenv("LLM_EQUIVALENT_MODELS", "{}")))
+    hedge_delay_ms = os.getenv("LLM_HEDGE_DELAY_MS")
+
+    return Router(
+        equivalents=equivalents,
+        hedging=os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true",
+        hedge_delay_ms=int(hedge_delay_ms) if hedge_delay_ms else None,
+        default_hedge_delay_ms=int(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "3000")),
+        error_rate_threshold=float(os.getenv("LLM_ROUTE_ERROR_RATE", "0.5")),
+        window=int(os.getenv("LLM_ROUTING_WINDOW", "200")),
+        window_seconds=float(os.getenv("LLM_ROUTING_WINDOW_SECONDS", "300")),
+        probe_rate=float(os.getenv("LLM_ROUTE_PROBE_RATE", "0.05"))
+    )
@@ -0,0 +1,199 @@
+"""Single-flight coalescing of identical in-flight LLM calls
+
+Concurrent callers with the same request hash share one upstream call. In
+process they await the same task; across replicas a Redis lock elects one
+leader and the others wait for the result it publishes. A leader that
+fails publishes its error instead, so its followers fail with it rather
+than each calling upstream in turn.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from fastapi import HTTPException
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Cross-replica coalescing is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def error_payload(e: Exception) -> Dict[str, Any]:
+    """JSON form of a leader's error, as the HTTP error its caller would see"""
+    if isinstance(e, HTTPException):
+        return {"status_code": e.status_code, "detail": e.detail, "headers": e.headers}
+    return {"status_code": 500, "detail": str(e), "headers": None}
+
+
+def error_from_payload(payload: Dict[str, Any]) -> HTTPException:
+    return HTTPException(
+        status_code=payload["status_code"],
+        detail=payload["detail"],
+        headers=payload.get("headers")
+    )
+
+
+class SingleFlight:
+    """Runs one call per key at a time and hands its result to every waiter"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        lock_ttl_seconds: int = 120,
+        result_ttl_seconds: int = 30,
+        error_ttl_seconds: int = 5,
+        poll_interval: float = 0.1,
+        prefix: str = "mcp:singleflight:"
+    ):
+        self.client = aioredis.from_url(redis_url) if redis_url else None
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+        self.shared_errors = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """Return ``fn()``'s result, shared with identical in-flight calls
+
+        ``fn`` must return a JSON-serialisable dict. The second element is
+        True when the result came from another caller's call. The call runs
+        as its own task, so a disconnecting caller doesn't cancel it for the
+        others.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced_local += 1
+
+        value, remote = await asyncio.shield(task)
+        return value, shared or remote
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, key: str, fn) -> Tuple[Dict[str, Any], bool]:
+        if self.client is None:
+            self.leaders += 1
+            return await fn(), False
+
+        lock_key = f"{self.prefix}lock:{key}"
+        result_key = f"{self.prefix}outcome:{key}"
+        token = uuid.uuid4().hex
+
+        while True:
+            try:
+                acquired = await self.client.set(lock_key, token, nx=True, ex=self.lock_ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Single-flight lock failed, calling upstream directly: {e}")
+                self.leaders += 1
+                return await fn(), False
+
+            if acquired:
+                self.leaders += 1
+                try:
+                    value = await fn()
+                except Exception as e:
+                    # Cancellation isn't an outcome; followers take over then
+                    await self._publish(result_key, {"error": error_payload(e)}, self.error_ttl_seconds)
+                    raise
+                else:
+                    await self._publish(result_key, {"value": value}, self.result_ttl_seconds)
+                    return value, False
+                finally:
+                    await self._release(lock_key, token)
+
+            # Another replica is making this call; wait for its outcome
+            outcome = await self._wait_for_result(lock_key, result_key)
+            if outcome is not None and "error" in outcome:
+                self.shared_errors += 1
+                raise error_from_payload(outcome["error"])
+            if outcome is not None:
+                self.coalesced_remote += 1
+                return outcome["value"], True
+            # The leader gave up without an outcome: try to take over
+
+    async def _publish(self, result_key: str, outcome: Dict[str, Any], ttl_seconds: int):
+        try:
+            await self.client.set(result_key, json.dumps(outcome, default=str), ex=ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Single-flight result publish failed: {e}")
+
+    async def _release(self, lock_key: str, token: str):
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"Single-flight lock release failed: {e}")
+
+    async def _wait_for_result(self, lock_key: str, result_key: str) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + self.lock_ttl_seconds
+        while time.monotonic() < deadline:
+            try:
+                raw = await self.client.get(result_key)
+                if raw:
+                    return json.loads(raw)
+                if not await self.client.exists(lock_key):
+                    # Released between our two reads: the result may have just landed
+                    raw = await self.client.get(result_key)
+                    return json.loads(raw) if raw else None
+            except Exception as e:
+                logger.warning(f"Single-flight wait failed: {e}")
+                return None
+            await asyncio.sleep(self.poll_interval)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "distributed": self.client is not None,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "shared_errors": self.shared_errors,
+        }
+
+
+def build_singleflight() -> Optional[SingleFlight]:
+    """Create the coalescer from environment settings (None when disabled)"""
+    if os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() != "true":
+        return None
+
+    redis_url = None
+    if os.getenv("LLM_SINGLEFLIGHT_REDIS", "false").lower() == "true" and os.getenv("REDIS_URL"):
+        if aioredis is None:
+            logger.warning("LLM_SINGLEFLIGHT_REDIS is set but the redis package is not installed")
+        else:
+            redis_url = os.getenv("REDIS_URL")
+            logger.info("Cross-replica single-flight enabled")
+
+    return SingleFlight(
+        redis_url=redis_url,
+        lock_ttl_seconds=int(os.getenv("LLM_SINGLEFLIGHT_LOCK_TTL_SECONDS", "120"))
+    )
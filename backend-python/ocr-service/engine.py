@@ -0,0 +1,176 @@
+"""Micro-batching OCR engine backed by model-holding worker processes"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-process models, loaded once by init_worker
+_models = None
+
+
+def init_worker():
+    """Process pool initializer: load the Surya models into this worker"""
+    global _models
+    from surya.model.detection import segformer
+    from surya.model.recognition import load_model, load_processor
+
+    _models = (
+        segformer.load_model(),
+        segformer.load_processor(),
+        load_model(),
+        load_processor(),
+    )
+    logging.getLogger(__name__).info(f"OCR worker {os.getpid()} loaded models")
+
+
+def worker_ready() -> int:
+    """Cheap call used to check that a worker finished its initializer"""
+    return os.getpid() if _models is not None else 0
+
+
+def run_batch(items: List[Tuple[str, List[str]]]) -> List[dict]:
+    """Run one batched inference pass over (image_path, languages) items"""
+    from surya.ocr import run_ocr
+    from PIL import Image
+
+    det_model, det_processor, rec_model, rec_processor = _models
+    images = [Image.open(path).convert("RGB") for path, _ in items]
+    languages = [langs for _, langs in items]
+
+    predictions = run_ocr(images, languages, det_model, det_processor, rec_model, rec_processor)
+
+    results = []
+    for prediction in predictions:
+        lines = [
+            {
+                "text": text_line.text,
+                "bbox": text_line.bbox,
+                "confidence": getattr(text_line, "confidence", 0.95)
+            }
+            for text_line in prediction.text_lines
+        ]
+        confidences = [line["confidence"] for line in lines]
+        results.append({
+            "text": "\n".join(line["text"] for line in lines).strip(),
+            "lines": lines,
+            "confidence": sum(confidences) / len(confidences) if confidences else 0.0
+        })
+    return results
+
+
+class OCREngine:
+    """Groups pages from one or many requests into micro-batches
+
+    A page waits at most ``window_ms`` for others to join its batch, and a
+    batch never exceeds ``batch_size``. Up to ``workers`` batches run at the
+    same time, one per worker process.
+    """
+
+    def __init__(self, batch_size: int, window_ms: int, workers: int):
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.ready = False
+        self.batches_run = 0
+        self.pages_processed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the worker processes and wait until their models are loaded"""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, worker_ready) for _ in range(self.workers)
+        ))
+        self.ready = True
+        self._collector = asyncio.create_task(self._collect())
+        logger.info(
+            f"OCR engine ready: workers={self.workers}, batch_size={self.batch_size}, "
+            f"window_ms={int(self.window * 1000)}"
+        )
+
+    async def stop(self):
+        self.ready = False
+        if self._collector:
+            self._collector.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+    async def submit(self, image_path: str, languages: List[str]) -> dict:
+        """OCR one image; resolves when the batch it joined has run"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_path, languages, future))
+        return await future
+
+    async def submit_many(self, image_paths: List[str], languages: List[str]) -> List[dict]:
+        """OCR several images (e.g. PDF pages), batched together"""
+        return await asyncio.gather(*(self.submit(path, languages) for path in image_paths))
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.window
+
+            while len(batch) < self.batch_size:
+                # Take whatever is already queued without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            items = [(path, languages) for path, languages, _ in batch]
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, run_batch, items)
+            self.batches_run += 1
+            self.pages_processed += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            logger.error(f"OCR batch of {len(batch)} failed: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "window_ms": int(self.window * 1000),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches_run": self.batches_run,
+            "pages_processed": self.pages_processed,
+        }
+
+
+def build_engine() -> OCREngine:
+    """Create the engine from environment settings"""
+    return OCREngine(
+        batch_size=int(os.getenv("OCR_BATCH_SIZE", "16")),
+        window_ms=int(os.getenv("OCR_BATCH_WINDOW_MS", "25")),
+        workers=int(os.getenv("OCR_WORKERS", "2")),
+    )
@@ -0,0 +1,123 @@
+"""OCR job state shared by every replica of the OCR service
+
+Jobs live in Redis when REDIS_URL is set, so a poller sees the same job
+after a restart or from another replica; without it they stay in process
+memory (single replica). The replica running a job heartbeats it, and a
+queued or processing job whose heartbeat stopped (its replica died) reads
+as failed so pollers give up instead of waiting out their timeout.
+
+Jobs are also indexed by a digest of the upload and languages, so
+resubmitting the same file (a Celery retry) attaches to the job already
+running or finished instead of OCR'ing the document again.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis store is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# A running job is written at least this often...
+HEARTBEAT_SECONDS = 5
+# ...and counts as interrupted once it hasn't been for this long
+STALE_AFTER = timedelta(seconds=60)
+
+
+def upload_digest(path: str, languages: List[str]) -> str:
+    """SHA-256 of a saved upload and the languages it is OCR'd with"""
+    digest = hashlib.sha256(json.dumps(sorted(languages)).encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_stale(job: dict) -> bool:
+    if job["status"] not in ("queued", "processing"):
+        return False
+    return datetime.fromisoformat(job["updated_at"]) < datetime.utcnow() - STALE_AFTER
+
+
+def with_liveness(job: dict) -> dict:
+    """The job as pollers should see it: interrupted jobs report failed"""
+    if not is_stale(job):
+        return job
+    return {**job, "status": "failed", "error": "OCR job was interrupted (its OCR service replica stopped)"}
+
+
+class MemoryJobStore:
+    """Jobs in this process; finished ones are kept for ``retention``"""
+
+    def __init__(self, retention: timedelta):
+        self.retention = retention
+        self.jobs: Dict[str, dict] = {}
+        self.digests: Dict[str, str] = {}
+
+    def _prune(self):
+        cutoff = (datetime.utcnow() - self.retention).isoformat()
+        expired = [job_id for job_id, job in self.jobs.items() if job["updated_at"] < cutoff]
+        for job_id in expired:
+            job = self.jobs.pop(job_id)
+            if self.digests.get(job.get("digest")) == job_id:
+                del self.digests[job["digest"]]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def put(self, job: dict):
+        job["updated_at"] = datetime.utcnow().isoformat()
+        self._prune()
+        self.jobs[job["job_id"]] = dict(job)
+        if job.get("digest"):
+            self.digests[job["digest"]] = job["job_id"]
+
+    async def find(self, digest: str) -> Optional[dict]:
+        job_id = self.digests.get(digest)
+        return await self.get(job_id) if job_id else None
+
+
+class RedisJobStore:
+    """Jobs in Redis, expiring ``retention`` after their last write"""
+
+    def __init__(self, url: str, retention: timedelta, prefix: str = "ocr:job:"):
+        self.client = aioredis.from_url(url)
+        self.retention = retention
+        self.prefix = prefix
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raw = await self.client.get(self.prefix + job_id)
+        return json.loads(raw) if raw else None
+
+    async def put(self, job: dict):
+        job["updated_at"] = datetime.utcnow().isoformat()
+        ttl = int(self.retention.total_seconds())
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + job["job_id"], json.dumps(job, default=str), ex=ttl)
+        if job.get("digest"):
+            pipe.set(f"{self.prefix}digest:{job['digest']}", job["job_id"], ex=ttl)
+        await pipe.execute()
+
+    async def find(self, digest: str) -> Optional[dict]:
+        job_id = await self.client.get(f"{self.prefix}digest:{digest}")
+        return await self.get(job_id.decode()) if job_id else None
+
+
+def build_job_store():
+    """Create the job store from environment settings"""
+    retention = timedelta(seconds=int(os.getenv("OCR_JOB_RETENTION_SECONDS", "3600")))
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        if aioredis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed; OCR jobs stay in memory")
+        else:
+            logger.info("OCR job state stored in Redis")
+            return RedisJobStore(redis_url, retention)
+    return MemoryJobStore(retention)
@@ -1,33 +1,32 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 import uvicorn
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 import os
 import shutil
 from datetime import datetime
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
 import logging
 
-from surya.ocr import run_ocr
-from surya.model.detection import segformer
-from surya.model.recognition import load_model, load_processor
 from surya.languages import LANGUAGE_MAP
-from PIL import Image
 import pypdf
 
+from engine import build_engine
+from jobs import HEARTBEAT_SECONDS, build_job_store, is_stale, upload_digest, with_liveness
+from text_layer import extract_text_layer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Surya OCR Service", version="1.0.0")
 
-# Global models
-det_model = None
-rec_model = None
-rec_processor = None
-executor = ProcessPoolExecutor(max_workers=4)
+# Batched OCR engine; models live in its worker processes
+ocr_engine = build_engine()
+
+# Job state, shared across replicas when Redis is configured
+job_store = build_job_store()
 
 # Temporary storage
 TEMP_DIR = "/app/temp"
@@ -36,15 +35,11 @@ os.makedirs(TEMP_DIR, exist_ok=True)
 
 @app.on_event("startup")
 async def startup_event():
-    """Load OCR models on startup"""
-    global det_model, rec_model, rec_processor
+    """Start OCR workers (each loads the models once)"""
     logger.info("Loading Surya OCR models...")
     
     try:
-        det_model = segformer.load_model()
-        det_processor = segformer.load_processor()
-        rec_model = load_model()
-        rec_processor = load_processor()
+        await ocr_engine.start()
         logger.info("OCR models loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load OCR models: {e}")
@@ -54,78 +49,35 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    executor.shutdown(wait=True)
-
+    await ocr_engine.stop()
 
-def process_image_ocr(image_path: str, languages: List[str] = ["en"]) -> dict:
-    """Process a single image with OCR"""
-    try:
-        image = Image.open(image_path)
-        
-        # Run OCR
-        predictions = run_ocr(
-            [image], 
-            [languages], 
-            det_model, 
-            det_processor,
-            rec_model, 
-            rec_processor
-        )
-        
-        if predictions and len(predictions) > 0:
-            result = predictions[0]
-            
-            # Extract text and bounding boxes
-            ocr_result = {
-                "text": "",
-                "lines": [],
-                "confidence": 0.0
-            }
-            
-            for text_line in result.text_lines:
-                line_text = text_line.text
-                ocr_result["text"] += line_text + "\n"
-                ocr_result["lines"].append({
-                    "text": line_text,
-                    "bbox": text_line.bbox,
-                    "confidence": getattr(text_line, 'confidence', 0.95)
-                })
-            
-            ocr_result["text"] = ocr_result["text"].strip()
-            return ocr_result
-        
-        return {"text": "", "lines": [], "confidence": 0.0}
-        
-    except Exception as e:
-        logger.error(f"OCR processing error: {e}")
-        raise
 
+def extract_images_from_pdf(reader: pypdf.PdfReader, prefix: str, page_numbers: List[int]) -> List[Tuple[int, str]]:
+    """Extract embedded images from the given (1-based) pages as (page, path)
 
-def extract_images_from_pdf(pdf_path: str) -> List[str]:
-    """Extract images from PDF pages"""
+    Temp files are namespaced by ``prefix``.
+    """
     image_paths = []
     
     try:
-        with open(pdf_path, 'rb') as file:
-            reader = pypdf.PdfReader(file)
-            
-            for page_num, page in enumerate(reader.pages):
-                # Convert PDF page to image
-                # Note: In production, you'd use pdf2image or similar
-                # For now, we'll extract embedded images
-                if '/XObject' in page['/Resources']:
-                    xObject = page['/Resources']['/XObject'].get_object()
-                    
-                    for obj in xObject:
-                        if xObject[obj]['/Subtype'] == '/Image':
-                            size = (xObject[obj]['/Width'], xObject[obj]['/Height'])
-                            data = xObject[obj].get_data()
-                            
-                            # Save image
-                            img_path = f"{TEMP_DIR}/page_{page_num}_{obj}.png"
-                            with open(img_path, 'wb') as img_file:
-                                img_file.write(data)
-                            image_paths.append(img_path)
+        for page_num in page_numbers:
+            page = reader.pages[page_num - 1]
+            # Convert PDF page to image
+            # Note: In production, you'd use pdf2image or similar
+            # For now, we'll extract embedded images
+            if '/XObject' in page['/Resources']:
+                xObject = page['/Resources']['/XObject'].get_object()
+                
+                for obj in xObject:
+                    if xObject[obj]['/Subtype'] == '/Image':
+                        size = (xObject[obj]['/Width'], xObject[obj]['/Height'])
+                        data = xObject[obj].get_data()
+                        
+                        # Save image
+                        img_path = f"{TEMP_DIR}/{prefix}_page_{page_num}_{obj.lstrip('/')}.png"
+                        with open(img_path, 'wb') as img_file:
+                            img_file.write(data)
+                        image_paths.append((page_num, img_path))
     
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
@@ -134,17 +86,114 @@ def extract_images_from_pdf(pdf_path: str) -> List[str]:
     return image_paths
 
 
+# Jobs running in this process, so their tasks aren't garbage collected
+running_jobs: Dict[str, asyncio.Task] = {}
+
+
+def validate_upload(file: UploadFile):
+    if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.pdf', '.bmp', '.gif')):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+
+def save_upload(file: UploadFile, job_id: str) -> str:
+    temp_path = f"{TEMP_DIR}/{job_id}_{file.filename}"
+    with open(temp_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return temp_path
+
+
+async def ocr_file(job_id: str, temp_path: str, filename: str, languages: List[str], job: Optional[dict] = None) -> dict:
+    """OCR a saved upload; updates ``job`` page progress when given"""
+    if filename.lower().endswith('.pdf'):
+        reader = pypdf.PdfReader(temp_path)
+        
+        # Typed pages come straight from the text layer; only the rest are OCR'd
+        text_layer = extract_text_layer(reader)
+        pages = {
+            page_num: {
+                "page": page_num,
+                "text": layer["text"],
+                "lines": [],
+                "confidence": layer["quality"],
+                "source": "text_layer"
+            }
+            for page_num, layer in enumerate(text_layer, 1) if layer
+        }
+        ocr_pages = [page_num for page_num, layer in enumerate(text_layer, 1) if not layer]
+        if job is not None:
+            job["pages_total"] = len(text_layer)
+            job["pages_completed"] = len(pages)
+        
+        # Extract images from the remaining pages
+        image_paths = extract_images_from_pdf(reader, job_id, ocr_pages)
+        
+        async def ocr_page(page_num: int, img_paths: List[str]) -> dict:
+            results = await asyncio.gather(*(ocr_engine.submit(img_path, languages) for img_path in img_paths))
+            if job is not None:
+                job["pages_completed"] += 1
+            confidences = [r["confidence"] for r in results]
+            return {
+                "page": page_num,
+                "text": "\n".join(r["text"] for r in results if r["text"]),
+                "lines": [line for r in results for line in r["lines"]],
+                "confidence": sum(confidences) / len(confidences) if confidences else 0.0,
+                "source": "ocr"
+            }
+        
+        # All pages go to the engine together and share batched passes
+        try:
+            results = await asyncio.gather(*(
+                ocr_page(page_num, [path for num, path in image_paths if num == page_num])
+                for page_num in ocr_pages
+            ))
+        finally:
+            for _, img_path in image_paths:
+                cleanup_file(img_path)
+        for result in results:
+            pages[result["page"]] = result
+        results = [pages[page_num] for page_num in sorted(pages)]
+        
+        # Combine results
+        return {
+            "job_id": job_id,
+            "status": "completed",
+            "file_type": "pdf",
+            "pages": len(results),
+            "text": "\n\n".join([r["text"] for r in results if r["text"]]),
+            "page_results": results,
+            "text_layer_pages": len(text_layer) - len(ocr_pages),
+            "ocr_pages": len(ocr_pages),
+            "processed_at": datetime.utcnow().isoformat()
+        }
+    
+    # Process single image
+    if job is not None:
+        job["pages_total"] = 1
+    result = await ocr_engine.submit(temp_path, languages)
+    if job is not None:
+        job["pages_completed"] = 1
+    
+    return {
+        "job_id": job_id,
+        "status": "completed",
+        "file_type": "image",
+        "text": result["text"],
+        "lines": result["lines"],
+        "confidence": result["confidence"],
+        "source": "ocr",
+        "processed_at": datetime.utcnow().isoformat()
+    }
+
+
 @app.post("/ocr/process")
 async def process_ocr(
     file: UploadFile = File(...),
     languages: Optional[List[str]] = ["en"],
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
-    """Process a file (image or PDF) with OCR"""
+    """Process a file (image or PDF) with OCR and wait for the result"""
     
-    # Validate file type
-    if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.pdf', '.bmp', '.gif')):
-        raise HTTPException(status_code=400, detail="Unsupported file type")
+    validate_upload(file)
     
     # Generate job ID
     job_id = str(uuid.uuid4())
@@ -152,52 +201,9 @@ async def process_ocr(
     
     try:
         # Save uploaded file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        temp_path = save_upload(file, job_id)
         
-        # Process based on file type
-        if file.filename.lower().endswith('.pdf'):
-            # Extract images from PDF
-            image_paths = extract_images_from_pdf(temp_path)
-            
-            # Process each image
-            results = []
-            for img_path in image_paths:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    executor, process_image_ocr, img_path, languages
-                )
-                results.append(result)
-                
-                # Cleanup temp image
-                os.remove(img_path)
-            
-            # Combine results
-            combined_text = "\n\n".join([r["text"] for r in results])
-            ocr_result = {
-                "job_id": job_id,
-                "status": "completed",
-                "file_type": "pdf",
-                "pages": len(results),
-                "text": combined_text,
-                "page_results": results,
-                "processed_at": datetime.utcnow().isoformat()
-            }
-        
-        else:
-            # Process single image
-            result = await asyncio.get_event_loop().run_in_executor(
-                executor, process_image_ocr, temp_path, languages
-            )
-            
-            ocr_result = {
-                "job_id": job_id,
-                "status": "completed",
-                "file_type": "image",
-                "text": result["text"],
-                "lines": result["lines"],
-                "confidence": result["confidence"],
-                "processed_at": datetime.utcnow().isoformat()
-            }
+        ocr_result = await ocr_file(job_id, temp_path, file.filename, languages)
         
         # Cleanup
         background_tasks.add_task(cleanup_file, temp_path)
@@ -207,19 +213,98 @@ async def process_ocr(
     except Exception as e:
         logger.error(f"OCR processing failed: {e}")
         # Cleanup on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        cleanup_file(temp_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/ocr/status/{job_id}")
-async def get_ocr_status(job_id: str):
-    """Get OCR job status (placeholder for async processing)"""
-    return {
+async def heartbeat_job(job: dict):
+    """Write a running job's progress to the store until cancelled"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            await job_store.put(job)
+        except Exception as e:
+            logger.warning(f"Failed to store progress of OCR job {job['job_id']}: {e}")
+
+
+async def run_job(job: dict, temp_path: str, filename: str, languages: List[str]):
+    """Background worker for a submitted job"""
+    job["status"] = "processing"
+    job["started_at"] = datetime.utcnow().isoformat()
+    heartbeat = asyncio.create_task(heartbeat_job(job))
+    try:
+        await job_store.put(job)
+        job["result"] = await ocr_file(job["job_id"], temp_path, filename, languages, job=job)
+        job["status"] = "completed"
+    except Exception as e:
+        logger.error(f"OCR job {job['job_id']} failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        heartbeat.cancel()
+        job["completed_at"] = datetime.utcnow().isoformat()
+        cleanup_file(temp_path)
+        try:
+            await job_store.put(job)
+        except Exception as e:
+            logger.error(f"Failed to store OCR job {job['job_id']}: {e}")
+        running_jobs.pop(job["job_id"], None)
+
+
+@app.post("/ocr/jobs", status_code=202)
+async def submit_ocr_job(
+    file: UploadFile = File(...),
+    languages: Optional[List[str]] = ["en"]
+):
+    """Queue a file for OCR and return a job id to poll"""
+    
+    validate_upload(file)
+    
+    job_id = str(uuid.uuid4())
+    try:
+        temp_path = save_upload(file, job_id)
+    except Exception as e:
+        logger.error(f"Failed to store upload for OCR job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # The same file resubmitted (a client retry) attaches to its job
+    digest = upload_digest(temp_path, languages)
+    existing = await job_store.find(digest)
+    if existing and existing["status"] != "failed" and not is_stale(existing):
+        cleanup_file(temp_path)
+        logger.info(f"OCR upload matches job {existing['job_id']} ({existing['status']})")
+        return {"job_id": existing["job_id"], "status": existing["status"]}
+    
+    job = {
         "job_id": job_id,
-        "status": "completed",
-        "message": "Synchronous processing - job completed immediately"
+        "digest": digest,
+        "status": "queued",
+        "filename": file.filename,
+        "pages_total": None,
+        "pages_completed": 0,
+        "created_at": datetime.utcnow().isoformat(),
+        "started_at": None,
+        "completed_at": None,
     }
+    try:
+        await job_store.put(job)
+    except Exception as e:
+        cleanup_file(temp_path)
+        logger.error(f"Failed to store OCR job {job_id}: {e}")
+        raise HTTPException(status_code=503, detail="OCR job store unavailable")
+    running_jobs[job_id] = asyncio.create_task(run_job(job, temp_path, file.filename, languages))
+    
+    return {"job_id": job_id, "status": job["status"]}
+
+
+@app.get("/ocr/status/{job_id}")
+async def get_ocr_status(job_id: str):
+    """Get OCR job status, page progress and, once completed, the result"""
+    job = await job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    
+    return with_liveness(job)
 
 
 @app.get("/health")
@@ -228,7 +313,8 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "surya-ocr",
-        "models_loaded": det_model is not None and rec_model is not None
+        "models_loaded": ocr_engine.ready,
+        "engine": ocr_engine.stats()
     }
 
 
@@ -0,0 +1,50 @@
+import pytest
+
+from app.core import http
+from app.core.http import HTTPClientRegistry, UPSTREAMS
+
+
+async def test_async_clients_are_shared_per_upstream():
+    registry = HTTPClientRegistry()
+    await registry.startup()
+
+    mcp = registry.get("mcp")
+    assert registry.get("mcp") is mcp
+    assert registry.get("ocr") is not mcp
+    assert str(mcp.base_url).rstrip("/") == UPSTREAMS["mcp"]["base_url"].rstrip("/")
+
+    await registry.shutdown()
+    assert mcp.is_closed
+    # Used again after shutdown: a fresh client rather than a closed one
+    assert not registry.get("mcp").is_closed
+    await registry.shutdown()
+
+
+def test_sync_clients_are_shared_within_a_process():
+    registry = HTTPClientRegistry()
+
+    ocr = registry.get_sync("ocr")
+    assert registry.get_sync("ocr") is ocr
+
+    registry.close_sync()
+    assert ocr.is_closed
+    assert registry.get_sync("ocr") is not ocr
+    registry.close_sync()
+
+
+def test_forked_child_gets_its_own_sync_clients(monkeypatch):
+    registry = HTTPClientRegistry()
+    parent_client = registry.get_sync("ocr")
+
+    monkeypatch.setattr(http.os, "getpid", lambda: -1)
+    child_client = registry.get_sync("ocr")
+
+    assert child_client is not parent_client
+    assert not parent_client.is_closed  # Still the parent's to close
+    child_client.close()
+    parent_client.close()
+
+
+def test_unknown_upstream_is_rejected():
+    with pytest.raises(KeyError):
+        HTTPClientRegistry().get("nope")
@@ -0,0 +1,60 @@
+import importlib.util
+import uuid
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from app.db.database import Base
+from app.db.models import Classroom, Enrollment, Question, Submission, SubmissionFile, Answer, Rubric, OCRJob
+
+MIGRATION = Path(__file__).parents[1] / "alembic" / "revisions" / "a3f1c9d2e7b4_add_hot_path_indexes.py"
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("hot_path_indexes", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_migration_indexes_match_the_models():
+    model_indexes = {
+        index.name: (table.name, [column.name for column in index.columns])
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+
+    for name, table, columns in load_migration().INDEXES:
+        assert model_indexes.get(name) == (table, columns)
+
+
+async def query_plan(engine, statement) -> str:
+    sql = statement.compile(engine.sync_engine, compile_kwargs={"literal_binds": True})
+    async with engine.connect() as conn:
+        rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+some_id = uuid.uuid4()
+
+
+@pytest.mark.parametrize("statement, index", [
+    (select(Classroom).where(Classroom.teacher_id == some_id), "idx_classroom_teacher"),
+    (select(Enrollment).where(Enrollment.student_id == some_id), "idx_enrollment_student"),
+    (select(Question).where(Question.assignment_id == some_id).order_by(Question.order), "idx_question_assignment_order"),
+    (
+        select(Submission).where(Submission.assignment_id == some_id, Submission.status == "pending"),
+        "idx_submission_assignment_status",
+    ),
+    (select(Submission).where(Submission.student_id == some_id), "idx_submission_student"),
+    (select(SubmissionFile).where(SubmissionFile.submission_id == some_id), "idx_submission_file_submission"),
+    (select(Answer).where(Answer.submission_id == some_id), "idx_answer_submission"),
+    (select(Rubric).where(Rubric.assignment_id == some_id), "idx_rubric_assignment"),
+    (select(OCRJob).where(OCRJob.file_id == some_id), "idx_ocr_job_file"),
+])
+async def test_hot_queries_use_their_index(engine, statement, index):
+    plan = await query_plan(engine, statement)
+
+    assert f"USING INDEX {index}" in plan, plan
+    assert "USE TEMP B-TREE" not in plan, plan
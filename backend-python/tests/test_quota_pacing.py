@@ -0,0 +1,118 @@
+import types
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import TokenBucket
+from app.services import google_classroom
+from app.services.google_classroom import GoogleClassroomService
+
+
+class FakeClock:
+    """Stands in for ``time`` and ``asyncio`` in rate_limit
+
+    Sleeps are recorded rather than waited; tests move time with ``advance``.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setattr(rate_limit, "asyncio", clock)
+    return clock
+
+
+async def test_burst_up_to_capacity_does_not_wait(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+
+    for _ in range(5):
+        await bucket.acquire()
+
+    assert clock.sleeps == []
+
+
+async def test_calls_beyond_the_burst_are_spaced_at_the_rate(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    for _ in range(5):
+        await bucket.acquire()
+
+    # Each call reserves its slot, so waiters line up 1/rate apart
+    assert clock.sleeps == pytest.approx([0.1, 0.2, 0.3])
+
+
+async def test_batch_cost_is_paced_like_that_many_calls(clock):
+    bucket = TokenBucket(rate=20, capacity=50)
+
+    await bucket.acquire(50)
+    await bucket.acquire(100)
+
+    assert clock.sleeps == pytest.approx([5.0])
+
+
+async def test_idle_time_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    await bucket.acquire(2)
+
+    clock.advance(60)
+    for _ in range(3):
+        await bucket.acquire()
+
+    assert clock.sleeps == pytest.approx([0.1])
+
+
+class RecordingBucket:
+    def __init__(self):
+        self.acquired = []
+
+    async def acquire(self, tokens: float = 1):
+        self.acquired.append(tokens)
+
+
+class FakeBatch:
+    """Answers every call added to it, like a successful batch HTTP request"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self, http=None):
+        for request_id in self.request_ids:
+            self.callback(request_id, {"id": request_id}, None)
+
+
+async def test_batched_submission_reads_are_charged_per_call(monkeypatch):
+    quota = RecordingBucket()
+    monkeypatch.setattr(google_classroom, "google_api_quota", quota)
+
+    service = GoogleClassroomService("refresh-token")
+    monkeypatch.setattr(service, "_ensure_token", lambda: None)
+    monkeypatch.setattr(service, "_http", lambda: None)
+    classroom_api = service.service
+    monkeypatch.setattr(service, "service", types.SimpleNamespace(
+        courses=classroom_api.courses,
+        new_batch_http_request=lambda callback: FakeBatch(callback)
+    ))
+    items = [("coursework", f"submission-{i}") for i in range(250)]
+
+    results = await service.batch_get_student_submissions("course", items)
+
+    assert sorted(quota.acquired) == [50, 100, 100]
+    assert results == {submission_id: {"id": submission_id} for _, submission_id in items}
@@ -0,0 +1,97 @@
+import uuid
+
+import pytest
+
+from app.db.models import Teacher, Student, Classroom, Enrollment, Assignment, Submission, SubmissionFile
+from app.db.stats import classroom_stats, assignment_stats, submission_file_counts
+
+
+@pytest.fixture
+async def school(db):
+    """Two classrooms and assignments with known counts, plus empty ones"""
+    teacher = Teacher(email="teacher@example.com")
+    students = [Student(email=f"student{i}@example.com", name=f"Student {i}") for i in range(3)]
+    busy = Classroom(teacher=teacher, name="Busy")
+    empty = Classroom(teacher=teacher, name="Empty")
+    db.add_all([teacher, *students, busy, empty])
+    db.add_all([Enrollment(classroom=busy, student=student) for student in students])
+
+    graded = Assignment(classroom=busy, title="Graded")
+    mixed = Assignment(classroom=busy, title="Mixed")
+    untouched = Assignment(classroom=busy, title="Untouched")
+    db.add_all([graded, mixed, untouched])
+
+    submissions = [
+        Submission(assignment=graded, student=students[0], status="graded", total_score=80),
+        Submission(assignment=graded, student=students[1], status="graded", total_score=90),
+        Submission(assignment=graded, student=students[2], status="graded"),
+        Submission(assignment=mixed, student=students[0], status="pending"),
+        Submission(assignment=mixed, student=students[1], status="failed"),
+    ]
+    db.add_all(submissions)
+    db.add_all([
+        SubmissionFile(submission=submissions[0], filename=f"page{i}.png", file_path=f"/tmp/page{i}.png")
+        for i in range(2)
+    ])
+    await db.commit()
+
+    return {
+        "classrooms": [busy, empty],
+        "assignments": [graded, mixed, untouched],
+        "submissions": submissions,
+    }
+
+
+async def test_classroom_stats(db, school):
+    busy, empty = school["classrooms"]
+
+    stats = await classroom_stats(db, [busy.id, empty.id])
+
+    assert stats[busy.id] == {"student_count": 3, "assignment_count": 3}
+    assert stats[empty.id] == {"student_count": 0, "assignment_count": 0}
+
+
+async def test_assignment_stats(db, school):
+    graded, mixed, untouched = school["assignments"]
+
+    stats = await assignment_stats(db, [graded.id, mixed.id, untouched.id])
+
+    assert stats[graded.id]["submission_count"] == 3
+    assert stats[graded.id]["graded_count"] == 3
+    # Graded submissions without a score don't drag the average down
+    assert stats[graded.id]["average_score"] == pytest.approx(85.0)
+    assert stats[mixed.id]["pending_count"] == 1
+    assert stats[mixed.id]["failed_count"] == 1
+    assert stats[mixed.id]["average_score"] is None
+    assert stats[untouched.id] == {
+        "submission_count": 0,
+        "average_score": None,
+        "pending_count": 0,
+        "processing_count": 0,
+        "graded_count": 0,
+        "failed_count": 0,
+    }
+
+
+async def test_submission_file_counts(db, school):
+    with_files, without_files = school["submissions"][:2]
+
+    counts = await submission_file_counts(db, [with_files.id, without_files.id])
+
+    assert counts == {with_files.id: 2, without_files.id: 0}
+
+
+@pytest.mark.parametrize("stats_for", [classroom_stats, assignment_stats, submission_file_counts])
+async def test_stats_use_one_query_for_many_parents(db, queries, stats_for):
+    parent_ids = [uuid.uuid4() for _ in range(25)]
+
+    stats = await stats_for(db, parent_ids)
+
+    assert set(stats) == set(parent_ids)
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize("stats_for", [classroom_stats, assignment_stats, submission_file_counts])
+async def test_stats_skip_the_query_without_parents(db, queries, stats_for):
+    assert await stats_for(db, []) == {}
+    assert queries == []
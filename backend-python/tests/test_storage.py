@@ -0,0 +1,87 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.core.config import settings
+from app.services.storage import StorageService, FileTooLargeError
+
+PART_SIZE = 5 * 1024 * 1024  # S3's minimum part size
+BUCKET = "test-uploads"
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    """StorageService on a mocked S3 bucket"""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "USE_S3", True)
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(settings, "S3_MULTIPART_PART_SIZE", PART_SIZE)
+
+    with mock_aws():
+        boto3.client("s3", region_name=settings.AWS_REGION).create_bucket(Bucket=BUCKET)
+        yield StorageService()
+
+
+async def chunked(content: bytes, chunk_size: int = 1024 * 1024):
+    for i in range(0, len(content), chunk_size):
+        yield content[i:i + chunk_size]
+
+
+def content_of(size: int) -> bytes:
+    return bytes(i % 251 for i in range(size))
+
+
+async def test_small_stream_is_one_put(s3_storage):
+    content = content_of(100_000)
+
+    stored = await s3_storage.save_stream(chunked(content, 10_000), "small.pdf")
+
+    bucket, key = s3_storage._parse_s3_path(stored.path)
+    head = s3_storage.s3_client.head_object(Bucket=bucket, Key=key)
+    assert "-" not in head["ETag"]  # Not a multipart ETag
+    assert head["ContentType"] == "application/pdf"
+    assert stored.size == len(content)
+    assert await s3_storage.get_file(stored.path) == content
+
+
+async def test_large_stream_uploads_in_parts(s3_storage):
+    content = content_of(2 * PART_SIZE + 123_456)
+
+    stored = await s3_storage.save_stream(chunked(content), "large.pdf", max_size=len(content))
+
+    bucket, key = s3_storage._parse_s3_path(stored.path)
+    head = s3_storage.s3_client.head_object(Bucket=bucket, Key=key)
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["ContentLength"] == len(content)
+    assert await s3_storage.get_file(stored.path) == content
+
+
+async def test_failed_stream_aborts_the_multipart_upload(s3_storage):
+    content = content_of(2 * PART_SIZE)
+
+    with pytest.raises(FileTooLargeError):
+        await s3_storage.save_stream(chunked(content), "large.pdf", max_size=PART_SIZE + 1)
+
+    client = s3_storage.s3_client
+    assert client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert client.list_objects_v2(Bucket=BUCKET)["KeyCount"] == 0
+
+
+async def test_ranged_get_file_from_s3(s3_storage):
+    content = content_of(50_000)
+    path = await s3_storage.save_file(content, "file.pdf")
+
+    assert await s3_storage.get_file(path, 0, 1023) == content[:1024]
+    assert await s3_storage.get_file(path, 1000, 1999) == content[1000:2000]
+    assert await s3_storage.get_file(path, 49_000) == content[49_000:]
+
+
+async def test_ranged_get_file_from_local_storage():
+    storage = StorageService()
+    content = content_of(50_000)
+    path = await storage.save_file(content, "file.pdf")
+
+    assert await storage.get_file(path, 1000, 1999) == content[1000:2000]
+    assert await storage.get_file(path, 49_000) == content[49_000:]
+    assert await storage.get_file(path) == content
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+from google.cloud import vision
+
+from app.services import ocr
+from app.services.ocr import VisionBatcher
+
+
+class FakeVisionClient:
+    """Answers each image with its own bytes as the detected text"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batch_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def batch_annotate_images(self, requests):
+        with self.lock:
+            self.batch_sizes.append(len(requests))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+
+        responses = []
+        for request in requests:
+            text = request.image.content.decode()
+            if text == "bad":
+                responses.append(vision.AnnotateImageResponse(error={"message": "bad image"}))
+            else:
+                responses.append(vision.AnnotateImageResponse(text_annotations=[{"description": text}]))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+
+@pytest.fixture
+def vision_client(monkeypatch):
+    client = FakeVisionClient()
+    monkeypatch.setattr(ocr, "get_vision_client", lambda: client)
+    return client
+
+
+def test_concurrent_images_share_batches(vision_client):
+    batcher = VisionBatcher(batch_size=4, window_ms=500, max_concurrency=2)
+
+    futures = [batcher.submit(f"page {i}".encode()) for i in range(10)]
+
+    assert [future.result(timeout=5)["text"] for future in futures] == [f"page {i}" for i in range(10)]
+    assert vision_client.batch_sizes == [4, 4, 2]
+    assert batcher.stats()["batches_sent"] == 3
+    assert batcher.stats()["images_sent"] == 10
+
+
+def test_lone_image_waits_at_most_the_window(vision_client):
+    batcher = VisionBatcher(batch_size=16, window_ms=50, max_concurrency=1)
+
+    started = time.monotonic()
+    result = batcher.submit(b"alone").result(timeout=5)
+
+    assert result["text"] == "alone"
+    assert time.monotonic() - started < 1
+    assert vision_client.batch_sizes == [1]
+
+
+def test_image_error_fails_only_that_image(vision_client):
+    batcher = VisionBatcher(batch_size=4, window_ms=500, max_concurrency=1)
+
+    good, bad = batcher.submit(b"good"), batcher.submit(b"bad")
+
+    assert good.result(timeout=5)["text"] == "good"
+    with pytest.raises(Exception, match="bad image"):
+        bad.result(timeout=5)
+    assert vision_client.batch_sizes == [2]
+
+
+def test_batch_error_fails_every_image(monkeypatch):
+    def unavailable():
+        raise Exception("OCR service not configured - missing credentials")
+
+    monkeypatch.setattr(ocr, "get_vision_client", unavailable)
+    batcher = VisionBatcher(batch_size=4, window_ms=100, max_concurrency=1)
+
+    futures = [batcher.submit(f"page {i}".encode()) for i in range(3)]
+
+    for future in futures:
+        with pytest.raises(Exception, match="missing credentials"):
+            future.result(timeout=5)
+
+
+def test_batches_in_flight_are_bounded(vision_client):
+    vision_client.delay = 0.1
+    batcher = VisionBatcher(batch_size=1, window_ms=0, max_concurrency=2)
+
+    futures = [batcher.submit(f"page {i}".encode()) for i in range(8)]
+
+    for future in futures:
+        future.result(timeout=5)
+    assert vision_client.batch_sizes == [1] * 8
+    assert vision_client.max_in_flight == 2
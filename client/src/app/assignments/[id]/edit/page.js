@@ -161,6 +161,22 @@ const EditAssignment = ({ params }) => {
     }
   };
 
+  // Poll an OCR job until it completes or fails
+  const waitForOCRJob = async (jobId) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/ocr/status/${jobId}`);
+      if (!response.ok) {
+        const error = await response.json();
+        return { status: 'failed', error: error.detail };
+      }
+      const result = await response.json();
+      if (result.status === 'completed' || result.status === 'failed') {
+        return result;
+      }
+    }
+  };
+
   const processFileWithOCR = async () => {
     if (!selectedFile) return;
 
@@ -175,12 +191,18 @@ const EditAssignment = ({ params }) => {
       });
 
       if (response.ok) {
-        const result = await response.json();
-        setOcrText(result.text || '');
-        
-        // Auto-generate questions from extracted text
-        if (result.text) {
-          generateQuestionsFromText(result.text);
+        const { job_id } = await response.json();
+        const result = await waitForOCRJob(job_id);
+
+        if (result.status === 'completed') {
+          setOcrText(result.text || '');
+
+          // Auto-generate questions from extracted text
+          if (result.text) {
+            generateQuestionsFromText(result.text);
+          }
+        } else {
+          setErrors(prev => ({...prev, ocr: result.error || 'OCR processing failed'}));
         }
       } else {
         const error = await response.json();
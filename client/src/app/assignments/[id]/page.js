@@ -106,10 +106,17 @@ const AssignmentDetail = ({ params }) => {
         model: 'gemini'
       });
       
-      console.log('Batch grading result:', result);
+      console.log('Batch grading started:', result);
+      
+      // Poll the batch job until every submission has been graded or failed
+      let job = result;
+      while (job.job_id && !['completed', 'failed'].includes(job.status)) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        job = await apiClient.get(`/api/v1/grading/jobs/${result.job_id}`);
+      }
       
       // Show results
-      const { graded_count, failed_count, total_submissions } = result;
+      const { graded_count = 0, failed_count = 0 } = job;
       
       if (graded_count > 0) {
         alert(`Successfully graded ${graded_count} submissions!\n${failed_count > 0 ? `${failed_count} submissions failed to grade.` : ''}`);